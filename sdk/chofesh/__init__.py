@@ -6,25 +6,52 @@ __version__ = "0.1.0"
 
 from .agent import Agent
 from .conversation import Conversation
+from .store import ConversationStore
+from .blobs import BlobStore
+from .sessions import SessionManager
+from .pool import AgentPool
 from .llm import LLM
 from .message import Message, MessageRole
+from .budget import Budget
+from .limits import AdaptiveLimiter
+from .context import ContextWindow, Compactor
 from .exceptions import (
     ChofeshError,
     AuthenticationError,
     APIError,
     RateLimitError,
     ToolExecutionError,
+    ToolValidationError,
+    ToolTimeoutError,
+    ToolOutcomeUnknownError,
+    ToolCancelledError,
+    BudgetExceededError,
+    SequenceMismatchError,
 )
 
 __all__ = [
     "Agent",
     "Conversation",
+    "ConversationStore",
+    "BlobStore",
+    "SessionManager",
+    "AgentPool",
     "LLM",
     "Message",
     "MessageRole",
+    "Budget",
+    "AdaptiveLimiter",
+    "ContextWindow",
+    "Compactor",
     "ChofeshError",
     "AuthenticationError",
     "APIError",
     "RateLimitError",
     "ToolExecutionError",
+    "ToolValidationError",
+    "ToolTimeoutError",
+    "ToolOutcomeUnknownError",
+    "ToolCancelledError",
+    "BudgetExceededError",
+    "SequenceMismatchError",
 ]
@@ -1,10 +1,92 @@
 """
 Agent module for autonomous AI agents
 """
-from typing import List, Optional, Iterator, Any, Dict
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from typing import Callable, List, Optional, Iterator, Any, Dict
+import requests
 from .llm import LLM
-from .message import Message, MessageRole, StreamChunk
-from .exceptions import ToolExecutionError
+from .message import Message, MessageRole, StreamChunk, ToolCall
+from .budget import (
+    Budget,
+    DEADLINE,
+    MIN_TIMEOUT,
+    TOKENS,
+    TOOL_TIME,
+    tool_cancelled,
+    use_budget,
+    use_cancel_event,
+    use_tool_timeout,
+)
+from .server_state import ServerHistory
+from .tools.base import Tool, ToolEffects, ToolSchemas
+from .tools.cache import MISS, ToolResultCache, canonical_arguments
+from .tools.results import SPILL_PREVIEW_BYTES, ToolResultEncoder
+from .tools.blob_reader import BlobReaderTool
+from .blobs import BlobStore
+from .limits import AdaptiveLimiter
+from . import json_backend
+from .exceptions import (
+    ToolExecutionError,
+    ToolValidationError,
+    ToolTimeoutError,
+    ToolOutcomeUnknownError,
+    ToolCancelledError,
+    BudgetExceededError,
+)
+
+# Errors raised when a model request (or its wait for a limiter slot) runs past its timeout
+_TIMEOUT_ERRORS = (
+    requests.exceptions.Timeout,
+    asyncio.TimeoutError,
+    concurrent.futures.TimeoutError,
+)
+
+# Prefix of the error recorded on tool calls skipped for lack of budget
+_SKIPPED = "Skipped"
+
+# How the budgets that end a run early are named in cut-off answers
+_BUDGET_LABELS = {
+    DEADLINE: "time budget",
+    TOKENS: "token budget",
+    TOOL_TIME: "tool time budget",
+}
+
+
+def _start_thread(fn: Callable[[], Any]) -> concurrent.futures.Future:
+    """
+    Run fn on a daemon thread in a copy of the current context
+    
+    The caller waits on the returned future for as long as it likes. A
+    call it stops waiting for is not joined, so a hung tool cannot hold
+    the caller's thread; it winds down on its own once its requests hit
+    the tool deadline, and the future completes then.
+    """
+    future: concurrent.futures.Future = concurrent.futures.Future()
+    context = contextvars.copy_context()
+    
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(context.run(fn))
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=target, name="chofesh-tool", daemon=True).start()
+    return future
+
+
+def _ran(tool_call: ToolCall) -> bool:
+    """Whether a tool call was executed (as opposed to never started or skipped)"""
+    if tool_call.error is not None:
+        return not tool_call.error.startswith(_SKIPPED)
+    return tool_call.result is not None
 
 
 class Agent:
@@ -18,6 +100,14 @@ class Agent:
         tools: Optional[List[Any]] = None,
         max_tool_iterations: int = 5,
         temperature: float = 0.7,
+        tool_cache: Optional[ToolResultCache] = None,
+        tool_timeout: Optional[float] = None,
+        result_encoder: Optional[ToolResultEncoder] = None,
+        blob_store: Optional[BlobStore] = None,
+        speculative_tools: bool = False,
+        max_parallel_tools: int = 1,
+        limiter: Optional[AdaptiveLimiter] = None,
+        tool_limiter: Optional[AdaptiveLimiter] = None,
         **kwargs
     ):
         """
@@ -30,22 +120,65 @@ class Agent:
             tools: List of tools available to agent
             max_tool_iterations: Maximum tool execution iterations
             temperature: Default sampling temperature
+            tool_cache: Cache for results of cacheable tool calls (default: a
+                cache private to this agent; pass tools.shared_tool_cache to
+                share results with other agents)
+            tool_timeout: Seconds any single tool call may run; tools may
+                declare a shorter limit of their own (Tool.timeout)
+            result_encoder: Encoder turning tool results into tool message
+                content (default: compact JSON capped at 16 KB)
+            blob_store: Store for results too large for result_encoder; the
+                tool message then holds a handle and a preview, and a
+                read_blob tool is added for paging through the full result
+            speculative_tools: In process(), stream each model turn and start
+                every tool call as soon as its arguments are complete, while
+                the model is still generating the rest of the turn
+            max_parallel_tools: Tool calls of one turn that may run at once.
+                Above 1, calls whose effects (Tool.effects) do not conflict
+                run in parallel and conflicting calls run in the order given
+            limiter: Adaptive limit on model requests in flight (see LLM)
+            tool_limiter: Adaptive limit on tool calls in flight, shared by all
+                tools with a latency baseline per tool
             **kwargs: Additional LLM parameters
         """
         self.model = model
-        self.llm = LLM(model=model, api_key=api_key, api_url=api_url)
+        self.llm = LLM(model=model, api_key=api_key, api_url=api_url, limiter=limiter)
         self.tools = tools or []
         self.max_tool_iterations = max_tool_iterations
         self.temperature = temperature
+        self.tool_cache = tool_cache if tool_cache is not None else ToolResultCache()
+        self.tool_timeout = tool_timeout
+        self.result_encoder = result_encoder or ToolResultEncoder()
+        self.blob_store = blob_store
+        self.speculative_tools = speculative_tools
+        self.max_parallel_tools = max_parallel_tools
+        self.tool_limiter = tool_limiter
         self.llm_kwargs = kwargs
         
         # Build tool registry
         self._tool_registry = {tool.name: tool for tool in self.tools}
+        
+        if blob_store is not None and BlobReaderTool.name not in self._tool_registry:
+            # Copy rather than append to the caller's list
+            reader = BlobReaderTool(blob_store)
+            self.tools = self.tools + [reader]
+            self._tool_registry[reader.name] = reader
+        self._preview_encoder = ToolResultEncoder(
+            max_bytes=min(SPILL_PREVIEW_BYTES, self.result_encoder.max_bytes)
+        )
+        
+        # Compiled tool schemas and the tool set they were built from
+        self._tool_schemas: Optional[ToolSchemas] = None
+        self._tool_schemas_key: Optional[tuple] = None
+        
+        # Guards the per-run dedup results that parallel tool calls share
+        self._seen_lock = threading.Lock()
     
     def add_tool(self, tool: Any):
         """Add a tool to the agent"""
         self.tools.append(tool)
         self._tool_registry[tool.name] = tool
+        self._tool_schemas = None
     
     def remove_tool(self, tool_name: str):
         """Remove a tool from the agent"""
@@ -53,23 +186,106 @@ class Agent:
             tool = self._tool_registry[tool_name]
             self.tools.remove(tool)
             del self._tool_registry[tool_name]
+            self._tool_schemas = None
     
-    def _get_tool_schemas(self) -> List[Dict[str, Any]]:
-        """Get tool schemas for LLM"""
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": tool.parameters,
-                }
+    @staticmethod
+    def _tool_schema(tool: Any) -> Dict[str, Any]:
+        if isinstance(tool, Tool):
+            return tool.to_schema()
+        return {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": tool.parameters,
             }
-            for tool in self.tools
+        }
+    
+    def _get_tool_schemas(self) -> ToolSchemas:
+        """
+        Get tool schemas for LLM
+        
+        Schemas are built once and reused, encoded bytes included, until a
+        tool is added or removed, so every request in a run carries an
+        identical tools block.
+        """
+        # Also catches self.tools being replaced or edited in place
+        key = tuple(map(id, self.tools))
+        if self._tool_schemas is None or key != self._tool_schemas_key:
+            self._tool_schemas = ToolSchemas(self._tool_schema(tool) for tool in self.tools)
+            self._tool_schemas_key = key
+        return self._tool_schemas
+    
+    def _validate_arguments(self, tool_call: ToolCall) -> Dict[str, Any]:
+        """
+        Check a tool call's arguments against the tool's compiled schema
+        
+        Returns:
+            Arguments with schema defaults applied
+        
+        Raises:
+            ToolValidationError: If the arguments are malformed or invalid
+        """
+        if tool_call.raw_arguments is not None:
+            raise ToolValidationError(
+                tool_call.name, ["arguments: expected a JSON object"]
+            )
+        
+        tool = self._tool_registry.get(tool_call.name)
+        if not isinstance(tool, Tool):
+            return tool_call.parameters
+        
+        try:
+            parameters, errors = tool.validate_parameters(tool_call.parameters)
+        except Exception as e:
+            # A check tripping over malformed arguments is still a bad call
+            raise ToolValidationError(tool_call.name, [f"arguments: {e}"])
+        if errors:
+            raise ToolValidationError(tool_call.name, errors)
+        return parameters
+    
+    def _tool_timeout_for(
+        self,
+        tool_name: str,
+        tool_timeout: Optional[float],
+        budget: Optional[Budget],
+    ) -> Optional[float]:
+        """Smallest of the call's, the agent's and the tool's timeouts, within the budget"""
+        tool = self._tool_registry.get(tool_name)
+        limits = [
+            tool_timeout if tool_timeout is not None else self.tool_timeout,
+            tool.timeout if isinstance(tool, Tool) else None,
         ]
+        limits = [limit for limit in limits if limit is not None]
+        timeout = min(limits) if limits else None
+        if budget is not None:
+            timeout = budget.tool_timeout_for(timeout)
+        return timeout
     
-    def _execute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Any:
-        """Execute a tool"""
+    def _execute_tool(
+        self,
+        tool_name: str,
+        parameters: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Execute a tool
+        
+        Args:
+            tool_name: Registered tool name
+            parameters: Validated arguments
+            timeout: Seconds to wait for the tool; requests the tool makes
+                through effective_timeout() are clamped to the same deadline
+        
+        Raises:
+            ToolOutcomeUnknownError: If a call with side effects overran its
+                timeout; it may still complete
+            ToolTimeoutError: If any other call overran its timeout
+            ToolCancelledError: If the run was cancelled before the call started
+            ToolExecutionError: If the tool is unknown or raised
+        """
+        if tool_cancelled():
+            raise ToolCancelledError(tool_name)
         if tool_name not in self._tool_registry:
             raise ToolExecutionError(
                 tool_name=tool_name,
@@ -78,21 +294,546 @@ class Agent:
         
         tool = self._tool_registry[tool_name]
         
+        ttl = tool.cache_ttl_for(parameters) if isinstance(tool, Tool) else None
+        if ttl:
+            key = self.tool_cache.key(tool.cache_scope(), parameters)
+            result = self.tool_cache.get(key)
+            if result is not MISS:
+                return result
+        
+        side_effects = isinstance(tool, Tool) and tool.has_side_effects(parameters)
         try:
-            result = tool.execute(parameters)
-            return result
+            if timeout is not None:
+                result = self._execute_in_thread(tool_name, tool, parameters, timeout, side_effects)
+            elif self.tool_limiter is None:
+                result = tool.execute(parameters)
+            else:
+                with self.tool_limiter.track(tool_name):
+                    result = tool.execute(parameters)
+        except (ToolTimeoutError, ToolCancelledError):
+            raise
+        except concurrent.futures.TimeoutError:
+            if side_effects:
+                raise ToolOutcomeUnknownError(tool_name, timeout)
+            raise ToolTimeoutError(tool_name, timeout)
         except Exception as e:
             raise ToolExecutionError(
                 tool_name=tool_name,
                 message=str(e),
                 original_error=e
             )
+        finally:
+            if side_effects:
+                self.tool_cache.invalidate(tool.cache_scope())
+        
+        if ttl and tool.is_cacheable_result(result):
+            self.tool_cache.set(key, result, ttl)
+        return result
+    
+    def _execute_in_thread(
+        self,
+        tool_name: str,
+        tool: Any,
+        parameters: Dict[str, Any],
+        timeout: float,
+        side_effects: bool,
+    ) -> Any:
+        """
+        Run a tool call on its own thread and wait at most timeout seconds
+        
+        The call is not cancelled when the wait ends: it keeps its tool
+        limiter slot until its thread exits, and a call with side effects
+        invalidates the tool cache again then, as its write may land after
+        the caller has moved on.
+        
+        Raises:
+            ToolTimeoutError: If no tool limiter slot freed up in time
+            concurrent.futures.TimeoutError: If the call has not finished in time
+        """
+        limiter = self.tool_limiter
+        remaining = timeout
+        if limiter is not None:
+            waiting = time.monotonic()
+            # Slots held by hung calls must not hold this one past its timeout
+            if not limiter.acquire(timeout):
+                raise ToolTimeoutError(tool_name, timeout)
+            started = limiter.clock()
+            remaining = max(timeout - (time.monotonic() - waiting), MIN_TIMEOUT)
+        
+        def finished(future: concurrent.futures.Future):
+            if limiter is not None:
+                limiter.settle(started, tool_name, future.exception())
+            if side_effects:
+                self.tool_cache.invalidate(tool.cache_scope())
+        
+        future = _start_thread(
+            functools.partial(self._execute_with_deadline, tool, parameters, remaining)
+        )
+        future.add_done_callback(finished)
+        return future.result(remaining)
+    
+    @staticmethod
+    def _execute_with_deadline(tool: Any, parameters: Dict[str, Any], timeout: float) -> Any:
+        with use_tool_timeout(timeout):
+            return tool.execute(parameters)
+    
+    def _completion_kwargs(
+        self,
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]],
+        budget: Optional[Budget],
+        server_history: Optional[ServerHistory] = None,
+    ) -> Dict[str, Any]:
+        """Build keyword arguments for an LLM call"""
+        kwargs = dict(
+            temperature=temperature,
+            max_tokens=max_tokens,
+            tools=tools,
+            **self.llm_kwargs
+        )
+        if budget is not None:
+            kwargs["timeout"] = budget.timeout_for(self.llm.timeout)
+            remaining = budget.remaining_tokens()
+            if remaining is not None:
+                # Never ask for more tokens than the budget has left
+                remaining = max(remaining, 1)
+                kwargs["max_tokens"] = (
+                    remaining if max_tokens is None else min(max_tokens, remaining)
+                )
+        if server_history is not None:
+            kwargs["server_history"] = server_history
+        return kwargs
+    
+    def _check_budget(self, budget: Optional[Budget]):
+        """Raise if the budget ran out before any answer was produced"""
+        if budget is not None and budget.exhausted_reason in (DEADLINE, TOKENS):
+            raise BudgetExceededError(budget.exhausted_reason)
+    
+    def _stop_reason(self, budget: Optional[Budget]) -> Optional[str]:
+        """Reason to end the tool loop early, if the budget requires it"""
+        if budget is None:
+            return None
+        reason = budget.exhausted_reason
+        return reason if reason in (DEADLINE, TOKENS) else None
+    
+    def _tool_schemas_for(
+        self,
+        tool_schemas: Optional[List[Dict[str, Any]]],
+        budget: Optional[Budget],
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Withhold tools once tool time is spent so the model answers directly"""
+        if budget is not None and budget.exhausted:
+            return None
+        return tool_schemas
+    
+    def _run_tool_calls(
+        self,
+        tool_calls: List[ToolCall],
+        budget: Optional[Budget] = None,
+        seen: Optional[Dict[tuple, tuple]] = None,
+        tool_timeout: Optional[float] = None,
+    ) -> List[Message]:
+        """
+        Execute tool calls and build the resulting tool messages
+        
+        Args:
+            tool_calls: Calls requested by the model
+            budget: Optional limits; calls are skipped once it is exhausted
+            seen: Results of earlier calls in the same run, keyed on (tool
+                name, canonical arguments). An identical call to a Tool
+                without side effects reuses the earlier result, and its
+                message is marked duplicate_of.
+            tool_timeout: Per-call override of the agent's tool timeout
+        """
+        tool_messages = []
+        
+        for tool_call in tool_calls:
+            if budget is not None and budget.exhausted:
+                reason = budget.exhausted_reason
+                tool_call.error = f"{_SKIPPED}: budget exhausted ({reason})"
+                tool_messages.append(Message(
+                    role=MessageRole.TOOL,
+                    content=f"Error: {tool_call.error}",
+                    metadata={
+                        "tool_call_id": tool_call.id,
+                        "tool_name": tool_call.name,
+                        "error": True,
+                        "budget_exhausted": reason,
+                    }
+                ))
+                continue
+            
+            key = None
+            if (
+                seen is not None
+                and tool_call.raw_arguments is None
+                and isinstance(self._tool_registry.get(tool_call.name), Tool)
+            ):
+                key = (tool_call.name, canonical_arguments(tool_call.parameters))
+                with self._seen_lock:
+                    earlier = seen.get(key)
+                if earlier is not None:
+                    first_id, result = earlier
+                    tool_call.result = result
+                    tool_messages.append(
+                        self._tool_result_message(tool_call, result, duplicate_of=first_id)
+                    )
+                    continue
+            
+            started = time.monotonic()
+            try:
+                result = self._execute_tool(
+                    tool_call.name,
+                    self._validate_arguments(tool_call),
+                    self._tool_timeout_for(tool_call.name, tool_timeout, budget),
+                )
+                tool_call.result = result
+                if key is not None:
+                    self._remember_result(seen, key, tool_call, result)
+                
+                # Add tool result message
+                tool_messages.append(self._tool_result_message(tool_call, result))
+                
+            except ToolExecutionError as e:
+                tool_call.error = str(e)
+                metadata = {
+                    "tool_call_id": tool_call.id,
+                    "tool_name": tool_call.name,
+                    "error": True,
+                }
+                if isinstance(e, ToolValidationError):
+                    metadata["invalid_arguments"] = True
+                elif isinstance(e, ToolOutcomeUnknownError):
+                    metadata["outcome_unknown"] = True
+                    metadata["timeout"] = e.timeout
+                elif isinstance(e, ToolTimeoutError):
+                    metadata["timed_out"] = True
+                    metadata["timeout"] = e.timeout
+                
+                # Add error message
+                tool_messages.append(Message(
+                    role=MessageRole.TOOL,
+                    content=f"Error: {str(e)}",
+                    metadata=metadata,
+                ))
+            finally:
+                if budget is not None:
+                    budget.record_tool_time(time.monotonic() - started)
+        
+        return tool_messages
+    
+    def _tool_call_effects(self, tool_call: ToolCall) -> Optional[ToolEffects]:
+        """Declared effects of a call, or None if it must run on its own"""
+        tool = self._tool_registry.get(tool_call.name)
+        if not isinstance(tool, Tool) or tool_call.raw_arguments is not None:
+            return None
+        try:
+            return tool.effects(tool_call.parameters)
+        except Exception:
+            return None
+    
+    def _tool_call_dependencies(self, tool_calls: List[ToolCall]) -> List[set]:
+        """
+        Earlier calls each call has to wait for
+        
+        A call waits for every earlier call it conflicts with, for earlier
+        identical calls (so it can reuse their result), and for all earlier
+        calls if its effects are unknown, in which case later calls wait for
+        it as well.
+        """
+        effects = [self._tool_call_effects(tool_call) for tool_call in tool_calls]
+        keys = [
+            (tool_call.name, canonical_arguments(tool_call.parameters))
+            for tool_call in tool_calls
+        ]
+        dependencies = []
+        for i, current in enumerate(effects):
+            dependencies.append({
+                j for j in range(i)
+                if current is None
+                or effects[j] is None
+                or keys[j] == keys[i]
+                or effects[j].conflicts_with(current)
+            })
+        return dependencies
+    
+    def _run_tool_graph(
+        self,
+        tool_calls: List[ToolCall],
+        budget: Optional[Budget] = None,
+        seen: Optional[Dict[tuple, tuple]] = None,
+        tool_timeout: Optional[float] = None,
+    ) -> List[Message]:
+        """
+        Run a turn's tool calls, in parallel where their effects allow
+        
+        Each call starts once the calls it depends on have finished, with at
+        most max_parallel_tools running at a time. Tool messages come back in
+        the order of tool_calls, as with _run_tool_calls().
+        """
+        if self.max_parallel_tools <= 1 or len(tool_calls) < 2:
+            return self._run_tool_calls(tool_calls, budget, seen, tool_timeout)
+        
+        dependencies = self._tool_call_dependencies(tool_calls)
+        results: Dict[int, List[Message]] = {}
+        running: Dict[concurrent.futures.Future, int] = {}
+        waiting = list(range(len(tool_calls)))
+        
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_parallel_tools, thread_name_prefix="chofesh-tool"
+        ) as executor:
+            while waiting or running:
+                for i in [i for i in waiting if dependencies[i].issubset(results)]:
+                    if len(running) >= self.max_parallel_tools:
+                        break
+                    waiting.remove(i)
+                    context = contextvars.copy_context()
+                    future = executor.submit(
+                        context.run,
+                        self._run_tool_calls, [tool_calls[i]], budget, seen, tool_timeout,
+                    )
+                    running[future] = i
+                
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        
+        return [message for i in range(len(tool_calls)) for message in results[i]]
+    
+    def _tool_result_message(self, tool_call: ToolCall, result: Any, **metadata: Any) -> Message:
+        """
+        Tool message carrying a result encoded by result_encoder
+        
+        Oversized results are cut down for the model, or replaced by a blob
+        handle and preview when a blob store is configured; the full result
+        stays on tool_call.result.
+        """
+        encoded = self.result_encoder.encode(result)
+        content = encoded.content
+        metadata = {
+            "tool_call_id": tool_call.id,
+            "tool_name": tool_call.name,
+            **metadata,
+        }
+        if encoded.truncated:
+            metadata["truncated"] = True
+            metadata["result_bytes"] = encoded.size
+            tool = self._tool_registry.get(tool_call.name)
+            if self.blob_store is not None and not (
+                isinstance(tool, Tool) and not tool.spill_results
+            ):
+                handle = self.blob_store.put(self.result_encoder.dumps(result))
+                metadata["blob"] = handle
+                content = json_backend.dumps({
+                    "blob": handle,
+                    "total_bytes": encoded.size,
+                    "preview": self._preview_encoder.encode(result).content,
+                    "note": f"Full result stored; page through it with {BlobReaderTool.name}",
+                })
+        return Message(role=MessageRole.TOOL, content=content, metadata=metadata)
+    
+    async def _run_tool_calls_async(
+        self,
+        tool_calls: List[ToolCall],
+        budget: Optional[Budget] = None,
+        seen: Optional[Dict[tuple, tuple]] = None,
+        tool_timeout: Optional[float] = None,
+    ) -> List[Message]:
+        """
+        Run _run_tool_graph() on a worker thread so the event loop stays free
+        
+        If the awaiting task is cancelled, calls that have not started yet are
+        skipped and requests made through effective_timeout() are refused
+        before being sent. A request already in flight cannot be interrupted
+        and ends at its timeout.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        cancel = threading.Event()
+        try:
+            return await loop.run_in_executor(
+                None,
+                functools.partial(
+                    context.run,
+                    self._run_cancellable,
+                    cancel,
+                    self._run_tool_graph,
+                    tool_calls,
+                    budget,
+                    seen,
+                    tool_timeout,
+                ),
+            )
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+    
+    @staticmethod
+    def _run_cancellable(cancel: threading.Event, fn: Callable[..., Any], *args: Any) -> Any:
+        with use_cancel_event(cancel):
+            return fn(*args)
+    
+    def _remember_result(
+        self,
+        seen: Dict[tuple, tuple],
+        key: tuple,
+        tool_call: ToolCall,
+        result: Any,
+    ):
+        """Record a result for reuse, or forget the tool's results after a side effect"""
+        tool = self._tool_registry[tool_call.name]
+        side_effects = tool.has_side_effects(tool_call.parameters)
+        # Parallel tool calls (_run_tool_graph) share seen
+        with self._seen_lock:
+            if side_effects:
+                # Later identical calls must run again, and so must earlier reads
+                for name, arguments in list(seen):
+                    if name == tool_call.name:
+                        del seen[(name, arguments)]
+            else:
+                seen[key] = (tool_call.id, result)
+    
+    def _complete(
+        self,
+        messages: List[Message],
+        completion_kwargs: Dict[str, Any],
+        start: Optional[Callable[[ToolCall], Any]] = None,
+    ) -> Message:
+        """LLM.complete(), or a streamed completion when tool calls can start early"""
+        if start is None:
+            return self.llm.complete(messages=messages, **completion_kwargs)
+        return self._complete_streaming(messages, completion_kwargs, start)
+    
+    def _start_tool_call(
+        self,
+        executor: concurrent.futures.Executor,
+        started: Dict[int, concurrent.futures.Future],
+        budget: Optional[Budget],
+        seen: Dict[tuple, tuple],
+        tool_timeout: Optional[float],
+        tool_call: ToolCall,
+    ):
+        """Queue a tool call whose turn is still streaming"""
+        context = contextvars.copy_context()
+        started[id(tool_call)] = executor.submit(
+            context.run, self._run_tool_calls, [tool_call], budget, seen, tool_timeout
+        )
+    
+    def _collect_tool_results(
+        self,
+        tool_calls: List[ToolCall],
+        started: Dict[int, concurrent.futures.Future],
+        budget: Optional[Budget],
+        seen: Dict[tuple, tuple],
+        tool_timeout: Optional[float],
+    ) -> List[Message]:
+        """Tool messages for a turn, waiting for calls that were started early"""
+        if not started:
+            return self._run_tool_graph(tool_calls, budget, seen, tool_timeout)
+        tool_messages = []
+        for tool_call in tool_calls:
+            future = started.pop(id(tool_call), None)
+            if future is not None:
+                tool_messages.extend(future.result())
+            else:
+                tool_messages.extend(
+                    self._run_tool_calls([tool_call], budget, seen, tool_timeout)
+                )
+        return tool_messages
+    
+    def _wait_for_started(
+        self,
+        tool_calls: List[ToolCall],
+        started: Dict[int, concurrent.futures.Future],
+    ):
+        """Let calls started early on a turn that will not continue finish"""
+        for tool_call in tool_calls:
+            future = started.pop(id(tool_call), None)
+            if future is not None:
+                future.result()
+    
+    def _complete_streaming(
+        self,
+        messages: List[Message],
+        completion_kwargs: Dict[str, Any],
+        start: Optional[Callable[[ToolCall], Any]] = None,
+    ) -> Message:
+        """
+        Get a completion by streaming it, handing over tool calls as they finish
+        
+        Args:
+            messages: Conversation so far
+            completion_kwargs: Keyword arguments for LLM.stream()
+            start: Called with each tool call as soon as its arguments are complete
+        
+        Returns:
+            The assembled assistant message
+        """
+        content = []
+        tool_calls = []
+        metadata: Dict[str, Any] = {"usage": {}, "finish_reason": None}
+        for chunk in self.llm.stream(messages=messages, **completion_kwargs):
+            content.append(chunk.content)
+            if chunk.tool_call is not None:
+                tool_calls.append(chunk.tool_call)
+                if start is not None:
+                    start(chunk.tool_call)
+            if chunk.metadata.get("usage"):
+                metadata["usage"] = chunk.metadata["usage"]
+            if chunk.metadata.get("finish_reason"):
+                metadata["finish_reason"] = chunk.metadata["finish_reason"]
+        return Message(
+            role=MessageRole.ASSISTANT,
+            content="".join(content),
+            model=self.model,
+            tool_calls=tool_calls,
+            metadata=metadata,
+        )
+    
+    def _finish(self, response: Message, stop_reason: Optional[str]) -> Message:
+        """
+        Mark a response returned early because the budget ran out
+        
+        A response still waiting on tool calls is not an answer, so it is
+        replaced by one saying the run was cut off, without the calls. It
+        names the calls that ran (whose results the model never saw) apart
+        from those that did not.
+        """
+        if stop_reason is None:
+            return response
+        if response.tool_calls:
+            executed = [call.name for call in response.tool_calls if _ran(call)]
+            pending = [call.name for call in response.tool_calls if not _ran(call)]
+            note = f"Stopped before finishing: the {_BUDGET_LABELS[stop_reason]} ran out."
+            if executed:
+                note += f" Tool calls that ran: {', '.join(executed)}."
+            if pending:
+                note += f" Tool calls not run: {', '.join(pending)}."
+            response = Message(
+                role=MessageRole.ASSISTANT,
+                content=f"{response.content}\n\n{note}" if response.content else note,
+                model=response.model,
+                metadata={
+                    **response.metadata,
+                    "cut_off": True,
+                    "executed_tool_calls": executed,
+                    "pending_tool_calls": pending,
+                },
+            )
+        response.metadata["budget_exhausted"] = stop_reason
+        return response
     
     def process(
         self,
         messages: List[Message],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        budget: Optional[Budget] = None,
+        server_history: Optional[ServerHistory] = None,
+        tool_timeout: Optional[float] = None,
     ) -> Message:
         """
         Process messages and return response
@@ -101,6 +842,9 @@ class Agent:
             messages: List of messages
             temperature: Sampling temperature (overrides default)
             max_tokens: Maximum tokens to generate
+            budget: Optional wall-clock, token and tool-time limits for this call
+            server_history: Optional server-held history; only new messages are uploaded
+            tool_timeout: Seconds each tool call may run (overrides the agent default)
         
         Returns:
             Assistant response message
@@ -108,75 +852,98 @@ class Agent:
         temp = temperature if temperature is not None else self.temperature
         tool_schemas = self._get_tool_schemas() if self.tools else None
         
-        # Initial completion
-        response = self.llm.complete(
-            messages=messages,
-            temperature=temp,
-            max_tokens=max_tokens,
-            tools=tool_schemas,
-            **self.llm_kwargs
-        )
+        if budget is not None:
+            budget.start()
         
-        # Handle tool calls
-        iteration = 0
-        current_messages = messages.copy()
-        current_messages.append(response)
+        # With speculative_tools, calls run one at a time on a worker thread
+        # while the model streams the rest of the turn; calls started early
+        # are keyed by id() of their ToolCall
+        speculate = self.speculative_tools and server_history is None
+        started: Dict[int, concurrent.futures.Future] = {}
+        seen: Dict[tuple, tuple] = {}
+        executor = (
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="chofesh-speculative"
+            )
+            if speculate else contextlib.nullcontext()
+        )
         
-        while response.tool_calls and iteration < self.max_tool_iterations:
-            iteration += 1
+        with executor, use_budget(budget):
+            start = None
+            if speculate:
+                start = functools.partial(
+                    self._start_tool_call, executor, started, budget, seen, tool_timeout
+                )
             
-            # Execute all tool calls
-            for tool_call in response.tool_calls:
-                try:
-                    result = self._execute_tool(
-                        tool_call.name,
-                        tool_call.parameters
-                    )
-                    tool_call.result = result
-                    
-                    # Add tool result message
-                    tool_message = Message(
-                        role=MessageRole.TOOL,
-                        content=str(result),
-                        metadata={
-                            "tool_call_id": tool_call.id,
-                            "tool_name": tool_call.name,
-                        }
-                    )
-                    current_messages.append(tool_message)
-                    
-                except ToolExecutionError as e:
-                    tool_call.error = str(e)
-                    
-                    # Add error message
-                    error_message = Message(
-                        role=MessageRole.TOOL,
-                        content=f"Error: {str(e)}",
-                        metadata={
-                            "tool_call_id": tool_call.id,
-                            "tool_name": tool_call.name,
-                            "error": True,
-                        }
-                    )
-                    current_messages.append(error_message)
+            # Initial completion
+            try:
+                response = self._complete(
+                    messages,
+                    self._completion_kwargs(
+                        temp, max_tokens, tool_schemas, budget, server_history
+                    ),
+                    start if self.max_tool_iterations > 0 else None,
+                )
+            except _TIMEOUT_ERRORS:
+                self._check_budget(budget)
+                raise
+            if budget is not None:
+                budget.record_usage(response.metadata.get("usage"))
             
-            # Get next response
-            response = self.llm.complete(
-                messages=current_messages,
-                temperature=temp,
-                max_tokens=max_tokens,
-                tools=tool_schemas,
-                **self.llm_kwargs
-            )
+            # Handle tool calls
+            iteration = 0
+            stop_reason = None
+            current_messages = messages.copy()
             current_messages.append(response)
+            
+            while response.tool_calls and iteration < self.max_tool_iterations:
+                stop_reason = self._stop_reason(budget)
+                if stop_reason:
+                    # Calls started while the turn streamed run regardless
+                    self._wait_for_started(response.tool_calls, started)
+                    break
+                iteration += 1
+                
+                # Execute all tool calls
+                current_messages.extend(self._collect_tool_results(
+                    response.tool_calls, started, budget, seen, tool_timeout
+                ))
+                
+                stop_reason = self._stop_reason(budget)
+                if stop_reason:
+                    break
+                
+                # Get next response
+                tools = self._tool_schemas_for(tool_schemas, budget)
+                try:
+                    response = self._complete(
+                        current_messages,
+                        self._completion_kwargs(
+                            temp, max_tokens, tools, budget, server_history
+                        ),
+                        start if iteration < self.max_tool_iterations else None,
+                    )
+                except _TIMEOUT_ERRORS:
+                    stop_reason = self._stop_reason(budget)
+                    if not stop_reason:
+                        raise
+                    break
+                if budget is not None:
+                    budget.record_usage(response.metadata.get("usage"))
+                current_messages.append(response)
+                if tools is None and tool_schemas:
+                    # Tool time ran out, so this answer was asked for without tools
+                    stop_reason = TOOL_TIME
+                    break
         
-        return response
+        return self._finish(response, stop_reason)
     
     def stream(
         self,
         messages: List[Message],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        budget: Optional[Budget] = None,
     ) -> Iterator[StreamChunk]:
         """
         Stream response
@@ -185,6 +952,7 @@ class Agent:
             messages: List of messages
             temperature: Sampling temperature (overrides default)
             max_tokens: Maximum tokens to generate
+            budget: Optional limits for this call (only the deadline applies)
         
         Yields:
             Stream chunks
@@ -192,12 +960,12 @@ class Agent:
         temp = temperature if temperature is not None else self.temperature
         tool_schemas = self._get_tool_schemas() if self.tools else None
         
+        if budget is not None:
+            budget.start()
+        
         yield from self.llm.stream(
             messages=messages,
-            temperature=temp,
-            max_tokens=max_tokens,
-            tools=tool_schemas,
-            **self.llm_kwargs
+            **self._completion_kwargs(temp, max_tokens, tool_schemas, budget)
         )
     
     async def process_async(
@@ -205,6 +973,9 @@ class Agent:
         messages: List[Message],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        budget: Optional[Budget] = None,
+        server_history: Optional[ServerHistory] = None,
+        tool_timeout: Optional[float] = None,
     ) -> Message:
         """
         Async version of process()
@@ -213,6 +984,9 @@ class Agent:
             messages: List of messages
             temperature: Sampling temperature (overrides default)
             max_tokens: Maximum tokens to generate
+            budget: Optional wall-clock, token and tool-time limits for this call
+            server_history: Optional server-held history; only new messages are uploaded
+            tool_timeout: Seconds each tool call may run (overrides the agent default)
         
         Returns:
             Assistant response message
@@ -220,66 +994,66 @@ class Agent:
         temp = temperature if temperature is not None else self.temperature
         tool_schemas = self._get_tool_schemas() if self.tools else None
         
-        # Initial completion
-        response = await self.llm.complete_async(
-            messages=messages,
-            temperature=temp,
-            max_tokens=max_tokens,
-            tools=tool_schemas,
-            **self.llm_kwargs
-        )
-        
-        # Handle tool calls
-        iteration = 0
-        current_messages = messages.copy()
-        current_messages.append(response)
+        if budget is not None:
+            budget.start()
         
-        while response.tool_calls and iteration < self.max_tool_iterations:
-            iteration += 1
-            
-            # Execute all tool calls
-            for tool_call in response.tool_calls:
-                try:
-                    result = self._execute_tool(
-                        tool_call.name,
-                        tool_call.parameters
-                    )
-                    tool_call.result = result
-                    
-                    # Add tool result message
-                    tool_message = Message(
-                        role=MessageRole.TOOL,
-                        content=str(result),
-                        metadata={
-                            "tool_call_id": tool_call.id,
-                            "tool_name": tool_call.name,
-                        }
-                    )
-                    current_messages.append(tool_message)
-                    
-                except ToolExecutionError as e:
-                    tool_call.error = str(e)
-                    
-                    # Add error message
-                    error_message = Message(
-                        role=MessageRole.TOOL,
-                        content=f"Error: {str(e)}",
-                        metadata={
-                            "tool_call_id": tool_call.id,
-                            "tool_name": tool_call.name,
-                            "error": True,
-                        }
+        with use_budget(budget):
+            # Initial completion
+            try:
+                response = await self.llm.complete_async(
+                    messages=messages,
+                    **self._completion_kwargs(
+                        temp, max_tokens, tool_schemas, budget, server_history
                     )
-                    current_messages.append(error_message)
+                )
+            except _TIMEOUT_ERRORS:
+                self._check_budget(budget)
+                raise
+            if budget is not None:
+                budget.record_usage(response.metadata.get("usage"))
             
-            # Get next response
-            response = await self.llm.complete_async(
-                messages=current_messages,
-                temperature=temp,
-                max_tokens=max_tokens,
-                tools=tool_schemas,
-                **self.llm_kwargs
-            )
+            # Handle tool calls
+            iteration = 0
+            stop_reason = None
+            current_messages = messages.copy()
             current_messages.append(response)
+            seen: Dict[tuple, tuple] = {}
+            
+            while response.tool_calls and iteration < self.max_tool_iterations:
+                stop_reason = self._stop_reason(budget)
+                if stop_reason:
+                    break
+                iteration += 1
+                
+                # Execute all tool calls
+                current_messages.extend(await self._run_tool_calls_async(
+                    response.tool_calls, budget, seen, tool_timeout
+                ))
+                
+                stop_reason = self._stop_reason(budget)
+                if stop_reason:
+                    break
+                
+                # Get next response
+                tools = self._tool_schemas_for(tool_schemas, budget)
+                try:
+                    response = await self.llm.complete_async(
+                        messages=current_messages,
+                        **self._completion_kwargs(
+                            temp, max_tokens, tools, budget, server_history
+                        )
+                    )
+                except _TIMEOUT_ERRORS:
+                    stop_reason = self._stop_reason(budget)
+                    if not stop_reason:
+                        raise
+                    break
+                if budget is not None:
+                    budget.record_usage(response.metadata.get("usage"))
+                current_messages.append(response)
+                if tools is None and tool_schemas:
+                    # Tool time ran out, so this answer was asked for without tools
+                    stop_reason = TOOL_TIME
+                    break
         
-        return response
+        return self._finish(response, stop_reason)
@@ -0,0 +1,479 @@
+"""
+Memory-mapped columnar archive of conversations
+
+An archive file stores many conversations as fixed-width columns (role,
+model, timestamp, conversation) plus UTF-8 content and JSON side blobs.
+Opening an archive maps the file instead of reading it, message content
+is exposed as zero-copy memoryviews, and filters are evaluated over whole
+columns with bytes operations rather than by decoding messages one by one.
+
+File layout: an 8-byte magic, the header length (uint64), a JSON header
+with string tables and section offsets, then 8-byte aligned sections.
+"""
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+from . import json_backend
+from .agent import Agent
+from .conversation import Conversation
+from .message import Message, MessageRole, ToolCall
+
+MAGIC = b"CHOFESHA"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sQ")
+_ALIGN = 8
+
+# Column name -> array typecode
+_COLUMNS = {
+    "conversation": "I",
+    "role": "B",
+    "model_lo": "B",
+    "model_hi": "B",
+    "timestamp": "d",
+    "time_order": "I",
+    "time_sorted": "d",
+    "content_offsets": "Q",
+    "extra_offsets": "Q",
+    "tool_message": "I",
+    "tool_lo": "B",
+    "tool_hi": "B",
+    "conversation_starts": "Q",
+    "conversation_offsets": "Q",
+}
+_BLOBS = ("content", "extra", "conversations")
+
+_ROLES = [role.value for role in MessageRole]
+
+StrFilter = Union[str, Iterable[str], None]
+TimeFilter = Union[datetime, float, None]
+
+
+def _as_set(value: StrFilter) -> Optional[set]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+def _as_posix(value: TimeFilter) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return value.timestamp()
+
+
+def _byte_table(codes: Iterable[int]) -> bytes:
+    """Translation table mapping the given byte values to 1 and all others to 0"""
+    table = bytearray(256)
+    for code in codes:
+        table[code] = 1
+    return bytes(table)
+
+
+def _and(a: bytes, b: bytes) -> bytes:
+    """Element-wise AND of two 0/1 byte masks"""
+    return (int.from_bytes(a, "little") & int.from_bytes(b, "little")).to_bytes(len(a), "little")
+
+
+def _or(a: bytes, b: bytes) -> bytes:
+    """Element-wise OR of two 0/1 byte masks"""
+    return (int.from_bytes(a, "little") | int.from_bytes(b, "little")).to_bytes(len(a), "little")
+
+
+class _Interner:
+    """Assigns dense integer codes to strings"""
+    
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+    
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            if code > 0xFFFF:
+                raise ValueError("Archive supports at most 65536 distinct values per column")
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class TranscriptArchive:
+    """Read-only, memory-mapped archive of conversations"""
+    
+    def __init__(self, path: str):
+        """
+        Open an archive file
+        
+        Args:
+            path: File written by TranscriptArchive.write()
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        
+        magic, header_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a transcript archive")
+        header = json_backend.loads(self._view[_HEADER.size:_HEADER.size + header_length])
+        if header["version"] != VERSION:
+            raise ValueError(f"Unsupported archive version {header['version']}")
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("Archive was written on a machine with a different byte order")
+        
+        self.message_count: int = header["messages"]
+        self.conversation_count: int = header["conversations"]
+        self.tool_call_count: int = header["tool_calls"]
+        self.roles: List[str] = header["roles"]
+        self.models: List[Optional[str]] = header["models"]
+        self.tool_names: List[str] = header["tools"]
+        self._sections: Dict[str, List[int]] = header["sections"]
+        
+        for name, typecode in _COLUMNS.items():
+            setattr(self, "_" + name, self._section(name).cast(typecode))
+    
+    def _section(self, name: str) -> memoryview:
+        offset, length = self._sections[name]
+        return self._view[offset:offset + length]
+    
+    def _blob(self, name: str, offsets: memoryview, index: int) -> memoryview:
+        offset = self._sections[name][0]
+        return self._view[offset + offsets[index]:offset + offsets[index + 1]]
+    
+    # Writing
+    
+    @staticmethod
+    def write(path: str, conversations: Iterable[Union[Conversation, Dict[str, Any]]]) -> int:
+        """
+        Write conversations to a new archive file
+        
+        Args:
+            path: Destination file
+            conversations: Conversation objects or Conversation.to_dict() dictionaries
+        
+        Returns:
+            Number of messages written
+        """
+        columns = {name: array(typecode) for name, typecode in _COLUMNS.items()}
+        roles = _Interner(_ROLES)
+        models = _Interner()
+        tools = _Interner()
+        blobs = {name: tempfile.TemporaryFile() for name in _BLOBS}
+        sizes = dict.fromkeys(_BLOBS, 0)
+        
+        def put(name: str, data: bytes):
+            blobs[name].write(data)
+            sizes[name] += len(data)
+        
+        try:
+            columns["content_offsets"].append(0)
+            columns["extra_offsets"].append(0)
+            columns["conversation_starts"].append(0)
+            columns["conversation_offsets"].append(0)
+            conversation_index = 0
+            message_index = 0
+            
+            for conversation in conversations:
+                data = conversation.to_dict() if isinstance(conversation, Conversation) else conversation
+                for msg in data.get("messages", []):
+                    timestamp = datetime.fromisoformat(msg["timestamp"])
+                    model = models.code(msg.get("model"))
+                    columns["conversation"].append(conversation_index)
+                    columns["role"].append(roles.code(msg["role"]))
+                    columns["model_lo"].append(model & 0xFF)
+                    columns["model_hi"].append(model >> 8)
+                    columns["timestamp"].append(timestamp.timestamp())
+                    
+                    put("content", msg["content"].encode("utf-8"))
+                    columns["content_offsets"].append(sizes["content"])
+                    
+                    extra = {}
+                    if msg.get("tool_calls"):
+                        extra["tool_calls"] = msg["tool_calls"]
+                        for tool_call in msg["tool_calls"]:
+                            tool = tools.code(tool_call["name"])
+                            columns["tool_message"].append(message_index)
+                            columns["tool_lo"].append(tool & 0xFF)
+                            columns["tool_hi"].append(tool >> 8)
+                    if msg.get("metadata"):
+                        extra["metadata"] = msg["metadata"]
+                    if timestamp.tzinfo is not None:
+                        extra["utcoffset"] = timestamp.utcoffset().total_seconds()
+                    if extra:
+                        put("extra", json_backend.dumpb(extra))
+                    columns["extra_offsets"].append(sizes["extra"])
+                    message_index += 1
+                
+                put("conversations", json_backend.dumpb({
+                    "conversation_id": data.get("conversation_id"),
+                    "summary": data.get("summary"),
+                    "agent": data.get("agent"),
+                }))
+                columns["conversation_offsets"].append(sizes["conversations"])
+                columns["conversation_starts"].append(message_index)
+                conversation_index += 1
+            
+            order = sorted(range(message_index), key=columns["timestamp"].__getitem__)
+            columns["time_order"] = array("I", order)
+            columns["time_sorted"] = array("d", (columns["timestamp"][i] for i in order))
+            
+            header = {
+                "version": VERSION,
+                "byteorder": sys.byteorder,
+                "messages": message_index,
+                "conversations": conversation_index,
+                "tool_calls": len(columns["tool_message"]),
+                "roles": roles.values,
+                "models": models.values,
+                "tools": tools.values,
+                "sections": {},
+            }
+            
+            # Section offsets depend on the header size and vice versa;
+            # re-encode until the header fits in front of the first section
+            lengths = [(name, len(col) * col.itemsize) for name, col in columns.items()]
+            lengths += [(name, sizes[name]) for name in _BLOBS]
+            header_size = 0
+            while True:
+                offset = _HEADER.size + header_size
+                for name, length in lengths:
+                    offset = (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+                    header["sections"][name] = [offset, length]
+                    offset += length
+                header_bytes = json_backend.dumpb(header)
+                if len(header_bytes) <= header_size:
+                    break
+                header_size = len(header_bytes)
+            
+            with open(path, "wb") as f:
+                f.write(_HEADER.pack(MAGIC, len(header_bytes)))
+                f.write(header_bytes)
+                for name, _ in lengths:
+                    f.write(b"\0" * (header["sections"][name][0] - f.tell()))
+                    if name in columns:
+                        columns[name].tofile(f)
+                    else:
+                        blobs[name].seek(0)
+                        shutil.copyfileobj(blobs[name], f)
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            for blob in blobs.values():
+                blob.close()
+        
+        return message_index
+    
+    # Message access
+    
+    def __len__(self) -> int:
+        return self.message_count
+    
+    def content(self, index: int) -> memoryview:
+        """UTF-8 content of a message as a zero-copy view into the archive"""
+        return self._blob("content", self._content_offsets, index)
+    
+    def text(self, index: int) -> str:
+        """Decoded content of a message"""
+        return str(self.content(index), "utf-8")
+    
+    def role(self, index: int) -> str:
+        """Role of a message"""
+        return self.roles[self._role[index]]
+    
+    def model(self, index: int) -> Optional[str]:
+        """Model of a message"""
+        return self.models[self._model_lo[index] | self._model_hi[index] << 8]
+    
+    def conversation_of(self, index: int) -> int:
+        """Index of the conversation a message belongs to"""
+        return self._conversation[index]
+    
+    def _extra(self, index: int) -> Dict[str, Any]:
+        blob = self._blob("extra", self._extra_offsets, index)
+        return json_backend.loads(blob) if len(blob) else {}
+    
+    def timestamp(self, index: int) -> datetime:
+        """Timestamp of a message"""
+        return self._timestamp_from(index, self._extra(index))
+    
+    def _timestamp_from(self, index: int, extra: Dict[str, Any]) -> datetime:
+        if "utcoffset" in extra:
+            tz = timezone(timedelta(seconds=extra["utcoffset"]))
+            return datetime.fromtimestamp(self._timestamp[index], tz)
+        return datetime.fromtimestamp(self._timestamp[index])
+    
+    def message_dict(self, index: int) -> Dict[str, Any]:
+        """Message in the Message.to_dict() schema"""
+        extra = self._extra(index)
+        return {
+            "role": self.role(index),
+            "content": self.text(index),
+            "timestamp": self._timestamp_from(index, extra).isoformat(),
+            "model": self.model(index),
+            "tool_calls": extra.get("tool_calls", []),
+            "metadata": extra.get("metadata", {}),
+        }
+    
+    def message(self, index: int) -> Message:
+        """Materialize a Message without re-validating"""
+        extra = self._extra(index)
+        return Message.model_construct(
+            role=self.role(index),
+            content=self.text(index),
+            timestamp=self._timestamp_from(index, extra),
+            model=self.model(index),
+            tool_calls=[ToolCall.model_construct(**tc) for tc in extra.get("tool_calls", [])],
+            metadata=extra.get("metadata", {}),
+        )
+    
+    # Conversation access
+    
+    def conversation_range(self, conversation: int) -> range:
+        """Message indices belonging to a conversation"""
+        starts = self._conversation_starts
+        return range(starts[conversation], starts[conversation + 1])
+    
+    def conversation_dict(self, conversation: int) -> Dict[str, Any]:
+        """Conversation in the Conversation.to_dict() schema"""
+        data = json_backend.loads(
+            self._blob("conversations", self._conversation_offsets, conversation)
+        )
+        return {
+            "conversation_id": data["conversation_id"],
+            "messages": [self.message_dict(i) for i in self.conversation_range(conversation)],
+            "summary": data["summary"],
+            "agent": data["agent"],
+        }
+    
+    def conversation(self, conversation: int, agent: Agent, **kwargs) -> Conversation:
+        """Restore a Conversation (see Conversation.from_dict)"""
+        return Conversation.from_dict(self.conversation_dict(conversation), agent, **kwargs)
+    
+    def to_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Yield every conversation in the Conversation.to_dict() schema"""
+        for conversation in range(self.conversation_count):
+            yield self.conversation_dict(conversation)
+    
+    # Filters
+    
+    def _code_mask(self, lo: memoryview, hi: memoryview, codes: Iterable[int]) -> bytes:
+        """0/1 mask of rows whose 16-bit code is in codes"""
+        mask = bytes(len(lo))
+        by_hi: Dict[int, List[int]] = {}
+        for code in codes:
+            by_hi.setdefault(code >> 8, []).append(code & 0xFF)
+        for high, lows in by_hi.items():
+            matches = _and(
+                bytes(lo).translate(_byte_table(lows)),
+                bytes(hi).translate(_byte_table([high])),
+            )
+            mask = _or(mask, matches)
+        return mask
+    
+    def mask(
+        self,
+        role: StrFilter = None,
+        model: StrFilter = None,
+        tool_name: StrFilter = None,
+        since: TimeFilter = None,
+        until: TimeFilter = None,
+    ) -> bytes:
+        """
+        Evaluate filters over all messages
+        
+        Each filter accepts a single value or a collection of values; the
+        result holds one byte per message, 1 where every filter matches.
+        
+        Args:
+            role: Message role(s)
+            model: Model name(s); None matches messages without a model only
+                when passed inside a collection
+            tool_name: Messages calling any of these tools
+            since: Earliest timestamp (inclusive)
+            until: Latest timestamp (exclusive)
+        
+        Returns:
+            Byte mask with one entry per message
+        """
+        n = self.message_count
+        mask = b"\x01" * n
+        
+        roles = _as_set(role)
+        if roles is not None:
+            table = _byte_table(i for i, value in enumerate(self.roles) if value in roles)
+            mask = _and(mask, bytes(self._role).translate(table))
+        
+        models = _as_set(model)
+        if models is not None:
+            codes = [i for i, value in enumerate(self.models) if value in models]
+            mask = _and(mask, self._code_mask(self._model_lo, self._model_hi, codes))
+        
+        tool_names = _as_set(tool_name)
+        if tool_names is not None:
+            codes = [i for i, value in enumerate(self.tool_names) if value in tool_names]
+            calls = self._code_mask(self._tool_lo, self._tool_hi, codes)
+            matches = bytearray(n)
+            position = calls.find(1)
+            while position != -1:
+                matches[self._tool_message[position]] = 1
+                position = calls.find(1, position + 1)
+            mask = _and(mask, bytes(matches))
+        
+        start, stop = _as_posix(since), _as_posix(until)
+        if start is not None or stop is not None:
+            low = 0 if start is None else bisect_left(self._time_sorted, start)
+            high = n if stop is None else bisect_left(self._time_sorted, stop)
+            matches = bytearray(n)
+            for i in self._time_order[low:high]:
+                matches[i] = 1
+            mask = _and(mask, bytes(matches))
+        
+        return mask
+    
+    def select(self, **filters) -> List[int]:
+        """Indices of messages matching the filters (see mask())"""
+        mask = self.mask(**filters)
+        indices = []
+        position = mask.find(1)
+        while position != -1:
+            indices.append(position)
+            position = mask.find(1, position + 1)
+        return indices
+    
+    def count(self, **filters) -> int:
+        """Number of messages matching the filters (see mask())"""
+        return self.mask(**filters).count(1)
+    
+    def close(self):
+        """
+        Unmap the archive
+        
+        Views returned by content() must be released before closing.
+        """
+        for name in _COLUMNS:
+            getattr(self, "_" + name).release()
+        self._view.release()
+        self._mmap.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def __repr__(self) -> str:
+        return (
+            f"<TranscriptArchive(path='{self.path}', conversations={self.conversation_count}, "
+            f"messages={self.message_count})>"
+        )
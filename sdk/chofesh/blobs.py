@@ -0,0 +1,167 @@
+"""
+Local content-addressed storage for large tool outputs
+
+Blobs are files named by the SHA-256 of their content, so storing the
+same output twice costs nothing and a handle always refers to exactly
+one piece of content. Conversations keep only the handle; the data is
+read back in byte ranges.
+"""
+import hashlib
+import os
+import tempfile
+from typing import Optional, Tuple, Union
+
+# Prefix of blob handles placed in tool messages
+HANDLE_PREFIX = "blob:sha256:"
+
+
+def _is_continuation(byte: int) -> bool:
+    """Whether a UTF-8 byte continues a multi-byte character"""
+    return byte & 0xC0 == 0x80
+
+
+class BlobStore:
+    """Directory of immutable blobs addressed by content hash"""
+    
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize blob store
+        
+        Args:
+            path: Directory holding the blobs (default: chofesh-blobs in the
+                system temporary directory)
+        """
+        self.path = path or os.path.join(tempfile.gettempdir(), "chofesh-blobs")
+        os.makedirs(self.path, exist_ok=True)
+    
+    @staticmethod
+    def digest_of(handle: str) -> str:
+        """
+        Hex digest named by a handle
+        
+        Raises:
+            ValueError: If the handle is malformed
+        """
+        digest = handle[len(HANDLE_PREFIX):] if handle.startswith(HANDLE_PREFIX) else handle
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob handle: {handle!r}")
+        return digest
+    
+    def _file(self, handle: str) -> str:
+        digest = self.digest_of(handle)
+        return os.path.join(self.path, digest[:2], digest[2:])
+    
+    def put(self, data: Union[str, bytes]) -> str:
+        """
+        Store data
+        
+        Args:
+            data: Content; text is stored as UTF-8
+        
+        Returns:
+            Handle for the content
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        handle = HANDLE_PREFIX + hashlib.sha256(data).hexdigest()
+        file = self._file(handle)
+        if not os.path.exists(file):
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            # Write under a temporary name so readers never see a partial blob
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(file))
+            try:
+                with os.fdopen(fd, "wb") as fp:
+                    fp.write(data)
+                os.replace(temp, file)
+            except BaseException:
+                if os.path.exists(temp):
+                    os.remove(temp)
+                raise
+        return handle
+    
+    def get(self, handle: str) -> bytes:
+        """
+        Read a whole blob
+        
+        Raises:
+            KeyError: If the blob is not in the store
+        """
+        try:
+            with open(self._file(handle), "rb") as fp:
+                return fp.read()
+        except FileNotFoundError:
+            raise KeyError(handle)
+    
+    def read(self, handle: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """
+        Read a byte range without loading the rest of the blob
+        
+        Raises:
+            KeyError: If the blob is not in the store
+        """
+        try:
+            with open(self._file(handle), "rb") as fp:
+                fp.seek(offset)
+                return fp.read() if length is None else fp.read(length)
+        except FileNotFoundError:
+            raise KeyError(handle)
+    
+    def read_text(
+        self,
+        handle: str,
+        offset: int = 0,
+        length: int = 4096,
+    ) -> Tuple[str, int, int]:
+        """
+        Read about length bytes of UTF-8 text starting near offset
+        
+        The range is moved to character boundaries so no character is split
+        between pages.
+        
+        Returns:
+            Tuple of (text, start offset, end offset)
+        """
+        # Read a few extra bytes on each side to find the boundaries
+        start = max(offset - 3, 0)
+        data = self.read(handle, start, length + (offset - start) + 3)
+        begin = offset - start
+        while begin < len(data) and _is_continuation(data[begin]):
+            begin += 1
+        end = min(offset - start + length, len(data))
+        while begin < end < len(data) and _is_continuation(data[end]):
+            end -= 1
+        return data[begin:end].decode("utf-8", errors="replace"), start + begin, start + end
+    
+    def size(self, handle: str) -> int:
+        """
+        Size of a blob in bytes
+        
+        Raises:
+            KeyError: If the blob is not in the store
+        """
+        try:
+            return os.path.getsize(self._file(handle))
+        except FileNotFoundError:
+            raise KeyError(handle)
+    
+    def delete(self, handle: str) -> bool:
+        """
+        Remove a blob
+        
+        Returns:
+            True if the blob existed
+        """
+        try:
+            os.remove(self._file(handle))
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def __contains__(self, handle: str) -> bool:
+        try:
+            return os.path.exists(self._file(handle))
+        except ValueError:
+            return False
+    
+    def __repr__(self) -> str:
+        return f"<BlobStore(path='{self.path}')>"
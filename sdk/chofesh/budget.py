@@ -0,0 +1,223 @@
+"""
+Per-call budgets for agent runs
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Iterator
+from .exceptions import ToolCancelledError
+
+
+# Reasons reported when a budget runs out
+DEADLINE = "deadline"
+TOKENS = "tokens"
+TOOL_TIME = "tool_time"
+
+# Smallest timeout handed to HTTP clients once a deadline is nearly spent
+MIN_TIMEOUT = 0.001
+
+_current_budget: ContextVar[Optional["Budget"]] = ContextVar("chofesh_budget", default=None)
+
+# Monotonic time by which the running tool call must finish
+_tool_deadline: ContextVar[Optional[float]] = ContextVar("chofesh_tool_deadline", default=None)
+
+# Set when the agent run the running tool call belongs to is cancelled
+_tool_cancel: ContextVar[Optional[threading.Event]] = ContextVar("chofesh_tool_cancel", default=None)
+
+
+class Budget:
+    """Wall-clock, token and tool-time limits for a single agent call"""
+    
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_total_tokens: Optional[int] = None,
+        max_tool_time: Optional[float] = None,
+    ):
+        """
+        Initialize budget
+        
+        Args:
+            timeout: Wall-clock seconds the whole call may take
+            max_total_tokens: Maximum tokens (prompt + completion) across all LLM calls
+            max_tool_time: Maximum seconds spent executing tools
+        """
+        self.timeout = timeout
+        self.max_total_tokens = max_total_tokens
+        self.max_tool_time = max_tool_time
+        # Tool calls may finish on several threads at once
+        self._lock = threading.Lock()
+        self.start()
+    
+    def start(self):
+        """Reset counters and start the clock"""
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + self.timeout if self.timeout is not None else None
+        self.tokens_used = 0
+        self.tool_time = 0.0
+    
+    def remaining_time(self) -> Optional[float]:
+        """Seconds left before the deadline (None if unbounded)"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+    
+    def remaining_tokens(self) -> Optional[int]:
+        """Tokens left in the budget (None if unbounded)"""
+        if self.max_total_tokens is None:
+            return None
+        return self.max_total_tokens - self.tokens_used
+    
+    def remaining_tool_time(self) -> Optional[float]:
+        """Tool seconds left in the budget (None if unbounded)"""
+        if self.max_tool_time is None:
+            return None
+        return self.max_tool_time - self.tool_time
+    
+    def record_usage(self, usage: Optional[Dict[str, Any]]):
+        """Add token usage reported by the API"""
+        if not usage:
+            return
+        total = usage.get("total_tokens")
+        if total is None:
+            total = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+        self.tokens_used += total
+    
+    def record_tool_time(self, seconds: float):
+        """Add time spent executing a tool"""
+        with self._lock:
+            self.tool_time += seconds
+    
+    @property
+    def exhausted_reason(self) -> Optional[str]:
+        """Name of the first limit that ran out, if any"""
+        remaining = self.remaining_time()
+        if remaining is not None and remaining <= 0:
+            return DEADLINE
+        tokens = self.remaining_tokens()
+        if tokens is not None and tokens <= 0:
+            return TOKENS
+        tool_time = self.remaining_tool_time()
+        if tool_time is not None and tool_time <= 0:
+            return TOOL_TIME
+        return None
+    
+    @property
+    def exhausted(self) -> bool:
+        """Whether any limit has run out"""
+        return self.exhausted_reason is not None
+    
+    def timeout_for(self, default: Optional[float]) -> Optional[float]:
+        """
+        Clamp a request timeout to the remaining wall-clock budget
+        
+        Args:
+            default: Timeout the caller would use without a budget
+        
+        Returns:
+            The smaller of the default and the time left before the deadline
+        """
+        remaining = self.remaining_time()
+        if remaining is None:
+            return default
+        remaining = max(remaining, MIN_TIMEOUT)
+        if default is None:
+            return remaining
+        return min(default, remaining)
+    
+    def tool_timeout_for(self, default: Optional[float]) -> Optional[float]:
+        """
+        Clamp a tool call's timeout to the remaining wall-clock and tool time
+        
+        Args:
+            default: Timeout the call would have without a budget
+        
+        Returns:
+            The smallest of the default, the time left before the deadline
+            and the tool time left
+        """
+        timeout = self.timeout_for(default)
+        remaining = self.remaining_tool_time()
+        if remaining is None:
+            return timeout
+        remaining = max(remaining, MIN_TIMEOUT)
+        return remaining if timeout is None else min(timeout, remaining)
+    
+    def __repr__(self) -> str:
+        return (
+            f"<Budget(timeout={self.timeout}, max_total_tokens={self.max_total_tokens}, "
+            f"max_tool_time={self.max_tool_time})>"
+        )
+
+
+def current_budget() -> Optional[Budget]:
+    """Budget of the agent call running in this context, if any"""
+    return _current_budget.get()
+
+
+@contextmanager
+def use_budget(budget: Optional[Budget]) -> Iterator[Optional[Budget]]:
+    """Make a budget visible to tools executed within the block"""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+@contextmanager
+def use_tool_timeout(timeout: Optional[float]) -> Iterator[Optional[float]]:
+    """Give the tool call executed within the block a deadline"""
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    token = _tool_deadline.set(deadline)
+    try:
+        yield timeout
+    finally:
+        _tool_deadline.reset(token)
+
+
+@contextmanager
+def use_cancel_event(event: Optional[threading.Event]) -> Iterator[Optional[threading.Event]]:
+    """Let tool calls executed within the block see when their run is cancelled"""
+    token = _tool_cancel.set(event)
+    try:
+        yield event
+    finally:
+        _tool_cancel.reset(token)
+
+
+def tool_cancelled() -> bool:
+    """Whether the agent run of the running tool call was cancelled"""
+    event = _tool_cancel.get()
+    return event is not None and event.is_set()
+
+
+def tool_time_remaining() -> Optional[float]:
+    """Seconds left for the running tool call (None if unbounded)"""
+    deadline = _tool_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def effective_timeout(default: Optional[float], name: str = "tool") -> Optional[float]:
+    """
+    Timeout for an outgoing request, clamped to the active budget and tool deadline
+    
+    Args:
+        default: Timeout to use when nothing tighter applies
+        name: Tool name reported if the run was cancelled
+    
+    Raises:
+        ToolCancelledError: If the run was cancelled, so the request is not sent
+    """
+    if tool_cancelled():
+        raise ToolCancelledError(name)
+    budget = current_budget()
+    timeout = budget.timeout_for(default) if budget is not None else default
+    remaining = tool_time_remaining()
+    if remaining is None:
+        return timeout
+    remaining = max(remaining, MIN_TIMEOUT)
+    return remaining if timeout is None else min(timeout, remaining)
@@ -0,0 +1,159 @@
+"""
+Context window management for conversations
+"""
+from typing import List, Optional
+from .message import Message, MessageRole
+
+
+class ContextWindow:
+    """Trims conversation history to fit a token budget"""
+    
+    def __init__(
+        self,
+        max_tokens: int,
+        max_messages: Optional[int] = None,
+    ):
+        """
+        Initialize context window
+        
+        Args:
+            max_tokens: Token budget for the prompt (system prompt included)
+            max_messages: Optional cap on non-system messages sent per turn
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+    
+    @staticmethod
+    def count_tokens(messages: List[Message]) -> int:
+        """Estimated prompt tokens for a list of messages"""
+        return sum(msg.token_estimate for msg in messages)
+    
+    def fit(self, messages: List[Message], reserve_tokens: int = 0) -> List[Message]:
+        """
+        Select the messages to send for the next turn
+        
+        Leading system messages are always kept. The most recent turns are
+        kept newest-first until the budget is spent, and the window is then
+        aligned to start on a user message so tool results are never sent
+        without the assistant call that produced them. The latest message
+        is always included, even if it alone exceeds the budget.
+        
+        Args:
+            messages: Full conversation history
+            reserve_tokens: Tokens to leave free for the completion
+        
+        Returns:
+            Messages that fit in the window, in their original order
+        """
+        system_end = 0
+        while system_end < len(messages) and messages[system_end].role == MessageRole.SYSTEM:
+            system_end += 1
+        system = list(messages[:system_end])
+        
+        budget = self.max_tokens - reserve_tokens - self.count_tokens(system)
+        limit = self.max_messages
+        start = len(messages)
+        used = 0
+        
+        while start > system_end:
+            if limit is not None and len(messages) - start >= limit:
+                break
+            tokens = messages[start - 1].token_estimate
+            if used + tokens > budget and start < len(messages):
+                break
+            used += tokens
+            start -= 1
+        
+        if start == system_end:
+            return list(messages)
+        
+        # Align the window to a turn boundary
+        turn_start = start
+        while turn_start < len(messages) - 1 and messages[turn_start].role != MessageRole.USER:
+            turn_start += 1
+        if messages[turn_start].role == MessageRole.USER:
+            start = turn_start
+        
+        return system + list(messages[start:])
+    
+    def __repr__(self) -> str:
+        return f"<ContextWindow(max_tokens={self.max_tokens}, max_messages={self.max_messages})>"
+
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an "
+    "assistant. Update the summary with the new turns below. Keep every fact, "
+    "decision, name, number and open question that later turns may rely on. "
+    "Reply with the updated summary only."
+)
+
+
+class Compactor:
+    """Policy for folding older turns into a rolling summary"""
+    
+    def __init__(
+        self,
+        threshold_tokens: int,
+        keep_recent: int = 6,
+        max_summary_tokens: int = 512,
+        prompt: str = SUMMARY_PROMPT,
+    ):
+        """
+        Initialize compactor
+        
+        Args:
+            threshold_tokens: Unsummarized history size that triggers compaction
+            keep_recent: Number of most recent messages always kept verbatim
+            max_summary_tokens: Maximum tokens for the generated summary
+            prompt: Instructions given to the model when summarizing
+        """
+        if threshold_tokens <= 0:
+            raise ValueError("threshold_tokens must be positive")
+        self.threshold_tokens = threshold_tokens
+        self.keep_recent = keep_recent
+        self.max_summary_tokens = max_summary_tokens
+        self.prompt = prompt
+    
+    def split_point(self, messages: List[Message], start: int) -> Optional[int]:
+        """
+        Find where to cut the history for the next compaction
+        
+        Args:
+            messages: Full conversation history
+            start: Index of the first message not yet summarized
+        
+        Returns:
+            Index of the first message to keep verbatim, or None if the
+            unsummarized history is still under the threshold
+        """
+        if ContextWindow.count_tokens(messages[start:]) <= self.threshold_tokens:
+            return None
+        
+        cut = len(messages) - self.keep_recent
+        # Keep whole turns: the verbatim part starts on a user message
+        while start < cut < len(messages) and messages[cut].role != MessageRole.USER:
+            cut -= 1
+        return cut if cut > start else None
+    
+    def build_request(self, summary: Optional[str], messages: List[Message]) -> List[Message]:
+        """Messages asking the model to fold new turns into the summary"""
+        lines = []
+        if summary:
+            lines.append(f"Current summary:\n{summary}\n")
+        lines.append("New turns:")
+        for msg in messages:
+            role = msg.role.value if isinstance(msg.role, MessageRole) else msg.role
+            lines.append(f"{role}: {msg.content}")
+        
+        return [
+            Message(role=MessageRole.SYSTEM, content=self.prompt),
+            Message(role=MessageRole.USER, content="\n".join(lines)),
+        ]
+    
+    def __repr__(self) -> str:
+        return (
+            f"<Compactor(threshold_tokens={self.threshold_tokens}, "
+            f"keep_recent={self.keep_recent})>"
+        )
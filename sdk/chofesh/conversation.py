@@ -1,9 +1,128 @@
 """
 Conversation module for managing chat sessions
 """
-from typing import List, Optional, Iterator
+import asyncio
+import threading
+import uuid
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, Dict, List, Optional, Iterator, IO, Set, Tuple, TYPE_CHECKING
+from . import json_backend
 from .message import Message, MessageRole, StreamChunk
 from .agent import Agent
+from .budget import Budget
+from .context import ContextWindow, Compactor
+from .transcript import Transcript
+from .lazy import LazyMessageList, stream_conversation, CHUNK_SIZE
+from .history import MessageHistory
+from .server_state import ServerHistory
+
+if TYPE_CHECKING:
+    from .store import ConversationStore
+
+
+class _TurnQueue:
+    """
+    First-come, first-served lock shared by threads and event loops
+    
+    Each caller takes a ticket and waits until it is served, so turns run
+    one at a time in the order they were requested, whether they come from
+    threads, coroutines, or both.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned: Set[int] = set()
+        self._waiters: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+    
+    @property
+    def pending(self) -> int:
+        """Number of turns running or waiting"""
+        with self._lock:
+            return self._next_ticket - self._serving - len(self._abandoned)
+    
+    def _take_ticket(self) -> int:
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        return ticket
+    
+    def acquire(self):
+        """Wait for this thread's turn"""
+        with self._condition:
+            ticket = self._take_ticket()
+            while self._serving != ticket:
+                self._condition.wait()
+    
+    async def acquire_async(self):
+        """Wait for this task's turn without blocking the event loop"""
+        with self._lock:
+            ticket = self._take_ticket()
+            if self._serving == ticket:
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[ticket] = (asyncio.get_running_loop(), future)
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                self._waiters.pop(ticket, None)
+                granted = self._serving == ticket
+                if not granted:
+                    self._abandoned.add(ticket)
+            if granted:
+                self.release()
+            raise
+    
+    def release(self):
+        """End the current turn and wake the next caller"""
+        with self._condition:
+            self._serving += 1
+            while self._serving in self._abandoned:
+                self._abandoned.discard(self._serving)
+                self._serving += 1
+            self._condition.notify_all()
+            waiter = self._waiters.pop(self._serving, None)
+        
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(_resolve, future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _StoredEntries(Sequence):
+    """Read-only view of a history's stored entries, read on access"""
+    
+    def __init__(self, messages: Sequence):
+        self._messages = messages
+    
+    def __len__(self) -> int:
+        return len(self._messages)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._read(start, stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return self._read(index, index + 1)[0]
+    
+    def _read(self, start: int, stop: int) -> List[Any]:
+        if hasattr(self._messages, "entries"):
+            return self._messages.entries(start, stop)
+        return self._messages[start:stop]
 
 
 class Conversation:
@@ -14,6 +133,10 @@ class Conversation:
         agent: Agent,
         system_message: Optional[str] = None,
         conversation_id: Optional[str] = None,
+        context_window: Optional[ContextWindow] = None,
+        compactor: Optional[Compactor] = None,
+        store: Optional["ConversationStore"] = None,
+        server_state: bool = False,
     ):
         """
         Initialize conversation
@@ -22,46 +145,249 @@ class Conversation:
             agent: Agent instance
             system_message: Optional system message
             conversation_id: Optional conversation ID for persistence
+            context_window: Optional token budget for the history sent each turn
+            compactor: Optional policy for summarizing older turns in the background
+            store: Optional store that new messages are appended to after each turn
+            server_state: Let the API hold the history and upload only new messages
         """
+        if (store is not None or server_state) and conversation_id is None:
+            conversation_id = uuid.uuid4().hex
+        
         self.agent = agent
         self.conversation_id = conversation_id
-        self.messages: List[Message] = []
+        self.store = store
+        self.server_history = ServerHistory(conversation_id) if server_state else None
+        self.context_window = context_window
+        self.compactor = compactor
+        self.messages: List[Message] = MessageHistory()
+        
+        # Rolling summary standing in for messages[:summarized_until]
+        self.summary: Optional[Message] = None
+        self.summarized_until = 0
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._compaction_generation = 0
+        
+        # Turns run one at a time, in the order they were started
+        self._turns = _TurnQueue()
         
         if system_message:
             self.messages.append(
                 Message(role=MessageRole.SYSTEM, content=system_message)
             )
     
+    def _system_end(self) -> int:
+        """Number of leading system messages"""
+        end = 0
+        while end < len(self.messages) and self.messages[end].role == MessageRole.SYSTEM:
+            end += 1
+        return end
+    
+    def _entries(self, start: int = 0, stop: Optional[int] = None) -> List[Any]:
+        """History entries in [start, stop), in their stored (compact) form"""
+        return _StoredEntries(self.messages)[start:stop]
+    
+    def _end_turn(self):
+        """Store the finished turn compactly and persist it"""
+        if isinstance(self.messages, MessageHistory):
+            self.messages.freeze()
+        self._persist()
+    
+    def _context_messages(self, max_tokens: Optional[int] = None) -> List[Any]:
+        """Messages to send for the next turn, as stored entries"""
+        with self._compaction_lock:
+            summary, summarized_until = self.summary, self.summarized_until
+        
+        if summary is None:
+            if self.context_window is not None:
+                # Only the entries the window looks at are read
+                return self.context_window.fit(
+                    _StoredEntries(self.messages),
+                    reserve_tokens=max_tokens or 0,
+                )
+            messages = self._entries()
+        else:
+            system_end = self._system_end()
+            messages = (
+                self._entries(0, system_end)
+                + [summary]
+                + self._entries(max(summarized_until, system_end))
+            )
+        
+        if self.context_window is None:
+            return messages
+        return self.context_window.fit(messages, reserve_tokens=max_tokens or 0)
+    
+    def _server_kwargs(self) -> dict:
+        """Agent arguments for server-held history, if enabled"""
+        if self.server_history is None:
+            return {}
+        return {"server_history": self.server_history}
+    
+    def _persist(self):
+        """Append new messages to the store, if one is attached"""
+        if self.store is not None:
+            self.store.save(self)
+    
+    def _compaction_job(self):
+        """Snapshot the turns to summarize next, if compaction is due"""
+        if self.compactor is None:
+            return None
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return None
+        if self._compaction_task is not None and not self._compaction_task.done():
+            return None
+        
+        with self._compaction_lock:
+            start = max(self.summarized_until, self._system_end())
+            cut = self.compactor.split_point(_StoredEntries(self.messages), start)
+            if cut is None:
+                return None
+            previous = self.summary.content if self.summary is not None else None
+            request = self.compactor.build_request(previous, self._entries(start, cut))
+            return request, cut, self._compaction_generation
+    
+    def _apply_summary(self, response: Message, cut: int, generation: int):
+        """Install a finished summary unless the history was reset meanwhile"""
+        with self._compaction_lock:
+            if generation != self._compaction_generation:
+                return
+            self.summary = Message(
+                role=MessageRole.SYSTEM,
+                content=f"Summary of earlier conversation:\n{response.content}",
+                metadata={"summary": True},
+            )
+            self.summarized_until = cut
+        
+        if self.store is not None:
+            self.store.save_summary(self)
+    
+    def _compact(self, request: List[Message], cut: int, generation: int):
+        """Summarize in a background thread"""
+        try:
+            response = self.agent.llm.complete(
+                messages=request,
+                temperature=0.2,
+                max_tokens=self.compactor.max_summary_tokens,
+            )
+        except Exception:
+            # Keep the current state; compaction is retried after the next turn
+            return
+        self._apply_summary(response, cut, generation)
+    
+    async def _compact_async(self, request: List[Message], cut: int, generation: int):
+        """Summarize in a background task"""
+        try:
+            response = await self.agent.llm.complete_async(
+                messages=request,
+                temperature=0.2,
+                max_tokens=self.compactor.max_summary_tokens,
+            )
+        except Exception:
+            # Keep the current state; compaction is retried after the next turn
+            return
+        self._apply_summary(response, cut, generation)
+    
+    def _start_compaction(self):
+        """Start compaction in the background if history passed the threshold"""
+        job = self._compaction_job()
+        if job is None:
+            return
+        self._compaction_thread = threading.Thread(
+            target=self._compact,
+            args=job,
+            daemon=True,
+        )
+        self._compaction_thread.start()
+    
+    def _start_compaction_async(self):
+        """Schedule compaction on the running event loop"""
+        job = self._compaction_job()
+        if job is None:
+            return
+        self._compaction_task = asyncio.ensure_future(self._compact_async(*job))
+    
+    def wait_for_compaction(self, timeout: Optional[float] = None):
+        """
+        Block until a background compaction started by a sync call finishes
+        
+        Args:
+            timeout: Maximum seconds to wait
+        """
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join(timeout)
+    
+    async def wait_for_compaction_async(self):
+        """Wait for a background compaction started by an async call"""
+        task = self._compaction_task
+        if task is not None:
+            await task
+    
+    @contextmanager
+    def _turn(self):
+        """Hold the conversation for one turn"""
+        self._turns.acquire()
+        try:
+            yield
+        finally:
+            self._turns.release()
+    
+    @asynccontextmanager
+    async def _turn_async(self):
+        """Hold the conversation for one turn from a coroutine"""
+        await self._turns.acquire_async()
+        try:
+            yield
+        finally:
+            self._turns.release()
+    
+    @property
+    def pending_turns(self) -> int:
+        """Number of turns currently running or queued"""
+        return self._turns.pending
+    
     def send_message(
         self,
         content: str,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        budget: Optional[Budget] = None,
     ) -> Message:
         """
         Send a message and get response
         
+        Concurrent calls on the same conversation, from threads or tasks,
+        are queued and run one at a time in the order they were made.
+        
         Args:
             content: User message content
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            budget: Optional per-call limits passed to the agent
         
         Returns:
             Assistant response message
         """
-        # Add user message
-        user_message = Message(role=MessageRole.USER, content=content)
-        self.messages.append(user_message)
-        
-        # Get response from agent
-        response = self.agent.process(
-            self.messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        
-        # Add assistant message
-        self.messages.append(response)
+        with self._turn():
+            # Add user message
+            user_message = Message(role=MessageRole.USER, content=content)
+            self.messages.append(user_message)
+            
+            # Get response from agent
+            response = self.agent.process(
+                self._context_messages(max_tokens),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                budget=budget,
+                **self._server_kwargs()
+            )
+            
+            # Add assistant message
+            self.messages.append(response)
+            self._end_turn()
+            self._start_compaction()
         
         return response
     
@@ -70,6 +396,7 @@ class Conversation:
         content: str,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        budget: Optional[Budget] = None,
     ) -> Iterator[StreamChunk]:
         """
         Send a message and stream response
@@ -78,37 +405,44 @@ class Conversation:
             content: User message content
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            budget: Optional per-call limits passed to the agent
         
         Yields:
             Stream chunks
         """
-        # Add user message
-        user_message = Message(role=MessageRole.USER, content=content)
-        self.messages.append(user_message)
-        
-        # Stream response from agent
-        full_content = ""
-        for chunk in self.agent.stream(
-            self.messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        ):
-            full_content += chunk.content
-            yield chunk
-        
-        # Add complete assistant message
-        assistant_message = Message(
-            role=MessageRole.ASSISTANT,
-            content=full_content,
-            model=self.agent.model,
-        )
-        self.messages.append(assistant_message)
+        # The turn is held until the stream is exhausted or closed
+        with self._turn():
+            # Add user message
+            user_message = Message(role=MessageRole.USER, content=content)
+            self.messages.append(user_message)
+            
+            # Stream response from agent
+            full_content = ""
+            for chunk in self.agent.stream(
+                self._context_messages(max_tokens),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                budget=budget,
+            ):
+                full_content += chunk.content
+                yield chunk
+            
+            # Add complete assistant message
+            assistant_message = Message(
+                role=MessageRole.ASSISTANT,
+                content=full_content,
+                model=self.agent.model,
+            )
+            self.messages.append(assistant_message)
+            self._end_turn()
+            self._start_compaction()
     
     async def send_message_async(
         self,
         content: str,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        budget: Optional[Budget] = None,
     ) -> Message:
         """
         Async version of send_message()
@@ -117,60 +451,330 @@ class Conversation:
             content: User message content
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            budget: Optional per-call limits passed to the agent
         
         Returns:
             Assistant response message
         """
-        # Add user message
-        user_message = Message(role=MessageRole.USER, content=content)
-        self.messages.append(user_message)
-        
-        # Get response from agent
-        response = await self.agent.process_async(
-            self.messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        
-        # Add assistant message
-        self.messages.append(response)
+        async with self._turn_async():
+            # Add user message
+            user_message = Message(role=MessageRole.USER, content=content)
+            self.messages.append(user_message)
+            
+            # Get response from agent
+            response = await self.agent.process_async(
+                self._context_messages(max_tokens),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                budget=budget,
+                **self._server_kwargs()
+            )
+            
+            # Add assistant message
+            self.messages.append(response)
+            self._end_turn()
+            self._start_compaction_async()
         
         return response
     
     def get_messages(self) -> List[Message]:
-        """Get all messages in conversation"""
+        """Get all messages in conversation (a copy sharing the existing messages)"""
         return self.messages.copy()
     
+    def fork(self, conversation_id: Optional[str] = None) -> "Conversation":
+        """
+        Branch the conversation
+        
+        The branch shares the current history with this conversation instead
+        of copying it, so forking and each message added afterwards cost
+        O(1) regardless of history length. Message objects themselves are
+        shared and should be treated as immutable. The branch keeps the
+        agent, context window, compactor, store and rolling summary; with a
+        store or server-side state it gets its own conversation ID.
+        
+        Args:
+            conversation_id: Optional ID for the branch
+        
+        Returns:
+            New conversation starting from the current state
+        """
+        return self._branch(
+            conversation_id,
+            self.compactor,
+            self.store,
+            server_state=self.server_history is not None,
+        )
+    
+    def _branch(
+        self,
+        conversation_id: Optional[str],
+        compactor: Optional[Compactor],
+        store: Optional["ConversationStore"],
+        server_state: bool = False,
+    ) -> "Conversation":
+        """New conversation sharing the current history and summary"""
+        if not isinstance(self.messages, MessageHistory):
+            self.messages = MessageHistory.adopt(self.messages)
+        
+        branch = type(self)(
+            agent=self.agent,
+            conversation_id=conversation_id,
+            context_window=self.context_window,
+            compactor=compactor,
+            store=store,
+            server_state=server_state,
+        )
+        branch.messages = self.messages.fork()
+        with self._compaction_lock:
+            branch.summary = self.summary
+            branch.summarized_until = self.summarized_until
+        
+        return branch
+    
+    def ask_parallel(
+        self,
+        contents: List[str],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        max_workers: Optional[int] = None,
+    ) -> List[Message]:
+        """
+        Ask independent questions about the current history in parallel
+        
+        Each question is sent from its own branch of a snapshot taken
+        between turns; the conversation itself is left unchanged. Use
+        fork() to keep a branch and continue from it.
+        
+        Args:
+            contents: User messages, one per sub-query
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            max_workers: Maximum threads (default: one per sub-query)
+        
+        Returns:
+            Responses in the order of contents
+        """
+        if not contents:
+            return []
+        with self._turn():
+            branches = [self._branch(None, None, None) for _ in contents]
+        
+        with ThreadPoolExecutor(max_workers=max_workers or len(contents)) as executor:
+            return list(executor.map(
+                lambda branch, content: branch.send_message(
+                    content, temperature=temperature, max_tokens=max_tokens
+                ),
+                branches,
+                contents,
+            ))
+    
+    async def ask_parallel_async(
+        self,
+        contents: List[str],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+    ) -> List[Message]:
+        """
+        Async version of ask_parallel()
+        
+        Args:
+            contents: User messages, one per sub-query
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+        
+        Returns:
+            Responses in the order of contents
+        """
+        async with self._turn_async():
+            branches = [self._branch(None, None, None) for _ in contents]
+        
+        return list(await asyncio.gather(*(
+            branch.send_message_async(content, temperature=temperature, max_tokens=max_tokens)
+            for branch, content in zip(branches, contents)
+        )))
+    
     def clear(self):
         """Clear conversation history (except system message)"""
         system_messages = [
             msg for msg in self.messages
             if msg.role == MessageRole.SYSTEM
         ]
-        self.messages = system_messages
+        self.messages = MessageHistory(system_messages)
+        
+        with self._compaction_lock:
+            self.summary = None
+            self.summarized_until = 0
+            self._compaction_generation += 1
+        
+        if self.store is not None:
+            self.store.save(self, rewrite=True)
+    
+    def _summary_dict(self) -> Optional[dict]:
+        """Serialized summary state"""
+        with self._compaction_lock:
+            summary, summarized_until = self.summary, self.summarized_until
+        if summary is None:
+            return None
+        return {
+            "message": summary.to_dict(),
+            "summarized_until": summarized_until,
+        }
+    
+    def _agent_dict(self) -> dict:
+        """Serialized agent description"""
+        return {
+            "model": self.agent.model,
+            "tools": [tool.name for tool in self.agent.tools],
+        }
     
     def to_dict(self) -> dict:
         """Convert conversation to dictionary"""
+        if isinstance(self.messages, LazyMessageList):
+            messages = list(self.messages.iter_dicts())
+        else:
+            messages = [entry.to_dict() for entry in self._entries()]
+        
         return {
             "conversation_id": self.conversation_id,
-            "messages": [msg.to_dict() for msg in self.messages],
-            "agent": {
-                "model": self.agent.model,
-                "tools": [tool.name for tool in self.agent.tools],
-            }
+            "messages": messages,
+            "summary": self._summary_dict(),
+            "agent": self._agent_dict(),
         }
     
     @classmethod
-    def from_dict(cls, data: dict, agent: Agent) -> "Conversation":
-        """Create conversation from dictionary"""
+    def from_dict(
+        cls,
+        data: dict,
+        agent: Agent,
+        lazy: bool = False,
+        **kwargs
+    ) -> "Conversation":
+        """
+        Create conversation from dictionary
+        
+        Args:
+            data: Dictionary produced by to_dict()
+            agent: Agent instance
+            lazy: Parse messages on first access instead of up front
+            **kwargs: Additional Conversation options (context_window, compactor)
+        
+        Returns:
+            Restored conversation
+        """
         conversation = cls(
             agent=agent,
             conversation_id=data.get("conversation_id"),
+            **kwargs
         )
         
-        conversation.messages = [
-            Message.from_dict(msg_data)
-            for msg_data in data.get("messages", [])
-        ]
+        if lazy:
+            conversation.messages = LazyMessageList(data.get("messages", []))
+        else:
+            conversation.messages = MessageHistory(
+                Message.from_dict(msg_data)
+                for msg_data in data.get("messages", [])
+            )
+            conversation.messages.freeze()
+        
+        summary = data.get("summary")
+        if summary:
+            conversation.summary = Message.from_dict(summary["message"])
+            conversation.summarized_until = summary["summarized_until"]
+        
+        return conversation
+    
+    def dump(self, fp: IO[str]):
+        """
+        Write the to_dict() document to a text file one message at a time
+        
+        Messages loaded lazily and never accessed are written back from
+        their original JSON without being parsed.
         
+        Args:
+            fp: Writable text file-like object
+        """
+        if isinstance(self.messages, LazyMessageList):
+            pieces = self.messages.iter_json()
+        else:
+            pieces = (entry.to_json() for entry in self._entries())
+        
+        fp.write('{"conversation_id":' + json_backend.dumps(self.conversation_id))
+        fp.write(',"messages":[')
+        for index, piece in enumerate(pieces):
+            if index:
+                fp.write(",")
+            fp.write(piece)
+        fp.write('],"summary":' + json_backend.dumps(self._summary_dict()))
+        fp.write(',"agent":' + json_backend.dumps(self._agent_dict()) + "}")
+    
+    @classmethod
+    def load(
+        cls,
+        fp: IO,
+        agent: Agent,
+        lazy: bool = True,
+        chunk_size: int = CHUNK_SIZE,
+        **kwargs
+    ) -> "Conversation":
+        """
+        Stream a conversation from a file written by dump() or to_json()
+        
+        Args:
+            fp: Text or binary file-like object
+            agent: Agent instance
+            lazy: Parse messages on first access instead of up front
+            chunk_size: Read size while streaming
+            **kwargs: Additional Conversation options (context_window, compactor)
+        
+        Returns:
+            Restored conversation
+        """
+        header, raw_messages = stream_conversation(fp, chunk_size)
+        
+        conversation = cls(
+            agent=agent,
+            conversation_id=header.get("conversation_id"),
+            **kwargs
+        )
+        
+        messages = LazyMessageList(raw_messages)
+        if lazy:
+            conversation.messages = messages
+        else:
+            conversation.messages = MessageHistory(messages.entries())
+            conversation.messages.freeze()
+        
+        summary = header.get("summary")
+        if summary:
+            conversation.summary = Message.from_dict(summary["message"])
+            conversation.summarized_until = summary["summarized_until"]
+        
+        return conversation
+    
+    def to_json(self) -> str:
+        """Convert conversation to a JSON string"""
+        return json_backend.dumps(self.to_dict())
+    
+    @classmethod
+    def from_json(cls, data, agent: Agent, **kwargs) -> "Conversation":
+        """Create conversation from a JSON string or bytes"""
+        return cls.from_dict(json_backend.loads(data), agent, **kwargs)
+    
+    def to_transcript(self) -> Transcript:
+        """Convert the message history to a compact Transcript"""
+        transcript = Transcript()
+        transcript.extend(self._entries())
+        return transcript
+    
+    @classmethod
+    def from_transcript(
+        cls,
+        transcript: Transcript,
+        agent: Agent,
+        conversation_id: Optional[str] = None,
+        **kwargs
+    ) -> "Conversation":
+        """Create conversation from a compact Transcript"""
+        conversation = cls(agent=agent, conversation_id=conversation_id, **kwargs)
+        conversation.messages = MessageHistory.adopt(tuple(transcript))
         return conversation
@@ -30,6 +30,14 @@ class RateLimitError(APIError):
         self.retry_after = retry_after
 
 
+class SequenceMismatchError(APIError):
+    """Raised when the server-held conversation history is out of sync"""
+    
+    def __init__(self, message: str = "Conversation sequence mismatch", sequence: int = None):
+        super().__init__(message, status_code=409)
+        self.sequence = sequence
+
+
 class ToolExecutionError(ChofeshError):
     """Raised when tool execution fails"""
     
@@ -39,6 +47,53 @@ class ToolExecutionError(ChofeshError):
         self.original_error = original_error
 
 
+class ToolValidationError(ToolExecutionError):
+    """Raised when tool arguments do not match the tool's parameter schema"""
+    
+    def __init__(self, tool_name: str, errors: list):
+        ChofeshError.__init__(
+            self, f"Invalid arguments for tool '{tool_name}': " + "; ".join(errors)
+        )
+        self.tool_name = tool_name
+        self.errors = list(errors)
+        self.original_error = None
+
+
+class ToolTimeoutError(ToolExecutionError):
+    """Raised when a tool call runs past its timeout"""
+    
+    def __init__(self, tool_name: str, timeout: float):
+        ChofeshError.__init__(
+            self, f"Tool '{tool_name}' timed out after {timeout:g}s"
+        )
+        self.tool_name = tool_name
+        self.timeout = timeout
+        self.original_error = None
+
+
+class ToolOutcomeUnknownError(ToolTimeoutError):
+    """Raised when a call with side effects ran past its timeout and may still complete"""
+    
+    def __init__(self, tool_name: str, timeout: float):
+        ChofeshError.__init__(
+            self,
+            f"Tool '{tool_name}' did not finish within {timeout:g}s and is still running; "
+            "its outcome is unknown, so check whether it took effect before retrying",
+        )
+        self.tool_name = tool_name
+        self.timeout = timeout
+        self.original_error = None
+
+
+class ToolCancelledError(ToolExecutionError):
+    """Raised when the agent run a tool call belongs to was cancelled"""
+    
+    def __init__(self, tool_name: str):
+        ChofeshError.__init__(self, f"Tool '{tool_name}' was cancelled")
+        self.tool_name = tool_name
+        self.original_error = None
+
+
 class ValidationError(ChofeshError):
     """Raised when input validation fails"""
     pass
@@ -47,3 +102,11 @@ class ValidationError(ChofeshError):
 class ConfigurationError(ChofeshError):
     """Raised when configuration is invalid"""
     pass
+
+
+class BudgetExceededError(ChofeshError):
+    """Raised when a budget runs out before any answer is available"""
+    
+    def __init__(self, reason: str, message: str = None):
+        super().__init__(message or f"Budget exhausted: {reason}")
+        self.reason = reason
@@ -0,0 +1,232 @@
+"""
+Persistent message history with cheap copies
+
+`MessageHistory` stores messages as a chain of frozen segments plus a
+mutable tail. Copying or forking freezes the tail and shares every
+segment with the copy, so a branch costs only the messages appended to
+it afterwards. Segments are merged binary-counter style as they are
+frozen, which keeps the chain O(log n) long.
+
+Frozen messages are stored as `CompactMessage` entries and turned back
+into `Message` objects only when read; `entries()` hands out the stored
+form for building requests. A message read from the history is the same
+object for as long as someone holds it, but it is not written back, so
+messages should be treated as immutable once frozen.
+"""
+from collections.abc import MutableSequence, Sequence
+from typing import Any, Iterable, Iterator, List, Optional
+from .message import Message
+from .transcript import _compact_entry, _expand_entry
+
+
+class _Segment:
+    """Immutable run of messages on top of an older segment"""
+    
+    __slots__ = ("prev", "items", "start", "end")
+    
+    def __init__(self, prev: Optional["_Segment"], items: Sequence):
+        self.prev = prev
+        self.items = items
+        self.start = prev.end if prev is not None else 0
+        self.end = self.start + len(items)
+    
+    @staticmethod
+    def mergeable(items: Sequence) -> bool:
+        """Plain lists and tuples can be merged; lazy sequences are kept as-is"""
+        return isinstance(items, (list, tuple))
+    
+    @classmethod
+    def freeze(cls, prev: Optional["_Segment"], items: Sequence) -> "_Segment":
+        """Push items as a new segment, merging it with smaller segments below"""
+        if cls.mergeable(items):
+            items = tuple(_compact_entry(item) for item in items)
+            while (
+                prev is not None
+                and cls.mergeable(prev.items)
+                and len(prev.items) <= len(items)
+            ):
+                items = tuple(_compact_entry(item) for item in prev.items) + items
+                prev = prev.prev
+        return cls(prev, items)
+    
+    def chain(self) -> List["_Segment"]:
+        """Segments from the oldest to this one"""
+        segments = []
+        segment = self
+        while segment is not None:
+            segments.append(segment)
+            segment = segment.prev
+        segments.reverse()
+        return segments
+
+
+class MessageHistory(MutableSequence):
+    """Mutable message list whose copies share their common prefix"""
+    
+    def __init__(self, messages: Iterable[Message] = ()):
+        """
+        Initialize message history
+        
+        Args:
+            messages: Initial messages (copied)
+        """
+        self._base: Optional[_Segment] = None
+        self._tail: List[Message] = list(messages)
+    
+    @classmethod
+    def adopt(cls, messages: Sequence) -> "MessageHistory":
+        """
+        Wrap an existing sequence without copying it
+        
+        The sequence becomes the frozen prefix of the history and must not
+        be modified afterwards. Lazy sequences keep parsing on access.
+        """
+        history = cls()
+        if len(messages):
+            history._base = _Segment(None, messages)
+        return history
+    
+    @property
+    def _base_len(self) -> int:
+        return self._base.end if self._base is not None else 0
+    
+    def freeze(self):
+        """Move appended messages into the shared, compactly stored prefix"""
+        if self._tail:
+            self._base = _Segment.freeze(self._base, self._tail)
+            self._tail = []
+    
+    def fork(self) -> "MessageHistory":
+        """Copy that shares all current messages with this history"""
+        self.freeze()
+        history = MessageHistory()
+        history._base = self._base
+        return history
+    
+    def copy(self) -> "MessageHistory":
+        """Same as fork(); list-compatible shallow copy"""
+        return self.fork()
+    
+    def _materialize(self):
+        """Detach from shared segments before modifying the prefix"""
+        if self._base is not None:
+            self._tail = list(self)
+            self._base = None
+    
+    def _lookup(self, index: int) -> Message:
+        segment = self._base
+        while index < segment.start:
+            segment = segment.prev
+        return _expand_entry(segment.items[index - segment.start])
+    
+    def _iter_range(self, start: int, stop: int) -> Iterator[Any]:
+        """Stored entries in [start, stop) without touching the others"""
+        base_len = self._base_len
+        if start < base_len:
+            for segment in self._base.chain():
+                if segment.end <= start:
+                    continue
+                if segment.start >= stop:
+                    break
+                low = max(start, segment.start) - segment.start
+                high = min(stop, segment.end) - segment.start
+                # Slicing lets lazy segments read the range in one go
+                items = segment.items
+                yield from items.entries(low, high) if hasattr(items, "entries") else items[low:high]
+        if stop > base_len:
+            yield from self._tail[max(start - base_len, 0):stop - base_len]
+    
+    def entries(self, start: int = 0, stop: Optional[int] = None) -> List[Any]:
+        """
+        Stored entries in [start, stop) without building Message objects
+        
+        Frozen messages come back as `CompactMessage` entries, which
+        provide the role, content, token_estimate and wire_bytes() used to
+        fit and encode requests.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return list(self._iter_range(start, stop)) if stop > start else []
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return [_expand_entry(entry) for entry in self.entries(start, stop)]
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        base_len = self._base_len
+        if index >= base_len:
+            return self._tail[index - base_len]
+        return self._lookup(index)
+    
+    def __setitem__(self, index, value):
+        if isinstance(index, slice) or self._normalize(index) < self._base_len:
+            self._materialize()
+            self._tail[index] = value
+        else:
+            self._tail[self._normalize(index) - self._base_len] = value
+    
+    def __delitem__(self, index):
+        if isinstance(index, slice) or self._normalize(index) < self._base_len:
+            self._materialize()
+            del self._tail[index]
+        else:
+            del self._tail[self._normalize(index) - self._base_len]
+    
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return index
+    
+    def insert(self, index: int, value: Message):
+        """Insert a message"""
+        if index < 0:
+            index = max(index + len(self), 0)
+        if index < self._base_len:
+            self._materialize()
+            self._tail.insert(index, value)
+        else:
+            self._tail.insert(index - self._base_len, value)
+    
+    def append(self, value: Message):
+        """Append a message"""
+        self._tail.append(value)
+    
+    def extend(self, values: Iterable[Message]):
+        """Append several messages"""
+        self._tail.extend(values)
+    
+    def __len__(self) -> int:
+        return self._base_len + len(self._tail)
+    
+    def resident(self) -> Iterator[Any]:
+        """Entries held in memory, without loading or parsing lazy segments"""
+        if self._base is not None:
+            for segment in self._base.chain():
+                items = segment.items
+                yield from items.resident() if hasattr(items, "resident") else items
+        yield from self._tail
+    
+    def __iter__(self) -> Iterator[Message]:
+        if self._base is not None:
+            for segment in self._base.chain():
+                for entry in segment.items:
+                    yield _expand_entry(entry)
+        yield from self._tail
+    
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (list, tuple, MessageHistory)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    def __add__(self, other: Iterable[Message]) -> List[Message]:
+        return list(self) + list(other)
+    
+    def __repr__(self) -> str:
+        depth = len(self._base.chain()) if self._base is not None else 0
+        return f"<MessageHistory(messages={len(self)}, shared_segments={depth})>"
@@ -0,0 +1,98 @@
+"""
+JSON encoding backend for Chofesh SDK
+
+Uses orjson or msgspec when installed and falls back to the standard
+library otherwise. All backends produce compact output.
+"""
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+
+# Exceptions raised by loads() for malformed input, usable in except clauses
+DecodeError = (ValueError, msgspec.DecodeError) if MSGSPEC_AVAILABLE else (ValueError,)
+
+_SEPARATORS = (",", ":")
+
+
+def _stdlib_dumpb(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    return json.dumps(
+        obj, separators=_SEPARATORS, ensure_ascii=False, default=default
+    ).encode("utf-8")
+
+
+def _stdlib_loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _orjson_dumpb(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    try:
+        return orjson.dumps(obj, default=default)
+    except TypeError:
+        # orjson rejects non-string keys and integers beyond 64 bits
+        return _stdlib_dumpb(obj, default)
+
+
+def _msgspec_dumpb(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    try:
+        return msgspec.json.encode(obj, enc_hook=default)
+    except (TypeError, NotImplementedError, OverflowError):
+        return _stdlib_dumpb(obj, default)
+
+
+_BACKENDS = {"json": (_stdlib_dumpb, _stdlib_loads)}
+if MSGSPEC_AVAILABLE:
+    _BACKENDS["msgspec"] = (_msgspec_dumpb, msgspec.json.decode)
+if ORJSON_AVAILABLE:
+    _BACKENDS["orjson"] = (_orjson_dumpb, orjson.loads)
+
+BACKEND = "orjson" if ORJSON_AVAILABLE else "msgspec" if MSGSPEC_AVAILABLE else "json"
+_dumpb, _loads = _BACKENDS[BACKEND]
+
+
+def set_backend(name: str):
+    """
+    Select the JSON backend
+    
+    Args:
+        name: "orjson", "msgspec" or "json"
+    """
+    global BACKEND, _dumpb, _loads
+    if name not in _BACKENDS:
+        raise ValueError(f"JSON backend '{name}' is not available")
+    BACKEND = name
+    _dumpb, _loads = _BACKENDS[name]
+
+
+def dumpb(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Encode an object as compact UTF-8 JSON bytes
+    
+    Args:
+        obj: Object to encode
+        default: Optional hook converting unsupported objects
+    """
+    return _dumpb(obj, default)
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """Encode an object as a compact JSON string"""
+    return _dumpb(obj, default).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Decode JSON from a string or bytes"""
+    return _loads(data)
@@ -0,0 +1,333 @@
+"""
+Lazy loading of persisted conversation histories
+"""
+import codecs
+import re
+from collections.abc import MutableSequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union, IO
+from . import json_backend
+from .message import Message
+from .transcript import _compact_entry, _expand_entry
+
+RawMessage = Union[Dict[str, Any], str, bytes]
+
+# Characters JSON allows between tokens
+_WHITESPACE = " \t\n\r"
+
+# A bracket, or a string up to its closing quote (group 1) or the end of the buffer
+_TOKEN = re.compile(r'[{}\[\]]|"[^"\\]*(?:\\.[^"\\]*)*("?)', re.DOTALL)
+
+# Rest of a string that began in an earlier chunk
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*("?)', re.DOTALL)
+
+# Regex pieces for matching a whole nested value at once
+_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_PLAIN = r'[^{}\[\]"]*'
+
+
+def _container_pattern(levels: int) -> str:
+    """Regex for an object or array nested at most `levels` deep"""
+    inner = _STRING if levels == 1 else f"(?:{_STRING}|{_container_pattern(levels - 1)})"
+    return rf'[{{\[]{_PLAIN}(?:{inner}{_PLAIN})*[}}\]]'
+
+
+# A whole message-sized value in one match; deeper or split values are scanned
+_SHALLOW_VALUE = re.compile(_container_pattern(4), re.DOTALL)
+
+# Characters that end a number or literal
+_SCALAR_END = re.compile(r'[ \t\n\r,:}\]]')
+
+# Default read size when streaming from a file-like object
+CHUNK_SIZE = 64 * 1024
+
+
+class LazyMessageList(MutableSequence):
+    """
+    List of messages parsed on first access
+    
+    Entries start out as raw `Message.to_dict()` dictionaries or their JSON
+    text and are turned into `Message` objects only when read. Parsed and
+    appended messages are kept as `CompactMessage` entries in place of the
+    raw ones, and unparsed entries can be written back out without ever
+    being parsed.
+    """
+    
+    def __init__(self, raw: Iterable[RawMessage] = ()):
+        """
+        Initialize lazy message list
+        
+        Args:
+            raw: Message dictionaries or JSON strings/bytes
+        """
+        self._raw: List[Optional[RawMessage]] = list(raw)
+        self._messages: List[Any] = [None] * len(self._raw)
+    
+    def _parse(self, index: int) -> Message:
+        """Parse the entry at a non-negative index"""
+        entry = self._messages[index]
+        if entry is not None:
+            return _expand_entry(entry)
+        raw = self._raw[index]
+        if not isinstance(raw, dict):
+            raw = json_backend.loads(raw)
+        message = Message.from_dict(raw)
+        self._messages[index] = _compact_entry(message)
+        self._raw[index] = None
+        return message
+    
+    def _entry(self, index: int) -> Any:
+        """Stored entry at a non-negative index, parsing it if needed"""
+        if self._messages[index] is None:
+            self._parse(index)
+        return self._messages[index]
+    
+    def entries(self, start: int = 0, stop: Optional[int] = None) -> List[Any]:
+        """Parsed entries in [start, stop), compact where possible, without building Messages"""
+        return [self._entry(i) for i in range(*slice(start, stop).indices(len(self)))]
+    
+    @property
+    def parsed_count(self) -> int:
+        """Number of entries already parsed into Message objects"""
+        return sum(1 for message in self._messages if message is not None)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._parse(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return self._parse(index)
+    
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            values = [_compact_entry(item) for item in value]
+            self._messages[index] = values
+            self._raw[index] = [None] * len(values)
+        else:
+            self._messages[index] = _compact_entry(value)
+            self._raw[index] = None
+    
+    def __delitem__(self, index):
+        del self._messages[index]
+        del self._raw[index]
+    
+    def __len__(self) -> int:
+        return len(self._messages)
+    
+    def __iter__(self) -> Iterator[Message]:
+        for index in range(len(self)):
+            yield self._parse(index)
+    
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (list, LazyMessageList)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    def insert(self, index: int, value: Message):
+        """Insert a parsed message"""
+        self._messages.insert(index, _compact_entry(value))
+        self._raw.insert(index, None)
+    
+    def append(self, value: Message):
+        """Append a parsed message"""
+        self._messages.append(_compact_entry(value))
+        self._raw.append(None)
+    
+    def copy(self) -> List[Message]:
+        """Parse all entries and return them as a list"""
+        return list(self)
+    
+    def resident(self) -> Iterator[Union[Message, RawMessage]]:
+        """Entries held in memory: parsed messages, or raw entries not parsed yet"""
+        for message, raw in zip(self._messages, self._raw):
+            yield message if message is not None else raw
+    
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Yield to_dict() dictionaries without parsing unparsed entries into Messages"""
+        for message, raw in zip(self._messages, self._raw):
+            if message is not None:
+                yield message.to_dict()
+            elif isinstance(raw, dict):
+                yield raw
+            else:
+                yield json_backend.loads(raw)
+    
+    def iter_json(self) -> Iterator[str]:
+        """Yield each entry as JSON text, reusing raw text where available"""
+        for message, raw in zip(self._messages, self._raw):
+            if message is not None:
+                yield message.to_json()
+            elif isinstance(raw, str):
+                yield raw
+            elif isinstance(raw, bytes):
+                yield raw.decode("utf-8")
+            else:
+                yield json_backend.dumps(raw)
+    
+    def __repr__(self) -> str:
+        return f"<LazyMessageList(messages={len(self)}, parsed={self.parsed_count})>"
+
+
+class _StreamReader:
+    """Incremental JSON tokenizer over a file-like object"""
+    
+    def __init__(self, fp: IO, chunk_size: int = CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+    
+    def _fill(self) -> bool:
+        """Read another chunk; returns False at end of input"""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it ('' at end)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+    
+    def expect(self, char: str):
+        """Consume a structural character"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}, found {found!r}")
+        self.pos += 1
+    
+    def raw_text(self) -> str:
+        """
+        Source text of the next complete JSON value, without decoding it
+        
+        The end of the value is found by tracking bracket depth outside
+        strings. When the value runs past the buffer, the text so far is
+        kept and scanning resumes where it stopped in the next chunk, so
+        each character is scanned once however many chunks the value spans.
+        """
+        first = self.peek()
+        if not first or first in ",:]}":
+            raise ValueError(f"Expected a value at offset {self.pos}, found {first!r}")
+        
+        if first in "{[":
+            match = _SHALLOW_VALUE.match(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.end()
+                return match.group()
+        
+        pieces: List[str] = []
+        depth = 0
+        in_string = False
+        scalar = first not in '{["'
+        i = self.pos
+        while True:
+            buffer = self.buffer
+            end = len(buffer)
+            if scalar:
+                match = _SCALAR_END.search(buffer, i)
+                if match is not None:
+                    return self._take(pieces, match.start())
+                i = end
+            else:
+                if in_string:
+                    match = _STRING_REST.match(buffer, i)
+                    i = match.end()
+                    if match.group(1):
+                        in_string = False
+                        if not depth:
+                            return self._take(pieces, i)
+                if not in_string:
+                    for match in _TOKEN.finditer(buffer, i):
+                        i = match.end()
+                        token = match.group()
+                        if token == "{" or token == "[":
+                            depth += 1
+                            continue
+                        if token == "}" or token == "]":
+                            depth -= 1
+                        elif not match.group(1):
+                            # String continues in the next chunk
+                            in_string = True
+                            break
+                        if not depth:
+                            return self._take(pieces, i)
+                    else:
+                        i = end
+            
+            # Keep what was scanned; an unfinished escape stays in the buffer
+            pieces.append(buffer[self.pos:i])
+            self.pos = i
+            if not self._fill():
+                if scalar:
+                    return self._take(pieces, end)
+                raise ValueError(f"Unexpected end of input inside a value at offset {end}")
+            i = 0
+    
+    def _take(self, pieces: List[str], end: int) -> str:
+        """Consume the buffer up to end and join it onto the pieces of a value"""
+        pieces.append(self.buffer[self.pos:end])
+        self.pos = end
+        return "".join(pieces)
+    
+    def raw_value(self) -> Any:
+        """Decode the next complete JSON value"""
+        return json_backend.loads(self.raw_text())
+
+
+def stream_conversation(
+    fp: IO,
+    chunk_size: int = CHUNK_SIZE,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Read a Conversation.to_dict() document incrementally
+    
+    The input is read in chunks rather than loaded and decoded as a whole,
+    and messages are returned as their JSON text so they can be parsed
+    lazily later.
+    
+    Args:
+        fp: Text or binary file-like object
+        chunk_size: Bytes or characters read at a time
+    
+    Returns:
+        Tuple of (top-level fields except messages, raw message JSON strings)
+    """
+    reader = _StreamReader(fp, chunk_size)
+    header: Dict[str, Any] = {}
+    messages: List[str] = []
+    
+    reader.expect("{")
+    while reader.peek() != "}":
+        key = reader.raw_value()
+        reader.expect(":")
+        
+        if key == "messages":
+            reader.expect("[")
+            while reader.peek() != "]":
+                messages.append(reader.raw_text())
+                if reader.peek() == ",":
+                    reader.expect(",")
+            reader.expect("]")
+        else:
+            header[key] = reader.raw_value()
+        
+        if reader.peek() == ",":
+            reader.expect(",")
+    reader.expect("}")
+    
+    return header, messages
@@ -0,0 +1,280 @@
+"""
+Adaptive concurrency limits for model and tool calls
+
+AdaptiveLimiter caps the number of calls in flight and tunes the cap
+from what the calls report back, additive-increase/multiplicative-
+decrease style: the limit creeps up while latency stays near its
+baseline, and is cut when a call is rate limited (429) or its latency
+spikes. Calls that started before a cut do not cut again, so one burst
+of slow responses costs one decrease rather than one per response.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Hashable, Iterator, Optional, Tuple
+import requests
+from .exceptions import RateLimitError, ToolTimeoutError
+
+# Errors whose elapsed time is still a latency sample (a timeout is a very slow call)
+_TIMEOUT_ERRORS = (
+    requests.exceptions.Timeout,
+    asyncio.TimeoutError,
+    concurrent.futures.TimeoutError,
+    ToolTimeoutError,
+)
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to latency and rate-limit feedback
+    
+    Usable from threads (`track`) and from asyncio (`track_async`) at the
+    same time. Latency baselines are kept per key, so calls with very
+    different normal latencies (e.g. different tools) can share one limit.
+    """
+    
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        backoff: float = 0.9,
+        drop_backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize adaptive limiter
+        
+        Args:
+            initial_limit: Calls allowed in flight at first
+            min_limit: Lowest the limit is cut to
+            max_limit: Highest the limit grows to
+            backoff: Factor applied to the limit on a latency spike
+            drop_backoff: Factor applied to the limit on a rate-limit error
+            latency_tolerance: A call slower than this multiple of the
+                baseline latency counts as a spike
+            smoothing: Weight of each new sample in the baseline latency
+            clock: Time source for latency measurements
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.drop_backoff = drop_backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.clock = clock
+        
+        self.samples = 0
+        self.drops = 0
+        self.spikes = 0
+        
+        self._limit = float(initial_limit)
+        self._inflight = 0
+        self._baselines: Dict[Hashable, float] = {}
+        self._last_cut = float("-inf")
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+    
+    @property
+    def limit(self) -> int:
+        """Calls currently allowed in flight"""
+        return int(self._limit)
+    
+    @property
+    def inflight(self) -> int:
+        """Calls currently in flight"""
+        return self._inflight
+    
+    def baseline(self, key: Hashable = None) -> Optional[float]:
+        """Smoothed latency for a key, once it has a sample"""
+        return self._baselines.get(key)
+    
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a free slot
+        
+        Returns:
+            False if no slot freed up within timeout
+        """
+        with self._available:
+            if not self._available.wait_for(
+                lambda: self._inflight < int(self._limit), timeout
+            ):
+                return False
+            self._inflight += 1
+            return True
+    
+    async def acquire_async(self):
+        """Wait for a free slot without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._inflight < int(self._limit) and not self._async_waiters:
+                self._inflight += 1
+                return
+            future = loop.create_future()
+            self._async_waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._async_waiters:
+                    self._async_waiters.remove((loop, future))
+                    raise
+            if not future.cancelled():
+                # Granted just as the waiter was cancelled
+                self._release_slot()
+            raise
+    
+    def _grant(self, future: asyncio.Future):
+        # Runs on the waiter's loop; a waiter cancelled meanwhile gives the slot back
+        if future.cancelled():
+            self._release_slot()
+        else:
+            future.set_result(None)
+    
+    def _wake(self):
+        """Hand free slots to async waiters first, then to threads; call with the lock held"""
+        while self._async_waiters and self._inflight < int(self._limit):
+            loop, future = self._async_waiters.popleft()
+            self._inflight += 1
+            loop.call_soon_threadsafe(self._grant, future)
+        if self._inflight < int(self._limit):
+            self._available.notify_all()
+    
+    def _release_slot(self):
+        with self._lock:
+            self._inflight -= 1
+            self._wake()
+    
+    def release(
+        self,
+        latency: Optional[float] = None,
+        dropped: bool = False,
+        started: Optional[float] = None,
+        key: Hashable = None,
+    ):
+        """
+        Free a slot and adjust the limit
+        
+        Args:
+            latency: Seconds the call took (None: no sample, e.g. it failed)
+            dropped: Whether the call was rejected for overload (429)
+            started: Clock time the call started; calls older than the last
+                cut do not cut again
+            key: Latency baseline the sample belongs to
+        """
+        with self._lock:
+            self._inflight -= 1
+            recent = started is None or started >= self._last_cut
+            if dropped:
+                self.drops += 1
+                if recent:
+                    self._cut(self.drop_backoff)
+            elif latency is not None:
+                self.samples += 1
+                baseline = self._baselines.get(key)
+                if baseline is None:
+                    self._baselines[key] = latency
+                else:
+                    if latency > baseline * self.latency_tolerance:
+                        self.spikes += 1
+                        if recent:
+                            self._cut(self.backoff)
+                    elif self._inflight + 1 >= self._limit / 2:
+                        # Only grow a limit that is actually being used
+                        self._limit = min(self._limit + 1 / self._limit, float(self.max_limit))
+                    self._baselines[key] = baseline + self.smoothing * (latency - baseline)
+            self._wake()
+    
+    def _cut(self, factor: float):
+        self._limit = max(self._limit * factor, float(self.min_limit))
+        self._last_cut = self.clock()
+    
+    def _outcome(self, error: BaseException, elapsed: float) -> Dict[str, Any]:
+        """release() arguments for a call that raised"""
+        if isinstance(error, RateLimitError):
+            return {"dropped": True}
+        if isinstance(error, _TIMEOUT_ERRORS):
+            return {"latency": elapsed}
+        return {}
+    
+    def settle(self, started: float, key: Hashable = None, error: Optional[BaseException] = None):
+        """
+        Free a slot taken with acquire() once its call has ended
+        
+        For calls that end somewhere other than where they started, such as
+        a worker thread outliving the caller that gave up on it; track()
+        does the same itself.
+        
+        Args:
+            started: Clock time the call started
+            key: Latency baseline the sample belongs to
+            error: What the call raised, if anything
+        """
+        elapsed = self.clock() - started
+        if error is None:
+            self.release(elapsed, started=started, key=key)
+        else:
+            self.release(started=started, key=key, **self._outcome(error, elapsed))
+    
+    @contextmanager
+    def track(self, key: Hashable = None, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Hold a slot for the duration of a call and learn from its outcome
+        
+        Raises:
+            concurrent.futures.TimeoutError: If no slot freed up within timeout
+        """
+        if not self.acquire(timeout):
+            raise concurrent.futures.TimeoutError(f"No slot freed up within {timeout:g}s")
+        started = self.clock()
+        try:
+            yield
+        except BaseException as e:
+            self.settle(started, key, e)
+            raise
+        self.settle(started, key)
+    
+    @asynccontextmanager
+    async def track_async(
+        self,
+        key: Hashable = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[None]:
+        """
+        Async version of track()
+        
+        Raises:
+            asyncio.TimeoutError: If no slot freed up within timeout
+        """
+        await asyncio.wait_for(self.acquire_async(), timeout)
+        started = self.clock()
+        try:
+            yield
+        except BaseException as e:
+            self.settle(started, key, e)
+            raise
+        self.settle(started, key)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current limit and counters, for export to monitoring"""
+        return {
+            "limit": self.limit,
+            "inflight": self._inflight,
+            "waiting": len(self._async_waiters),
+            "samples": self.samples,
+            "drops": self.drops,
+            "spikes": self.spikes,
+        }
+    
+    def __repr__(self) -> str:
+        return f"<AdaptiveLimiter(limit={self.limit}, inflight={self._inflight})>"
@@ -1,11 +1,78 @@
 """
 LLM module for interacting with Chofesh AI models
 """
+import hashlib
 import os
-from typing import Optional, List, Dict, Any, Iterator
+import time
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 import requests
-from .message import Message, MessageRole, StreamChunk
-from .exceptions import APIError, AuthenticationError, RateLimitError
+from . import json_backend
+from .message import Message, MessageRole, StreamChunk, ToolCall
+from .exceptions import APIError, AuthenticationError, RateLimitError, SequenceMismatchError
+from .server_state import ServerHistory
+from .limits import AdaptiveLimiter
+from .budget import MIN_TIMEOUT
+
+
+class _StreamedToolCall:
+    """
+    Tool call assembled from streamed fragments
+    
+    Tracks bracket depth as argument text arrives, so the call is known to
+    be complete as soon as its JSON object closes rather than when the
+    response ends.
+    """
+    
+    def __init__(self):
+        self.id = ""
+        self.name = ""
+        self.arguments: List[str] = []
+        self.complete = False
+        self.emitted = False
+        self._depth = 0
+        self._opened = False
+        self._in_string = False
+        self._escaped = False
+    
+    def add(self, fragment: Dict[str, Any]):
+        """Add one tool_calls delta"""
+        self.id = fragment.get("id") or self.id
+        function = fragment.get("function") or {}
+        self.name += function.get("name") or ""
+        text = function.get("arguments") or ""
+        if not text:
+            return
+        self.arguments.append(text)
+        if self.complete:
+            return
+        for char in text:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                self._opened = True
+            elif char in "}]":
+                self._depth -= 1
+                if self._opened and self._depth == 0:
+                    self.complete = self._parses()
+                    break
+    
+    def _parses(self) -> bool:
+        try:
+            json_backend.loads("".join(self.arguments))
+            return True
+        except json_backend.DecodeError:
+            return False
+    
+    def to_tool_call(self) -> ToolCall:
+        return LLM._tool_call(self.id, self.name, "".join(self.arguments))
 
 
 class LLM:
@@ -17,6 +84,7 @@ class LLM:
         api_key: Optional[str] = None,
         api_url: Optional[str] = None,
         timeout: int = 60,
+        limiter: Optional[AdaptiveLimiter] = None,
     ):
         """
         Initialize LLM client
@@ -26,11 +94,24 @@ class LLM:
             api_key: Chofesh API key (or set CHOFESH_API_KEY env var)
             api_url: API base URL (default: https://chofesh.ai/api)
             timeout: Request timeout in seconds
+            limiter: Adaptive limit on completion requests in flight; share
+                one between clients that call the same backend. Waiting for a
+                slot counts against the request timeout
         """
         self.model = model
         self.api_key = api_key or os.getenv("CHOFESH_API_KEY")
         self.api_url = api_url or os.getenv("CHOFESH_API_URL", "https://chofesh.ai/api")
         self.timeout = timeout
+        self.limiter = limiter
+        
+        # Prompt tokens reported by the API, and how many were served from its prefix cache
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+    
+    @property
+    def cache_hit_rate(self) -> float:
+        """Fraction of prompt tokens served from the backend's prefix cache"""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
     
     def _get_headers(self) -> Dict[str, str]:
         """Get request headers"""
@@ -44,6 +125,149 @@ class LLM:
             "Content-Type": "application/json",
         }
     
+    def _encode_request(
+        self,
+        messages: List[Message],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]],
+        stream: bool,
+        **kwargs
+    ) -> Tuple[bytes, int]:
+        """
+        Encode a chat completions request body
+        
+        Fields are ordered model, tools, messages, then per-request settings,
+        so successive requests in an agent run share the longest possible
+        byte prefix. Each message contributes its cached wire encoding, so
+        only messages that are new or changed since the last request are
+        serialized.
+        
+        Returns:
+            Tuple of (body, length of the stable prefix: model, tools and
+            leading system messages)
+        """
+        fields: Dict[str, Any] = {
+            "model": self.model,
+            "temperature": temperature,
+            "stream": stream,
+        }
+        
+        if max_tokens:
+            fields["max_tokens"] = max_tokens
+        
+        if tools:
+            fields["tools"] = tools
+        
+        fields.update(kwargs)
+        
+        parts = [b'{"model":', json_backend.dumpb(fields.pop("model"))]
+        if fields.get("tools"):
+            tools = fields.pop("tools")
+            encoded_tools = (
+                tools.wire_bytes() if hasattr(tools, "wire_bytes")
+                else json_backend.dumpb(tools)
+            )
+            parts += [b',"tools":', encoded_tools]
+        
+        if "messages" in fields:
+            prefix_length = sum(map(len, parts))
+            parts += [b',"messages":', json_backend.dumpb(fields.pop("messages"))]
+        else:
+            encoded = [msg.wire_bytes() for msg in messages]
+            system = 0
+            while system < len(messages) and messages[system].role == MessageRole.SYSTEM:
+                system += 1
+            parts += [b',"messages":[', b",".join(encoded[:system])]
+            prefix_length = sum(map(len, parts))
+            if system and system < len(encoded):
+                parts.append(b",")
+            parts += [b",".join(encoded[system:]), b"]"]
+        
+        rest = json_backend.dumpb(fields)[1:-1]
+        if rest:
+            parts += [b",", rest]
+        parts.append(b"}")
+        return b"".join(parts), prefix_length
+    
+    def _build_body(
+        self,
+        messages: List[Message],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]],
+        stream: bool,
+        **kwargs
+    ) -> bytes:
+        """Encode a chat completions request body (see _encode_request)"""
+        return self._encode_request(
+            messages, temperature, max_tokens, tools, stream, **kwargs
+        )[0]
+    
+    @staticmethod
+    def prefix_fingerprint(body: bytes, prefix_length: int) -> str:
+        """Hash of the stable request prefix, sent so the backend can reuse cached work"""
+        return hashlib.blake2b(memoryview(body)[:prefix_length], digest_size=16).hexdigest()
+    
+    def _request_headers(self, body: bytes, prefix_length: int) -> Dict[str, str]:
+        """Headers for a completion request, including the prefix fingerprint"""
+        headers = self._get_headers()
+        headers["X-Prefix-Fingerprint"] = self.prefix_fingerprint(body, prefix_length)
+        return headers
+    
+    def _record_usage(self, usage: Dict[str, Any]) -> int:
+        """Add a response's usage to the prefix cache counters; returns cached tokens"""
+        details = usage.get("prompt_tokens_details") or {}
+        cached = (
+            details.get("cached_tokens")
+            or usage.get("cached_tokens")
+            or usage.get("cache_read_input_tokens")
+            or 0
+        )
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.cached_tokens += cached
+        return cached
+    
+    @staticmethod
+    def _tool_call(call_id: str, name: str, args: Any) -> ToolCall:
+        """Build a tool call, parsing its arguments if they are a string"""
+        raw_arguments = None
+        if isinstance(args, str):
+            try:
+                args = json_backend.loads(args)
+            except json_backend.DecodeError:
+                raw_arguments = args
+        if not isinstance(args, dict):
+            # Keep the original text so the agent can report it to the model
+            raw_arguments = raw_arguments if raw_arguments is not None else str(args)
+            args = {}
+        return ToolCall(id=call_id, name=name, parameters=args, raw_arguments=raw_arguments)
+    
+    def _parse_completion(self, data: Dict[str, Any]) -> Message:
+        """Build the assistant message from a completion response"""
+        choice = data["choices"][0]
+        message_data = choice["message"]
+        
+        # Parse tool calls if present
+        tool_calls = [
+            self._tool_call(tc["id"], tc["function"]["name"], tc["function"]["arguments"])
+            for tc in message_data.get("tool_calls") or []
+        ]
+        
+        usage = data.get("usage", {})
+        
+        return Message(
+            role=MessageRole.ASSISTANT,
+            content=message_data.get("content", ""),
+            model=self.model,
+            tool_calls=tool_calls,
+            metadata={
+                "usage": usage,
+                "cached_tokens": self._record_usage(usage),
+                "finish_reason": choice.get("finish_reason"),
+            }
+        )
+    
     def _handle_error(self, response: requests.Response):
         """Handle API error responses"""
         if response.status_code == 401:
@@ -60,18 +284,50 @@ class LLM:
             except:
                 message = response.text
             
+            if isinstance(message, dict) and message.get("code") == "sequence_mismatch":
+                raise SequenceMismatchError(
+                    message.get("message", "Conversation sequence mismatch"),
+                    sequence=message.get("sequence"),
+                )
+            
             raise APIError(
                 message=message,
                 status_code=response.status_code,
                 response=error_data if 'error_data' in locals() else None
             )
     
+    def _post(self, request: Tuple[bytes, int], timeout: Optional[float]) -> Dict[str, Any]:
+        """Send a non-streaming completion request and decode the response"""
+        if self.limiter is None:
+            return self._send(request, timeout)
+        # Waiting for a slot counts against the request's timeout
+        timeout = timeout if timeout is not None else self.timeout
+        deadline = time.monotonic() + timeout
+        with self.limiter.track(timeout=timeout):
+            return self._send(request, max(deadline - time.monotonic(), MIN_TIMEOUT))
+    
+    def _send(self, request: Tuple[bytes, int], timeout: Optional[float]) -> Dict[str, Any]:
+        body = request[0]
+        response = requests.post(
+            f"{self.api_url}/chat/completions",
+            headers=self._request_headers(*request),
+            data=body,
+            timeout=timeout if timeout is not None else self.timeout,
+        )
+        
+        if response.status_code != 200:
+            self._handle_error(response)
+        
+        return json_backend.loads(response.content)
+    
     def complete(
         self,
         messages: List[Message],
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         tools: Optional[List[Dict[str, Any]]] = None,
+        timeout: Optional[float] = None,
+        server_history: Optional[ServerHistory] = None,
         **kwargs
     ) -> Message:
         """
@@ -82,76 +338,40 @@ class LLM:
             temperature: Sampling temperature (0.0 to 2.0)
             max_tokens: Maximum tokens to generate
             tools: Available tools for the model
+            timeout: Request timeout in seconds (overrides the client default)
+            server_history: Upload only messages the server does not hold yet
             **kwargs: Additional model parameters
         
         Returns:
             Assistant message response
         """
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": msg.role.value if isinstance(msg.role, MessageRole) else msg.role,
-                    "content": msg.content
-                }
-                for msg in messages
-            ],
-            "temperature": temperature,
-            "stream": False,
-        }
-        
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
-        
-        if tools:
-            payload["tools"] = tools
-        
-        payload.update(kwargs)
-        
-        response = requests.post(
-            f"{self.api_url}/chat/completions",
-            headers=self._get_headers(),
-            json=payload,
-            timeout=self.timeout,
-        )
-        
-        if response.status_code != 200:
-            self._handle_error(response)
+        def request(upload: List[Message], **extra) -> Dict[str, Any]:
+            encoded = self._encode_request(
+                upload,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                tools=tools,
+                stream=False,
+                **extra,
+                **kwargs
+            )
+            return self._post(encoded, timeout)
         
-        data = response.json()
-        choice = data["choices"][0]
-        message_data = choice["message"]
+        if server_history is None:
+            return self._parse_completion(request(messages))
         
-        # Parse tool calls if present
-        tool_calls = []
-        if "tool_calls" in message_data:
-            import json
-            from .message import ToolCall
-            for tc in message_data["tool_calls"]:
-                # Parse arguments if it's a string
-                args = tc["function"]["arguments"]
-                if isinstance(args, str):
-                    try:
-                        args = json.loads(args)
-                    except json.JSONDecodeError:
-                        args = {}  # Use empty dict if parsing fails
-                
-                tool_calls.append(ToolCall(
-                    id=tc["id"],
-                    name=tc["function"]["name"],
-                    parameters=args,
-                ))
+        upload, conversation = server_history.prepare(messages)
+        try:
+            data = request(upload, conversation=conversation)
+        except SequenceMismatchError:
+            # Server lost or diverged from our history; send all of it
+            server_history.reset()
+            upload, conversation = server_history.prepare(messages)
+            data = request(upload, conversation=conversation)
         
-        return Message(
-            role=MessageRole.ASSISTANT,
-            content=message_data.get("content", ""),
-            model=self.model,
-            tool_calls=tool_calls,
-            metadata={
-                "usage": data.get("usage", {}),
-                "finish_reason": choice.get("finish_reason"),
-            }
-        )
+        response = self._parse_completion(data)
+        server_history.commit(messages, response, data)
+        return response
     
     def stream(
         self,
@@ -159,6 +379,7 @@ class LLM:
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         tools: Optional[List[Dict[str, Any]]] = None,
+        timeout: Optional[float] = None,
         **kwargs
     ) -> Iterator[StreamChunk]:
         """
@@ -169,73 +390,134 @@ class LLM:
             temperature: Sampling temperature (0.0 to 2.0)
             max_tokens: Maximum tokens to generate
             tools: Available tools for the model
+            timeout: Request timeout in seconds (overrides the client default)
             **kwargs: Additional model parameters
         
         Yields:
             Stream chunks
         """
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": msg.role.value if isinstance(msg.role, MessageRole) else msg.role,
-                    "content": msg.content
-                }
-                for msg in messages
-            ],
-            "temperature": temperature,
-            "stream": True,
-        }
-        
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
-        
-        if tools:
-            payload["tools"] = tools
-        
-        payload.update(kwargs)
+        body, prefix_length = self._encode_request(
+            messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            tools=tools,
+            stream=True,
+            **kwargs
+        )
         
         response = requests.post(
             f"{self.api_url}/chat/completions",
-            headers=self._get_headers(),
-            json=payload,
-            timeout=self.timeout,
+            headers=self._request_headers(body, prefix_length),
+            data=body,
+            timeout=timeout if timeout is not None else self.timeout,
             stream=True,
         )
         
         if response.status_code != 200:
             self._handle_error(response)
         
+        # Tool calls arrive as argument fragments keyed by index
+        pending: Dict[int, _StreamedToolCall] = {}
+        
+        def flush() -> Iterator[StreamChunk]:
+            for index in sorted(pending):
+                call = pending[index]
+                if not call.emitted:
+                    call.emitted = True
+                    yield StreamChunk(content="", tool_call=call.to_tool_call())
+        
         for line in response.iter_lines():
             if not line:
                 continue
             
-            line = line.decode('utf-8')
-            if line.startswith('data: '):
+            if line.startswith(b'data: '):
                 line = line[6:]
             
-            if line == '[DONE]':
+            if line == b'[DONE]':
+                yield from flush()
                 yield StreamChunk(content="", is_final=True)
                 break
             
             try:
-                import json
-                data = json.loads(line)
-                choice = data["choices"][0]
-                delta = choice.get("delta", {})
-                
-                content = delta.get("content", "")
-                is_final = choice.get("finish_reason") is not None
-                
-                yield StreamChunk(
-                    content=content,
-                    is_final=is_final,
-                    metadata={
-                        "finish_reason": choice.get("finish_reason"),
-                    }
-                )
-            except json.JSONDecodeError:
+                data = json_backend.loads(line)
+            except json_backend.DecodeError:
+                continue
+            
+            usage = data.get("usage")
+            if usage:
+                self._record_usage(usage)
+            if not data.get("choices"):
+                # Usage-only chunk sent after the last choice
+                if usage:
+                    yield StreamChunk(content="", metadata={"usage": usage})
                 continue
+            
+            choice = data["choices"][0]
+            delta = choice.get("delta") or {}
+            
+            for fragment in delta.get("tool_calls") or []:
+                index = fragment.get("index", len(pending))
+                call = pending.get(index)
+                if call is None:
+                    call = pending[index] = _StreamedToolCall()
+                call.add(fragment)
+                if call.complete and not call.emitted:
+                    # Arguments are whole: hand the call over before the response ends
+                    call.emitted = True
+                    yield StreamChunk(content="", tool_call=call.to_tool_call())
+            
+            content = delta.get("content") or ""
+            is_final = choice.get("finish_reason") is not None
+            if is_final:
+                yield from flush()
+            
+            metadata = {"finish_reason": choice.get("finish_reason")}
+            if usage:
+                metadata["usage"] = usage
+            yield StreamChunk(content=content, is_final=is_final, metadata=metadata)
+        
+        yield from flush()
+    
+    async def _post_async(self, request: Tuple[bytes, int], timeout: Optional[float]) -> Dict[str, Any]:
+        """Async version of _post()"""
+        if self.limiter is None:
+            return await self._send_async(request, timeout)
+        timeout = timeout if timeout is not None else self.timeout
+        deadline = time.monotonic() + timeout
+        async with self.limiter.track_async(timeout=timeout):
+            return await self._send_async(request, max(deadline - time.monotonic(), MIN_TIMEOUT))
+    
+    async def _send_async(self, request: Tuple[bytes, int], timeout: Optional[float]) -> Dict[str, Any]:
+        import aiohttp
+        
+        body = request[0]
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                f"{self.api_url}/chat/completions",
+                headers=self._request_headers(*request),
+                data=body,
+                timeout=aiohttp.ClientTimeout(
+                    total=timeout if timeout is not None else self.timeout
+                ),
+            ) as response:
+                if response.status != 200:
+                    # Create a mock response object for error handling
+                    class MockResponse:
+                        def __init__(self, status, text, headers):
+                            self.status_code = status
+                            self.text = text
+                            self.headers = headers
+                        def json(self):
+                            return json_backend.loads(self.text)
+                    
+                    mock_resp = MockResponse(
+                        response.status,
+                        await response.text(),
+                        response.headers
+                    )
+                    self._handle_error(mock_resp)
+                
+                return await response.json(loads=json_backend.loads)
     
     async def complete_async(
         self,
@@ -243,6 +525,8 @@ class LLM:
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         tools: Optional[List[Dict[str, Any]]] = None,
+        timeout: Optional[float] = None,
+        server_history: Optional[ServerHistory] = None,
         **kwargs
     ) -> Message:
         """
@@ -253,90 +537,37 @@ class LLM:
             temperature: Sampling temperature (0.0 to 2.0)
             max_tokens: Maximum tokens to generate
             tools: Available tools for the model
+            timeout: Request timeout in seconds (overrides the client default)
+            server_history: Upload only messages the server does not hold yet
             **kwargs: Additional model parameters
         
         Returns:
             Assistant message response
         """
-        import aiohttp
-        
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": msg.role.value if isinstance(msg.role, MessageRole) else msg.role,
-                    "content": msg.content
-                }
-                for msg in messages
-            ],
-            "temperature": temperature,
-            "stream": False,
-        }
-        
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
+        async def request(upload: List[Message], **extra) -> Dict[str, Any]:
+            encoded = self._encode_request(
+                upload,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                tools=tools,
+                stream=False,
+                **extra,
+                **kwargs
+            )
+            return await self._post_async(encoded, timeout)
         
-        if tools:
-            payload["tools"] = tools
+        if server_history is None:
+            return self._parse_completion(await request(messages))
         
-        payload.update(kwargs)
+        upload, conversation = server_history.prepare(messages)
+        try:
+            data = await request(upload, conversation=conversation)
+        except SequenceMismatchError:
+            # Server lost or diverged from our history; send all of it
+            server_history.reset()
+            upload, conversation = server_history.prepare(messages)
+            data = await request(upload, conversation=conversation)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.api_url}/chat/completions",
-                headers=self._get_headers(),
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=self.timeout),
-            ) as response:
-                if response.status != 200:
-                    # Create a mock response object for error handling
-                    class MockResponse:
-                        def __init__(self, status, text, headers):
-                            self.status_code = status
-                            self.text = text
-                            self.headers = headers
-                        def json(self):
-                            import json
-                            return json.loads(self.text)
-                    
-                    mock_resp = MockResponse(
-                        response.status,
-                        await response.text(),
-                        response.headers
-                    )
-                    self._handle_error(mock_resp)
-                
-                data = await response.json()
-                choice = data["choices"][0]
-                message_data = choice["message"]
-                
-                # Parse tool calls if present
-                tool_calls = []
-                if "tool_calls" in message_data:
-                    import json
-                    from .message import ToolCall
-                    for tc in message_data["tool_calls"]:
-                        # Parse arguments if it's a string
-                        args = tc["function"]["arguments"]
-                        if isinstance(args, str):
-                            try:
-                                args = json.loads(args)
-                            except json.JSONDecodeError:
-                                args = {}  # Use empty dict if parsing fails
-                        
-                        tool_calls.append(ToolCall(
-                            id=tc["id"],
-                            name=tc["function"]["name"],
-                            parameters=args,
-                        ))
-                
-                return Message(
-                    role=MessageRole.ASSISTANT,
-                    content=message_data.get("content", ""),
-                    model=self.model,
-                    tool_calls=tool_calls,
-                    metadata={
-                        "usage": data.get("usage", {}),
-                        "finish_reason": choice.get("finish_reason"),
-                    }
-                )
+        response = self._parse_completion(data)
+        server_history.commit(messages, response, data)
+        return response
@@ -4,7 +4,25 @@ Message data models for Chofesh SDK
 from enum import Enum
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
+from . import json_backend
+
+
+# Rough characters-per-token ratio used for fast token estimates
+CHARS_PER_TOKEN = 4
+
+# Tokens added per message for role and framing
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast approximate token count for a piece of text"""
+    if not text:
+        return 0
+    if text.isascii():
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    # Non-ASCII scripts pack fewer characters into each token
+    return (len(text.encode("utf-8")) + 2) // 3
 
 
 class MessageRole(str, Enum):
@@ -22,6 +40,8 @@ class ToolCall(BaseModel):
     parameters: Dict[str, Any]
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    # Argument text the model sent when it was not a JSON object (not persisted)
+    raw_arguments: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert tool call to dictionary"""
@@ -56,6 +76,40 @@ class Message(BaseModel):
     
     model_config = ConfigDict(use_enum_values=True)
     
+    _token_estimate: Optional[int] = PrivateAttr(default=None)
+    _wire_bytes: Optional[bytes] = PrivateAttr(default=None)
+    
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        # Any field change invalidates cached derived values
+        if not name.startswith("_"):
+            self._token_estimate = None
+            self._wire_bytes = None
+    
+    def to_wire(self) -> Dict[str, Any]:
+        """Convert message to the chat completions request format"""
+        return {
+            "role": self.role.value if isinstance(self.role, MessageRole) else self.role,
+            "content": self.content,
+        }
+    
+    def wire_bytes(self) -> bytes:
+        """JSON encoding of to_wire() (cached until the message changes)"""
+        if self._wire_bytes is None:
+            self._wire_bytes = json_backend.dumpb(self.to_wire())
+        return self._wire_bytes
+    
+    def wire_json(self) -> str:
+        """JSON encoding of to_wire() as a string"""
+        return self.wire_bytes().decode("utf-8")
+    
+    @property
+    def token_estimate(self) -> int:
+        """Approximate prompt tokens for this message (cached until it changes)"""
+        if self._token_estimate is None:
+            self._token_estimate = estimate_tokens(self.content) + MESSAGE_TOKEN_OVERHEAD
+        return self._token_estimate
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert message to dictionary"""
         return {
@@ -91,6 +145,15 @@ class Message(BaseModel):
             tool_calls=tool_calls,
             metadata=data.get("metadata", {}),
         )
+    
+    def to_json(self) -> str:
+        """Convert message to a JSON string"""
+        return json_backend.dumps(self.to_dict())
+    
+    @classmethod
+    def from_json(cls, data) -> "Message":
+        """Create message from a JSON string or bytes"""
+        return cls.from_dict(json_backend.loads(data))
 
 
 class StreamChunk(BaseModel):
@@ -0,0 +1,332 @@
+"""
+Fair scheduling of agent runs across tenants
+
+An AgentPool admits jobs (typically `Agent.process_async` runs) under a
+global concurrency limit and a per-tenant one. Waiting jobs are ordered
+by priority class first (interactive before batch) and, within a class,
+by start-time fair queuing: each tenant advances a virtual clock by
+cost / weight per job, so a tenant that queues many jobs waits behind
+tenants that queued few, in proportion to their weights.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+from .agent import Agent
+from .message import Message
+
+# Priority classes; every interactive job is admitted before any batch job
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+DEFAULT_TENANT = "default"
+
+# Idle tenants whose fair-queuing tags are kept before stale ones are dropped
+MAX_IDLE_TENANTS = 1024
+
+T = TypeVar("T")
+
+
+class PoolStats:
+    """Counters for an AgentPool"""
+    
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.admitted = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+    
+    @property
+    def mean_wait(self) -> float:
+        """Average seconds admitted jobs spent queued"""
+        return self.wait_time / self.admitted if self.admitted else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert stats to dictionary"""
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "admitted": self.admitted,
+            "mean_wait": self.mean_wait,
+            "max_wait": self.max_wait,
+        }
+    
+    def __repr__(self) -> str:
+        return (
+            f"<PoolStats(submitted={self.submitted}, completed={self.completed}, "
+            f"failed={self.failed}, cancelled={self.cancelled})>"
+        )
+
+
+class _Entry:
+    """Queued job: its fair-queuing tag and the future that admits it"""
+    
+    __slots__ = ("tenant", "priority", "start_tag", "seq", "queued_at", "admitted")
+    
+    def __init__(
+        self,
+        tenant: str,
+        priority: str,
+        start_tag: float,
+        seq: int,
+        admitted: asyncio.Future,
+    ):
+        self.tenant = tenant
+        self.priority = priority
+        self.start_tag = start_tag
+        self.seq = seq
+        self.queued_at = time.monotonic()
+        self.admitted = admitted
+
+
+class _PriorityClass:
+    """Per-tenant queues and virtual clock of one priority class"""
+    
+    def __init__(self):
+        self.queues: Dict[str, Deque[_Entry]] = {}
+        self.finish_tags: Dict[str, float] = {}
+        self.virtual_time = 0.0
+    
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+
+class AgentPool:
+    """
+    Runs agent jobs with global and per-tenant concurrency limits
+    
+    Jobs are coroutines started only once the pool admits them; until then
+    they wait without holding a slot. A caller that is cancelled while
+    waiting leaves the queue. The pool belongs to a single event loop.
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_per_tenant: Optional[int] = 4,
+        weights: Optional[Dict[str, float]] = None,
+        tenant_limits: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Initialize agent pool
+        
+        Args:
+            max_concurrency: Jobs running at once across all tenants
+            max_per_tenant: Jobs one tenant may run at once (None: no limit)
+            weights: Fair-queuing weight per tenant (default 1.0); a tenant
+                with weight 2 gets twice the share of a contended pool
+            tenant_limits: Per-tenant overrides of max_per_tenant
+        """
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+        
+        self.max_concurrency = max_concurrency
+        self.max_per_tenant = max_per_tenant
+        self.weights = dict(weights or {})
+        self.tenant_limits = dict(tenant_limits or {})
+        self.stats = PoolStats()
+        
+        self._classes = {priority: _PriorityClass() for priority in PRIORITIES}
+        self._running: Dict[str, int] = {}
+        self._seq = 0
+    
+    @property
+    def running(self) -> int:
+        """Jobs currently running"""
+        return sum(self._running.values())
+    
+    def queue_depth(self, tenant: Optional[str] = None, priority: Optional[str] = None) -> int:
+        """Jobs waiting, optionally only for one tenant or priority class"""
+        classes = [self._classes[priority]] if priority else self._classes.values()
+        return sum(
+            len(queue)
+            for cls in classes
+            for name, queue in cls.queues.items()
+            if tenant is None or name == tenant
+        )
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depths, running jobs and counters, for export to monitoring"""
+        queued_by_tenant: Dict[str, int] = {}
+        for cls in self._classes.values():
+            for name, queue in cls.queues.items():
+                if queue:
+                    queued_by_tenant[name] = queued_by_tenant.get(name, 0) + len(queue)
+        return {
+            "running": self.running,
+            "queued": self.queue_depth(),
+            "queued_by_priority": {
+                priority: len(cls) for priority, cls in self._classes.items()
+            },
+            "queued_by_tenant": queued_by_tenant,
+            "running_by_tenant": {name: n for name, n in self._running.items() if n},
+            "max_concurrency": self.max_concurrency,
+            **self.stats.to_dict(),
+        }
+    
+    def _tenant_limit(self, tenant: str) -> Optional[int]:
+        return self.tenant_limits.get(tenant, self.max_per_tenant)
+    
+    def _has_room(self, tenant: str) -> bool:
+        limit = self._tenant_limit(tenant)
+        return limit is None or self._running.get(tenant, 0) < limit
+    
+    def _enqueue(self, tenant: str, priority: str, cost: float) -> _Entry:
+        cls = self._classes[priority]
+        if len(cls.finish_tags) > len(cls.queues) + MAX_IDLE_TENANTS:
+            # Tags at or behind the clock carry no history; forget idle tenants
+            cls.finish_tags = {
+                name: tag for name, tag in cls.finish_tags.items() if tag > cls.virtual_time
+            }
+        weight = self.weights.get(tenant, 1.0)
+        start_tag = max(cls.virtual_time, cls.finish_tags.get(tenant, 0.0))
+        cls.finish_tags[tenant] = start_tag + cost / weight
+        
+        self._seq += 1
+        entry = _Entry(
+            tenant, priority, start_tag, self._seq,
+            asyncio.get_running_loop().create_future(),
+        )
+        cls.queues.setdefault(tenant, deque()).append(entry)
+        self.stats.submitted += 1
+        return entry
+    
+    def _next_entry(self) -> Optional[_Entry]:
+        """Earliest-tagged waiting job, by priority class, whose tenant has room"""
+        for cls in self._classes.values():
+            best = None
+            for tenant, queue in cls.queues.items():
+                if queue and self._has_room(tenant):
+                    head = queue[0]
+                    if best is None or (head.start_tag, head.seq) < (best.start_tag, best.seq):
+                        best = head
+            if best is not None:
+                return best
+        return None
+    
+    def _dispatch(self):
+        """Admit waiting jobs while there are free slots"""
+        while self.running < self.max_concurrency:
+            entry = self._next_entry()
+            if entry is None:
+                return
+            cls = self._classes[entry.priority]
+            queue = cls.queues[entry.tenant]
+            queue.popleft()
+            if not queue:
+                del cls.queues[entry.tenant]
+            cls.virtual_time = max(cls.virtual_time, entry.start_tag)
+            
+            self._running[entry.tenant] = self._running.get(entry.tenant, 0) + 1
+            waited = time.monotonic() - entry.queued_at
+            self.stats.admitted += 1
+            self.stats.wait_time += waited
+            self.stats.max_wait = max(self.stats.max_wait, waited)
+            entry.admitted.set_result(None)
+    
+    def _remove(self, entry: _Entry):
+        cls = self._classes[entry.priority]
+        queue = cls.queues.get(entry.tenant)
+        if queue is not None and entry in queue:
+            queue.remove(entry)
+            if not queue:
+                del cls.queues[entry.tenant]
+    
+    def _release(self, entry: _Entry):
+        self._running[entry.tenant] -= 1
+        if not self._running[entry.tenant]:
+            del self._running[entry.tenant]
+        self._dispatch()
+    
+    async def run(
+        self,
+        job: Callable[[], Awaitable[T]],
+        tenant: str = DEFAULT_TENANT,
+        priority: str = INTERACTIVE,
+        cost: float = 1.0,
+    ) -> T:
+        """
+        Run a job once the pool admits it
+        
+        Args:
+            job: Called with no arguments when admitted; returns the awaitable
+            tenant: Tenant the job is accounted to
+            priority: INTERACTIVE or BATCH
+            cost: Relative size of the job for fair queuing (e.g. expected
+                tool iterations); larger jobs push their tenant further back
+        
+        Returns:
+            The job's result
+        """
+        if priority not in self._classes:
+            raise ValueError(f"Unknown priority class: {priority!r}")
+        if cost <= 0:
+            raise ValueError("cost must be positive")
+        
+        entry = self._enqueue(tenant, priority, cost)
+        self._dispatch()
+        try:
+            await entry.admitted
+        except asyncio.CancelledError:
+            if entry.admitted.done() and not entry.admitted.cancelled():
+                # Admitted just as the caller was cancelled: hand the slot on
+                self._release(entry)
+            else:
+                self._remove(entry)
+            self.stats.cancelled += 1
+            raise
+        
+        try:
+            result = await job()
+        except asyncio.CancelledError:
+            self.stats.cancelled += 1
+            raise
+        except BaseException:
+            self.stats.failed += 1
+            raise
+        finally:
+            self._release(entry)
+        self.stats.completed += 1
+        return result
+    
+    async def process(
+        self,
+        agent: Agent,
+        messages: List[Message],
+        tenant: str = DEFAULT_TENANT,
+        priority: str = INTERACTIVE,
+        cost: float = 1.0,
+        **kwargs: Any
+    ) -> Message:
+        """
+        Run `agent.process_async(messages, **kwargs)` through the pool
+        
+        Args:
+            agent: Agent to run
+            messages: Messages for the agent
+            tenant: Tenant the run is accounted to
+            priority: INTERACTIVE or BATCH
+            cost: Relative size of the run for fair queuing
+            **kwargs: Passed to Agent.process_async (budget, temperature, ...)
+        
+        Returns:
+            Assistant response message
+        """
+        return await self.run(
+            lambda: agent.process_async(messages, **kwargs),
+            tenant=tenant,
+            priority=priority,
+            cost=cost,
+        )
+    
+    def __repr__(self) -> str:
+        return (
+            f"<AgentPool(running={self.running}, queued={self.queue_depth()}, "
+            f"max_concurrency={self.max_concurrency})>"
+        )
@@ -0,0 +1,93 @@
+"""
+Server-held conversation history
+
+With server-side state the API keeps the messages of a conversation
+between requests. Each request names the conversation and the sequence
+number (message count) the client believes the server holds, and
+uploads only the messages after it. A sequence of 0 replaces the stored
+history with a full upload. The server answers a stale sequence with a
+409 `sequence_mismatch` error, after which the client uploads everything
+again.
+
+Request field:  "conversation": {"id": "...", "sequence": 12}
+Response field: "conversation": {"id": "...", "sequence": 14}
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from .message import Message
+from .transcript import CompactMessage
+
+
+def _same(held: Any, sent: Any) -> bool:
+    """Whether a sent entry is a held message, possibly stored compactly since"""
+    return held is sent or (isinstance(sent, CompactMessage) and sent.source is held)
+
+
+class ServerHistory:
+    """Client-side record of what the server holds for one conversation"""
+    
+    def __init__(self, conversation_id: str):
+        """
+        Initialize server history
+        
+        Args:
+            conversation_id: Conversation ID shared with the server
+        """
+        self.conversation_id = conversation_id
+        self.sequence = 0
+        self.full_uploads = 0
+        self.delta_uploads = 0
+        self._synced: List[Message] = []
+    
+    def reset(self):
+        """Forget the server state; the next request uploads everything"""
+        self.sequence = 0
+        self._synced = []
+    
+    def prepare(self, messages: List[Message]) -> Tuple[List[Message], Dict[str, Any]]:
+        """
+        Choose the messages to upload for a request
+        
+        A delta is used only when the outgoing messages start with exactly
+        the messages the server already holds (compared by identity, so
+        nothing is serialized to check). A message the conversation has
+        since stored as a `CompactMessage` still counts as the same one.
+        
+        Args:
+            messages: Full message list for the request
+        
+        Returns:
+            Tuple of (messages to upload, "conversation" request field)
+        """
+        held = len(self._synced)
+        if (
+            held
+            and len(messages) >= held
+            and all(_same(a, b) for a, b in zip(self._synced, messages[:held]))
+        ):
+            self.delta_uploads += 1
+            return list(messages[held:]), {"id": self.conversation_id, "sequence": self.sequence}
+        
+        self.full_uploads += 1
+        return messages, {"id": self.conversation_id, "sequence": 0}
+    
+    def commit(self, messages: List[Message], response: Message, data: Dict[str, Any]):
+        """
+        Record the history held by the server after a successful request
+        
+        Args:
+            messages: Full message list of the request
+            response: Parsed assistant message
+            data: Decoded response body
+        """
+        state = data.get("conversation") or {}
+        sequence: Optional[int] = state.get("sequence")
+        synced = list(messages) + [response]
+        if sequence is None or sequence != len(synced):
+            # Server does not keep state, or holds something else
+            self.reset()
+            return
+        self.sequence = sequence
+        self._synced = synced
+    
+    def __repr__(self) -> str:
+        return f"<ServerHistory(conversation_id='{self.conversation_id}', sequence={self.sequence})>"
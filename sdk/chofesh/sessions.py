@@ -0,0 +1,338 @@
+"""
+Session manager for hosting many conversations
+"""
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from .agent import Agent
+from .budget import Budget
+from .conversation import Conversation
+from .message import Message
+from .store import ConversationStore
+from .transcript import CompactMessage
+
+# Rough per-message overhead of a Message object beyond its content
+MESSAGE_OVERHEAD_BYTES = 512
+
+# Rough per-message overhead of a stored CompactMessage beyond its content
+COMPACT_OVERHEAD_BYTES = 192
+
+
+def _message_size(message: Message) -> int:
+    return sys.getsizeof(message.content) + MESSAGE_OVERHEAD_BYTES
+
+
+def _entry_size(entry: Any) -> int:
+    """Size of a message, a compactly stored one, or a lazily held raw entry"""
+    if isinstance(entry, Message):
+        return _message_size(entry)
+    if isinstance(entry, CompactMessage):
+        return (
+            sys.getsizeof(entry.content)
+            + len(entry._tool_calls or b"")
+            + len(entry._metadata or b"")
+            + COMPACT_OVERHEAD_BYTES
+        )
+    if isinstance(entry, dict):
+        return sys.getsizeof(entry.get("content") or "") + MESSAGE_OVERHEAD_BYTES
+    return sys.getsizeof(entry)
+
+
+def _resident_size(messages: Any) -> int:
+    """Estimated memory of the messages actually held, not of lazily stored ones"""
+    entries = messages.resident() if hasattr(messages, "resident") else messages
+    return sum(_entry_size(entry) for entry in entries)
+
+
+class SessionStats:
+    """Cache counters for a SessionManager"""
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.created = 0
+        self.rehydrated = 0
+    
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from memory"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert stats to dictionary"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "created": self.created,
+            "rehydrated": self.rehydrated,
+            "hit_rate": self.hit_rate,
+        }
+    
+    def __repr__(self) -> str:
+        return (
+            f"<SessionStats(hits={self.hits}, misses={self.misses}, "
+            f"evictions={self.evictions})>"
+        )
+
+
+class _Session:
+    """LRU entry: a conversation, its estimated size and its running turns"""
+    
+    __slots__ = ("conversation", "size", "measured", "pins")
+    
+    def __init__(self, conversation: Conversation, size: int, measured: int):
+        self.conversation = conversation
+        self.size = size
+        self.measured = measured
+        # Turns started through the manager and not finished yet
+        self.pins = 0
+
+
+class SessionManager:
+    """Keeps hot conversations in memory and the rest in a ConversationStore"""
+    
+    def __init__(
+        self,
+        agent: Agent,
+        store: ConversationStore,
+        max_sessions: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        last_n: Optional[int] = None,
+        system_message: Optional[str] = None,
+        **conversation_kwargs: Any
+    ):
+        """
+        Initialize session manager
+        
+        Args:
+            agent: Agent shared by all sessions
+            store: Store that cold sessions are evicted to
+            max_sessions: Maximum conversations kept in memory
+            max_bytes: Maximum estimated memory for conversations kept in memory
+            last_n: Messages preloaded when a session is rehydrated (default: all)
+            system_message: System message for newly created sessions
+            **conversation_kwargs: Additional Conversation options (context_window, compactor)
+        """
+        if max_sessions is not None and max_sessions <= 0:
+            raise ValueError("max_sessions must be positive")
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        
+        self.agent = agent
+        self.store = store
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.last_n = last_n
+        self.system_message = system_message
+        self.conversation_kwargs = conversation_kwargs
+        self.stats = SessionStats()
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+    
+    @property
+    def size_bytes(self) -> int:
+        """Estimated memory held by in-memory conversations"""
+        return self._bytes
+    
+    def _remeasure(self, session: _Session):
+        """Recompute a session's size, e.g. after a turn loaded more of its history"""
+        size = _resident_size(session.conversation.messages)
+        self._bytes += size - session.size
+        session.size = size
+        session.measured = len(session.conversation.messages)
+    
+    def _measure(self, session: _Session):
+        """Account for messages added since the session was last measured"""
+        messages = session.conversation.messages
+        if len(messages) < session.measured:
+            # History was cleared or rewritten
+            size = sum(_message_size(msg) for msg in messages)
+        else:
+            size = session.size + sum(
+                _message_size(msg) for msg in messages[session.measured:]
+            )
+        self._bytes += size - session.size
+        session.size = size
+        session.measured = len(messages)
+    
+    def _over_limit(self) -> bool:
+        if self.max_sessions is not None and len(self._sessions) > self.max_sessions:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+    
+    def _evict_cold(self, keep: str):
+        """Evict least recently used sessions until within limits"""
+        for conversation_id in list(self._sessions):
+            if not self._over_limit():
+                break
+            session = self._sessions[conversation_id]
+            if conversation_id == keep or session.pins or session.conversation.pending_turns:
+                continue
+            self._evict(conversation_id)
+    
+    def _evict(self, conversation_id: str):
+        session = self._sessions.pop(conversation_id)
+        self.store.save(session.conversation)
+        self._bytes -= session.size
+        self.stats.evictions += 1
+    
+    def get(self, conversation_id: str) -> Conversation:
+        """
+        Get a conversation, rehydrating or creating it as needed
+        
+        Args:
+            conversation_id: Session ID
+        
+        Returns:
+            In-memory conversation, attached to the store
+        """
+        with self._lock:
+            session = self._sessions.get(conversation_id)
+            if session is not None:
+                self.stats.hits += 1
+                self._sessions.move_to_end(conversation_id)
+                self._measure(session)
+            else:
+                self.stats.misses += 1
+                if conversation_id in self.store:
+                    conversation = self.store.load(
+                        conversation_id,
+                        self.agent,
+                        last_n=self.last_n,
+                        **self.conversation_kwargs
+                    )
+                    self.stats.rehydrated += 1
+                    # Only the preloaded tail is in memory
+                    size = _resident_size(conversation.messages)
+                else:
+                    conversation = Conversation(
+                        agent=self.agent,
+                        system_message=self.system_message,
+                        conversation_id=conversation_id,
+                        store=self.store,
+                        **self.conversation_kwargs
+                    )
+                    self.stats.created += 1
+                    size = sum(_message_size(msg) for msg in conversation.messages)
+                
+                session = _Session(conversation, size, len(conversation.messages))
+                self._sessions[conversation_id] = session
+                self._bytes += size
+            
+            self._evict_cold(keep=conversation_id)
+            return session.conversation
+    
+    @contextmanager
+    def session(self, conversation_id: str) -> Iterator[Conversation]:
+        """
+        Get a conversation and keep it in memory until the block exits
+        
+        Run turns inside this block when driving the conversation directly:
+        a conversation returned by get() may be evicted by other threads,
+        and a later get() would then load a second copy of it.
+        """
+        with self._lock:
+            conversation = self.get(conversation_id)
+            session = self._sessions[conversation_id]
+            session.pins += 1
+        try:
+            yield conversation
+        finally:
+            with self._lock:
+                session.pins -= 1
+                if self._sessions.get(conversation_id) is session:
+                    # The turn may have loaded more history than it appended
+                    self._remeasure(session)
+                    self._evict_cold(keep=conversation_id)
+    
+    def send_message(
+        self,
+        conversation_id: str,
+        content: str,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        budget: Optional[Budget] = None,
+    ) -> Message:
+        """
+        Send a message to a session
+        
+        Args:
+            conversation_id: Session ID
+            content: User message content
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            budget: Optional per-call limits passed to the agent
+        
+        Returns:
+            Assistant response message
+        """
+        with self.session(conversation_id) as conversation:
+            return conversation.send_message(
+                content, temperature=temperature, max_tokens=max_tokens, budget=budget
+            )
+    
+    async def send_message_async(
+        self,
+        conversation_id: str,
+        content: str,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        budget: Optional[Budget] = None,
+    ) -> Message:
+        """
+        Async version of send_message()
+        
+        Args:
+            conversation_id: Session ID
+            content: User message content
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            budget: Optional per-call limits passed to the agent
+        
+        Returns:
+            Assistant response message
+        """
+        with self.session(conversation_id) as conversation:
+            return await conversation.send_message_async(
+                content, temperature=temperature, max_tokens=max_tokens, budget=budget
+            )
+    
+    def evict(self, conversation_id: str) -> bool:
+        """
+        Save a session to the store and drop it from memory
+        
+        Sessions with a turn running through the manager are kept.
+        
+        Returns:
+            True if the session was evicted
+        """
+        with self._lock:
+            session = self._sessions.get(conversation_id)
+            if session is None or session.pins:
+                return False
+            self._evict(conversation_id)
+            return True
+    
+    def flush(self):
+        """Save every in-memory session to the store"""
+        with self._lock:
+            for session in self._sessions.values():
+                self.store.save(session.conversation)
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._sessions
+    
+    def __repr__(self) -> str:
+        return (
+            f"<SessionManager(sessions={len(self._sessions)}, "
+            f"bytes={self._bytes}, stats={self.stats})>"
+        )
@@ -0,0 +1,360 @@
+"""
+Append-only persistent storage for conversations
+
+Messages are stored one row per message in SQLite, keyed by
+(conversation_id, seq), so saving a conversation after a turn only writes
+the messages added since the last save and any range of messages can be
+read back through the primary key without scanning the rest.
+"""
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+from . import json_backend
+from .agent import Agent
+from .conversation import Conversation
+from .lazy import LazyMessageList
+from .message import Message
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    agent TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Placeholder for stored entries that have not been read yet
+_NOT_LOADED = object()
+
+
+class StoredMessageList(LazyMessageList):
+    """
+    LazyMessageList backed by a ConversationStore
+    
+    Entries outside the preloaded tail are read from the store the first
+    time they are accessed. Appending keeps positions aligned with the
+    stored sequence numbers; any other mutation loads the full history
+    first.
+    """
+    
+    def __init__(
+        self,
+        store: "ConversationStore",
+        conversation_id: str,
+        count: int,
+        tail: List[Tuple[int, str]],
+    ):
+        """
+        Initialize stored message list
+        
+        Args:
+            store: Store holding the messages
+            conversation_id: Conversation the messages belong to
+            count: Number of stored messages
+            tail: Preloaded (seq, JSON) rows
+        """
+        super().__init__()
+        self._store = store
+        self._conversation_id = conversation_id
+        self._raw = [_NOT_LOADED] * count
+        self._messages = [None] * count
+        for seq, data in tail:
+            self._raw[seq] = data
+    
+    @property
+    def loaded_count(self) -> int:
+        """Number of entries read from the store so far"""
+        return sum(1 for raw in self._raw if raw is not _NOT_LOADED)
+    
+    def _load(self, start: int, stop: int):
+        """Read unloaded entries in [start, stop) with a single query"""
+        if not any(raw is _NOT_LOADED for raw in self._raw[start:stop]):
+            return
+        for seq, data in self._store._fetch(self._conversation_id, start, stop):
+            if seq < len(self._raw) and self._raw[seq] is _NOT_LOADED:
+                self._raw[seq] = data
+    
+    def _parse(self, index: int) -> Message:
+        if self._raw[index] is _NOT_LOADED:
+            self._load(index, index + 1)
+        return super()._parse(index)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+            self._load(start, stop)
+        return super().__getitem__(index)
+    
+    def entries(self, start: int = 0, stop: Optional[int] = None) -> List[Any]:
+        start, stop, _ = slice(start, stop).indices(len(self))
+        self._load(start, stop)
+        return super().entries(start, stop)
+    
+    def __iter__(self):
+        # One query for everything not read yet, rather than one per entry
+        self._load(0, len(self))
+        return super().__iter__()
+    
+    def __setitem__(self, index, value):
+        self._load(0, len(self))
+        super().__setitem__(index, value)
+    
+    def __delitem__(self, index):
+        self._load(0, len(self))
+        super().__delitem__(index)
+    
+    def insert(self, index: int, value: Message):
+        """Insert a parsed message"""
+        if index < len(self):
+            self._load(0, len(self))
+        super().insert(index, value)
+    
+    def resident(self):
+        return (entry for entry in super().resident() if entry is not _NOT_LOADED)
+    
+    def iter_dicts(self):
+        self._load(0, len(self))
+        return super().iter_dicts()
+    
+    def iter_json(self):
+        self._load(0, len(self))
+        return super().iter_json()
+    
+    def __repr__(self) -> str:
+        return (
+            f"<StoredMessageList(messages={len(self)}, "
+            f"loaded={self.loaded_count}, parsed={self.parsed_count})>"
+        )
+
+
+class ConversationStore:
+    """SQLite-backed, append-only conversation store"""
+    
+    def __init__(self, path: str = ":memory:"):
+        """
+        Initialize conversation store
+        
+        Args:
+            path: SQLite database file (default: in-memory database)
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+    
+    def _message_count(self, conversation_id: str) -> Optional[int]:
+        """Stored message count, or None for an unknown conversation"""
+        row = self._conn.execute(
+            "SELECT message_count FROM conversations WHERE conversation_id = ?",
+            (conversation_id,),
+        ).fetchone()
+        return row[0] if row else None
+    
+    def _fetch(self, conversation_id: str, start: int, stop: int) -> List[Tuple[int, str]]:
+        """Raw (seq, JSON) rows for start <= seq < stop"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, data FROM messages "
+                "WHERE conversation_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (conversation_id, start, stop),
+            ).fetchall()
+    
+    def save(self, conversation: Conversation, rewrite: bool = False) -> int:
+        """
+        Persist the messages added since the last save
+        
+        History is treated as append-only: messages already stored are not
+        written again. Pass rewrite=True after editing or removing earlier
+        messages to replace the stored history.
+        
+        Args:
+            conversation: Conversation to save (must have a conversation_id)
+            rewrite: Replace all stored messages
+        
+        Returns:
+            Number of messages written
+        """
+        conversation_id = conversation.conversation_id
+        if conversation_id is None:
+            raise ValueError("Conversation has no conversation_id")
+        
+        messages = conversation.messages
+        summary = conversation._summary_dict()
+        
+        with self._lock, self._conn:
+            count = self._message_count(conversation_id) or 0
+            if rewrite or len(messages) < count:
+                # Read everything before deleting the rows it may be loaded from
+                new_messages = list(messages)
+                self._conn.execute(
+                    "DELETE FROM messages WHERE conversation_id = ?",
+                    (conversation_id,),
+                )
+                count = 0
+            else:
+                new_messages = messages[count:]
+            
+            self._conn.executemany(
+                "INSERT INTO messages (conversation_id, seq, data) VALUES (?, ?, ?)",
+                [
+                    (conversation_id, count + offset, msg.to_json())
+                    for offset, msg in enumerate(new_messages)
+                ],
+            )
+            self._conn.execute(
+                "INSERT INTO conversations "
+                "(conversation_id, message_count, summary, agent, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(conversation_id) DO UPDATE SET "
+                "message_count = excluded.message_count, summary = excluded.summary, "
+                "agent = excluded.agent, updated_at = excluded.updated_at",
+                (
+                    conversation_id,
+                    count + len(new_messages),
+                    json_backend.dumps(summary) if summary else None,
+                    json_backend.dumps(conversation._agent_dict()),
+                    time.time(),
+                ),
+            )
+        
+        return len(new_messages)
+    
+    def save_summary(self, conversation: Conversation):
+        """Persist only the rolling summary of a saved conversation"""
+        summary = conversation._summary_dict()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE conversations SET summary = ?, updated_at = ? "
+                "WHERE conversation_id = ?",
+                (
+                    json_backend.dumps(summary) if summary else None,
+                    time.time(),
+                    conversation.conversation_id,
+                ),
+            )
+    
+    def load(
+        self,
+        conversation_id: str,
+        agent: Agent,
+        last_n: Optional[int] = None,
+        **kwargs: Any
+    ) -> Conversation:
+        """
+        Load a conversation
+        
+        Only the last N messages are read up front; earlier messages are
+        read from the store when accessed.
+        
+        Args:
+            conversation_id: Conversation to load
+            agent: Agent instance
+            last_n: Number of most recent messages to preload (default: all)
+            **kwargs: Additional Conversation options (context_window, compactor)
+        
+        Returns:
+            Restored conversation, attached to this store
+        
+        Raises:
+            KeyError: If the conversation is not in the store
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT message_count, summary FROM conversations WHERE conversation_id = ?",
+                (conversation_id,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(conversation_id)
+        count, summary = row
+        
+        start = 0 if last_n is None else max(count - last_n, 0)
+        tail = self._fetch(conversation_id, start, count)
+        
+        kwargs.setdefault("store", self)
+        conversation = Conversation(agent=agent, conversation_id=conversation_id, **kwargs)
+        conversation.messages = StoredMessageList(self, conversation_id, count, tail)
+        
+        if summary:
+            summary = json_backend.loads(summary)
+            conversation.summary = Message.from_dict(summary["message"])
+            conversation.summarized_until = summary["summarized_until"]
+        
+        return conversation
+    
+    def load_messages(
+        self,
+        conversation_id: str,
+        start: int = 0,
+        stop: Optional[int] = None,
+    ) -> List[Message]:
+        """
+        Read a range of stored messages
+        
+        Args:
+            conversation_id: Conversation to read from
+            start: First message index (negative counts from the end)
+            stop: End index, exclusive (default: end of conversation)
+        
+        Returns:
+            Messages in the range
+        """
+        with self._lock:
+            count = self._message_count(conversation_id) or 0
+        start, stop, _ = slice(start, stop).indices(count)
+        return [
+            Message.from_dict(json_backend.loads(data))
+            for _, data in self._fetch(conversation_id, start, stop)
+        ]
+    
+    def message_count(self, conversation_id: str) -> int:
+        """Number of stored messages for a conversation"""
+        with self._lock:
+            return self._message_count(conversation_id) or 0
+    
+    def conversation_ids(self) -> List[str]:
+        """IDs of stored conversations, most recently updated first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT conversation_id FROM conversations ORDER BY updated_at DESC"
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def delete(self, conversation_id: str):
+        """Remove a conversation and its messages"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM messages WHERE conversation_id = ?", (conversation_id,)
+            )
+            self._conn.execute(
+                "DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            )
+    
+    def __contains__(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._message_count(conversation_id) is not None
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def __repr__(self) -> str:
+        return f"<ConversationStore(path='{self.path}')>"
@@ -2,7 +2,10 @@
 Tools module for Chofesh SDK
 """
 
-from .base import Tool, ToolParameter
+from .base import Tool, ToolEffects, ToolParameter, ToolSchemas
+from .cache import ToolResultCache, shared_tool_cache
+from .results import ToolResultEncoder
+from .blob_reader import BlobReaderTool
 from .web_search import WebSearchTool
 from .code_execution import CodeExecutionTool
 from .image_generation import ImageGenerationTool
@@ -10,7 +13,13 @@ from .github import GitHubTool
 
 __all__ = [
     "Tool",
+    "ToolEffects",
     "ToolParameter",
+    "ToolSchemas",
+    "ToolResultCache",
+    "shared_tool_cache",
+    "ToolResultEncoder",
+    "BlobReaderTool",
     "WebSearchTool",
     "CodeExecutionTool",
     "ImageGenerationTool",
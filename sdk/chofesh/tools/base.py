@@ -2,8 +2,10 @@
 Base tool class for Chofesh SDK
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, FrozenSet, Hashable, Iterable, List, NamedTuple, Optional, Tuple
 from pydantic import BaseModel
+from .. import json_backend
+from .schema import SchemaValidator, compile_schema
 
 
 class ToolParameter(BaseModel):
@@ -15,6 +17,37 @@ class ToolParameter(BaseModel):
     default: Optional[Any] = None
 
 
+def _overlaps(first: Tuple, second: Tuple) -> bool:
+    """Whether two resource keys name the same resource or one contains the other"""
+    size = min(len(first), len(second))
+    return first[:size] == second[:size]
+
+
+class ToolEffects(NamedTuple):
+    """
+    Resources a tool call reads and writes
+    
+    Resource keys are tuples that form a hierarchy: ("github", "org/repo")
+    covers ("github", "org/repo", "branch", "main"). Two calls conflict
+    when one writes a resource the other reads or writes; conflicting
+    calls in a turn run in the order the model gave them.
+    """
+    reads: FrozenSet[Tuple] = frozenset()
+    writes: FrozenSet[Tuple] = frozenset()
+    
+    def conflicts_with(self, other: "ToolEffects") -> bool:
+        """Whether the two calls must not run at the same time"""
+        return any(
+            _overlaps(write, key)
+            for write in self.writes
+            for key in other.reads | other.writes
+        ) or any(
+            _overlaps(key, write)
+            for key in self.reads
+            for write in other.writes
+        )
+
+
 class Tool(ABC):
     """Base class for all tools"""
     
@@ -27,14 +60,28 @@ class Tool(ABC):
         "required": [],
     }
     
+    # Seconds a result may be reused for identical arguments (None: never cached)
+    cache_ttl: Optional[float] = None
+    
+    # Seconds a call may run before the agent abandons it (None: unbounded)
+    timeout: Optional[float] = None
+    
+    # Whether oversized results may be moved to the agent's blob store
+    spill_results: bool = True
+    
     def __init__(self, **config):
         """
         Initialize tool with configuration
         
         Args:
-            **config: Tool-specific configuration
+            **config: Tool-specific configuration (cache_ttl and timeout
+                override the class defaults)
         """
         self.config = config
+        if "cache_ttl" in config:
+            self.cache_ttl = config["cache_ttl"]
+        if "timeout" in config:
+            self.timeout = config["timeout"]
         # Don't validate on init to allow testing
         # Validation happens on execute
         if config.get('validate', True):
@@ -44,6 +91,30 @@ class Tool(ABC):
         """Validate tool configuration (override if needed)"""
         pass
     
+    @property
+    def validator(self) -> SchemaValidator:
+        """`parameters` compiled into a validator, rebuilt if parameters is replaced"""
+        validator = self.__dict__.get("_validator")
+        if validator is None or validator.schema is not self.parameters:
+            validator = compile_schema(self.parameters)
+            self._validator = validator
+        return validator
+    
+    def validate_parameters(self, parameters: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Check call arguments against `parameters` and apply defaults
+        
+        Override to add checks the schema cannot express, extending the
+        error list returned by this method.
+        
+        Args:
+            parameters: Arguments from the model
+        
+        Returns:
+            Tuple of (arguments with defaults applied, list of error strings)
+        """
+        return self.validator.validate(parameters)
+    
     @abstractmethod
     def execute(self, parameters: Dict[str, Any]) -> Any:
         """
@@ -57,6 +128,46 @@ class Tool(ABC):
         """
         pass
     
+    def cache_ttl_for(self, parameters: Dict[str, Any]) -> Optional[float]:
+        """
+        Seconds a result for these arguments may be reused
+        
+        Override to cache only some calls; calls with side effects must
+        return None.
+        """
+        return self.cache_ttl
+    
+    def cache_scope(self) -> Hashable:
+        """Key separating cached results of tools that reach different resources"""
+        return self.name
+    
+    def has_side_effects(self, parameters: Dict[str, Any]) -> bool:
+        """
+        Whether this call changes external state
+        
+        Such calls always run, even when repeated with identical arguments,
+        and clear cached results in the tool's cache scope.
+        """
+        return False
+    
+    def effects(self, parameters: Dict[str, Any]) -> ToolEffects:
+        """
+        Resources this call reads and writes
+        
+        By default a call reads the tool's cache scope, or writes it when it
+        has side effects. Override with finer keys to let more calls run in
+        parallel.
+        """
+        scope = self.cache_scope()
+        key = scope if isinstance(scope, tuple) else (scope,)
+        if self.has_side_effects(parameters):
+            return ToolEffects(writes=frozenset({key}))
+        return ToolEffects(reads=frozenset({key}))
+    
+    def is_cacheable_result(self, result: Any) -> bool:
+        """Results reported as errors are not cached"""
+        return not (isinstance(result, dict) and "error" in result)
+    
     def to_schema(self) -> Dict[str, Any]:
         """Convert tool to OpenAI function schema"""
         return {
@@ -70,3 +181,23 @@ class Tool(ABC):
     
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__}(name='{self.name}')>"
+
+
+class ToolSchemas(list):
+    """
+    Tool schema list with a cached wire encoding
+    
+    The list is encoded once, on first use, and the same bytes are placed
+    in every request that offers these tools. Treat it as read-only; build
+    a new one when the tool set changes.
+    """
+    
+    def __init__(self, schemas: Iterable[Dict[str, Any]] = ()):
+        super().__init__(schemas)
+        self._wire_bytes: Optional[bytes] = None
+    
+    def wire_bytes(self) -> bytes:
+        """Compact JSON encoding of the schemas, computed once"""
+        if self._wire_bytes is None:
+            self._wire_bytes = json_backend.dumpb(list(self))
+        return self._wire_bytes
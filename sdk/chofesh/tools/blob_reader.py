@@ -0,0 +1,85 @@
+"""
+Paging tool for spilled tool outputs
+"""
+from typing import Dict, Any, Optional
+from .base import Tool
+from ..blobs import BlobStore
+
+DEFAULT_PAGE_BYTES = 4096
+MAX_PAGE_BYTES = 8 * 1024
+
+
+class BlobReaderTool(Tool):
+    """Tool for reading large tool outputs stored in a BlobStore"""
+    
+    name = "read_blob"
+    description = (
+        "Read part of a large tool output that was stored separately. "
+        "Pass the blob handle from the earlier tool message and page through it "
+        "with offset and length (in bytes); the response gives next_offset."
+    )
+    spill_results = False
+    parameters = {
+        "type": "object",
+        "properties": {
+            "handle": {
+                "type": "string",
+                "description": "Blob handle (blob:sha256:...)"
+            },
+            "offset": {
+                "type": "integer",
+                "description": "Byte offset to start reading at",
+                "default": 0,
+                "minimum": 0
+            },
+            "length": {
+                "type": "integer",
+                "description": "Number of bytes to read",
+                "default": DEFAULT_PAGE_BYTES,
+                "minimum": 16,
+                "maximum": MAX_PAGE_BYTES
+            }
+        },
+        "required": ["handle"]
+    }
+    
+    def __init__(self, store: Optional[BlobStore] = None, **config):
+        """
+        Initialize blob reader tool
+        
+        Args:
+            store: Blob store to read from (default: BlobStore())
+            **config: Additional configuration
+        """
+        self.store = store or BlobStore()
+        super().__init__(**config)
+    
+    def execute(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Read one page of a blob
+        
+        Args:
+            parameters: handle, offset, length
+        
+        Returns:
+            Page content with offsets and the total size
+        """
+        handle = parameters.get("handle", "")
+        offset = parameters.get("offset", 0)
+        length = min(parameters.get("length", DEFAULT_PAGE_BYTES), MAX_PAGE_BYTES)
+        
+        try:
+            total = self.store.size(handle)
+            content, start, end = self.store.read_text(handle, offset, length)
+        except ValueError as e:
+            return {"error": str(e)}
+        except KeyError:
+            return {"error": f"Blob not found: {handle}"}
+        
+        return {
+            "handle": handle,
+            "offset": start,
+            "next_offset": end if end < total else None,
+            "total_bytes": total,
+            "content": content,
+        }
@@ -0,0 +1,122 @@
+"""
+Shared cache for tool results
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Returned by ToolResultCache.get() when there is no fresh entry
+MISS = object()
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def canonical_arguments(parameters: Any) -> str:
+    """Stable text form of tool arguments: key order and spacing do not matter"""
+    return json.dumps(parameters, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ToolResultCache:
+    """
+    Bounded LRU cache of tool results with per-entry expiry
+    
+    Entries are keyed on the tool's cache scope and its canonical
+    arguments. Which calls are cached, and for how long, is declared by
+    the tools themselves (see `Tool.cache_ttl_for`). Cached results are
+    shared between callers and should be treated as read-only.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize tool result cache
+        
+        Args:
+            max_entries: Maximum number of results kept
+            clock: Time source used for expiry
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(scope: Hashable, parameters: Any) -> Tuple[Hashable, str]:
+        """Cache key for a call"""
+        return scope, canonical_arguments(parameters)
+    
+    def get(self, key: Hashable) -> Any:
+        """
+        Look up a fresh result
+        
+        Returns:
+            The cached result, or MISS
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+            self.misses += 1
+            return MISS
+    
+    def set(self, key: Hashable, result: Any, ttl: float):
+        """Store a result for ttl seconds, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, scope: Optional[Hashable] = None):
+        """Drop every entry, or only the entries for one tool scope"""
+        with self._lock:
+            if scope is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == scope]:
+                    del self._entries[key]
+    
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __repr__(self) -> str:
+        return (
+            f"<ToolResultCache(entries={len(self._entries)}, "
+            f"max_entries={self.max_entries}, hits={self.hits}, misses={self.misses})>"
+        )
+
+
+# Process-wide cache for agents that opt into sharing results (Agent(tool_cache=...)).
+# Only share between agents acting for the same user, or with tools whose cache
+# scopes separate credentials.
+shared_tool_cache = ToolResultCache()
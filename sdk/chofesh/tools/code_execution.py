@@ -5,6 +5,7 @@ import os
 import requests
 from typing import Dict, Any, Optional
 from .base import Tool
+from ..budget import effective_timeout
 
 
 class CodeExecutionTool(Tool):
@@ -12,6 +13,7 @@ class CodeExecutionTool(Tool):
     
     name = "code_execution"
     description = "Execute code in Python, JavaScript, Java, C++, Go, Rust, and 60+ other languages. Returns stdout, stderr, and execution status."
+    timeout = 60.0
     parameters = {
         "type": "object",
         "properties": {
@@ -39,7 +41,8 @@ class CodeExecutionTool(Tool):
         
         Args:
             api_key: Chofesh API key (or set CHOFESH_API_KEY env var)
-            **config: Additional configuration
+            **config: Additional configuration. Runs are not cached by
+                default; pass cache_ttl when the code run is deterministic
         """
         self.api_key = api_key or os.getenv("CHOFESH_API_KEY")
         super().__init__(**config)
@@ -84,7 +87,7 @@ class CodeExecutionTool(Tool):
                     "language": language,
                     "stdin": stdin,
                 },
-                timeout=60,
+                timeout=effective_timeout(self.timeout, self.name),
             )
             
             if response.status_code == 200:
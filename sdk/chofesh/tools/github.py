@@ -1,9 +1,11 @@
 """
 GitHub integration tool for Chofesh SDK
 """
+import hashlib
 import os
 from typing import Dict, Any, Optional, List
-from .base import Tool
+from .base import Tool, ToolEffects
+from ..budget import effective_timeout
 
 try:
     from github import Github, GithubException
@@ -79,6 +81,20 @@ class GitHubTool(Tool):
         "required": ["action"]
     }
     
+    # Actions without side effects; only these are cached
+    READ_ACTIONS = frozenset({"read_file", "list_files", "list_issues", "list_prs"})
+    cache_ttl = 60.0
+    
+    # Fields each action needs beyond "action" itself
+    ACTION_REQUIRED = {
+        "read_file": ["path"],
+        "write_file": ["path", "content"],
+        "create_branch": ["branch"],
+        "create_pr": ["title", "head"],
+        "create_issue": ["title"],
+        "comment_issue": ["issue_number", "body"],
+    }
+    
     def __init__(
         self,
         token: Optional[str] = None,
@@ -123,13 +139,97 @@ class GitHubTool(Tool):
                 "Set GITHUB_TOKEN environment variable or pass token parameter."
             )
     
+    def validate_parameters(self, parameters: Dict[str, Any]):
+        """Schema checks plus the fields required by the chosen action"""
+        parameters, errors = super().validate_parameters(parameters)
+        # A wrong-typed or unknown action is already a schema error
+        if not errors and isinstance(parameters, dict) and isinstance(parameters.get("action"), str):
+            for name in self.ACTION_REQUIRED.get(parameters["action"], []):
+                if parameters.get(name) is None:
+                    errors.append(f"{name}: required for action '{parameters['action']}'")
+        return parameters, errors
+    
+    def cache_ttl_for(self, parameters: Dict[str, Any]) -> Optional[float]:
+        """Cache read actions only"""
+        if parameters.get("action") in self.READ_ACTIONS:
+            return self.cache_ttl
+        return None
+    
+    def cache_scope(self):
+        """Cached results are per repository and per token, as tokens see different data"""
+        credential = (
+            hashlib.sha256(self.token.encode("utf-8")).hexdigest()[:16] if self.token else None
+        )
+        return (self.name, self.repo_name, credential)
+    
+    def has_side_effects(self, parameters: Dict[str, Any]) -> bool:
+        """Every action other than a read changes the repository"""
+        return parameters.get("action") not in self.READ_ACTIONS
+    
+    def effects(self, parameters: Dict[str, Any]) -> ToolEffects:
+        """
+        Branches, pull requests and issues touched by the call
+        
+        Writes to one branch are ordered, and a pull request waits for
+        writes to its head and base branches; work on other branches and
+        reads run freely.
+        """
+        repo = (self.name, self.repo_name)
+        action = parameters.get("action")
+        
+        def branch(name):
+            return repo + ("branch", name or "main")
+        
+        issues = repo + ("issues",)
+        pulls = repo + ("pulls",)
+        
+        if action in ("read_file", "list_files"):
+            return ToolEffects(reads=frozenset({branch(parameters.get("branch"))}))
+        if action == "write_file":
+            return ToolEffects(writes=frozenset({branch(parameters.get("branch"))}))
+        if action == "create_branch":
+            return ToolEffects(
+                reads=frozenset({branch(parameters.get("base_branch"))}),
+                writes=frozenset({branch(parameters.get("branch"))}),
+            )
+        if action == "create_pr":
+            return ToolEffects(
+                reads=frozenset({
+                    branch(parameters.get("head")),
+                    branch(parameters.get("base")),
+                }),
+                writes=frozenset({pulls}),
+            )
+        if action == "list_prs":
+            return ToolEffects(reads=frozenset({pulls}))
+        if action == "list_issues":
+            return ToolEffects(reads=frozenset({issues}))
+        if action == "create_issue":
+            return ToolEffects(writes=frozenset({issues}))
+        if action == "comment_issue":
+            return ToolEffects(
+                reads=frozenset({issues}),
+                writes=frozenset({issues + (parameters.get("issue_number"),)}),
+            )
+        return super().effects(parameters)
+    
     def _ensure_repo(self):
-        """Ensure repository is set"""
+        """
+        Ensure repository is set and return the handle for the current call
+        
+        PyGithub fixes its request timeout when a client is created, so a
+        call running under a deadline (tool timeout or budget) gets a client
+        of its own whose requests stop at that deadline.
+        """
         if not self.repo:
             raise ValueError(
                 "Repository not set. "
                 "Set GITHUB_REPO environment variable or pass repo parameter."
             )
+        timeout = effective_timeout(self.timeout, self.name)
+        if timeout is None:
+            return self.repo
+        return Github(self.token, timeout=timeout).get_repo(self.repo_name, lazy=True)
     
     def execute(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -178,7 +278,7 @@ class GitHubTool(Tool):
     
     def _read_file(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Read file from repository"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         path = params.get("path")
         branch = params.get("branch", "main")
@@ -187,7 +287,7 @@ class GitHubTool(Tool):
             return {"error": "Path parameter is required"}
         
         try:
-            file_content = self.repo.get_contents(path, ref=branch)
+            file_content = repo.get_contents(path, ref=branch)
             content = file_content.decoded_content.decode('utf-8')
             
             return {
@@ -204,7 +304,7 @@ class GitHubTool(Tool):
     
     def _write_file(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Write file to repository"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         path = params.get("path")
         content = params.get("content")
@@ -217,9 +317,9 @@ class GitHubTool(Tool):
         try:
             # Check if file exists
             try:
-                file_content = self.repo.get_contents(path, ref=branch)
+                file_content = repo.get_contents(path, ref=branch)
                 # Update existing file
-                result = self.repo.update_file(
+                result = repo.update_file(
                     path,
                     message,
                     content,
@@ -229,7 +329,7 @@ class GitHubTool(Tool):
             except GithubException as e:
                 if e.status == 404:
                     # Create new file
-                    result = self.repo.create_file(
+                    result = repo.create_file(
                         path,
                         message,
                         content,
@@ -249,7 +349,7 @@ class GitHubTool(Tool):
     
     def _create_branch(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new branch"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         branch = params.get("branch")
         base_branch = params.get("base_branch", "main")
@@ -258,11 +358,11 @@ class GitHubTool(Tool):
             return {"error": "Branch parameter is required"}
         
         # Get base branch SHA
-        base_ref = self.repo.get_git_ref(f"heads/{base_branch}")
+        base_ref = repo.get_git_ref(f"heads/{base_branch}")
         base_sha = base_ref.object.sha
         
         # Create new branch
-        self.repo.create_git_ref(f"refs/heads/{branch}", base_sha)
+        repo.create_git_ref(f"refs/heads/{branch}", base_sha)
         
         return {
             "branch": branch,
@@ -272,7 +372,7 @@ class GitHubTool(Tool):
     
     def _create_pr(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Create a pull request"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         title = params.get("title")
         body = params.get("body", "")
@@ -282,7 +382,7 @@ class GitHubTool(Tool):
         if not title or not head:
             return {"error": "Title and head parameters are required"}
         
-        pr = self.repo.create_pull(
+        pr = repo.create_pull(
             title=title,
             body=body,
             head=head,
@@ -300,12 +400,12 @@ class GitHubTool(Tool):
     
     def _list_files(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """List files in directory"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         directory = params.get("directory", "")
         branch = params.get("branch", "main")
         
-        contents = self.repo.get_contents(directory, ref=branch)
+        contents = repo.get_contents(directory, ref=branch)
         
         files = []
         for content in contents:
@@ -324,7 +424,7 @@ class GitHubTool(Tool):
     
     def _create_issue(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Create an issue"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         title = params.get("title")
         body = params.get("body", "")
@@ -332,7 +432,7 @@ class GitHubTool(Tool):
         if not title:
             return {"error": "Title parameter is required"}
         
-        issue = self.repo.create_issue(title=title, body=body)
+        issue = repo.create_issue(title=title, body=body)
         
         return {
             "number": issue.number,
@@ -343,7 +443,7 @@ class GitHubTool(Tool):
     
     def _comment_issue(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Comment on an issue"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         issue_number = params.get("issue_number")
         body = params.get("body")
@@ -351,7 +451,7 @@ class GitHubTool(Tool):
         if not issue_number or not body:
             return {"error": "Issue_number and body parameters are required"}
         
-        issue = self.repo.get_issue(issue_number)
+        issue = repo.get_issue(issue_number)
         comment = issue.create_comment(body)
         
         return {
@@ -362,11 +462,11 @@ class GitHubTool(Tool):
     
     def _list_issues(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """List issues"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         state = params.get("state", "open")
         
-        issues = self.repo.get_issues(state=state)
+        issues = repo.get_issues(state=state)
         
         issue_list = []
         for issue in issues[:10]:  # Limit to 10
@@ -385,11 +485,11 @@ class GitHubTool(Tool):
     
     def _list_prs(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """List pull requests"""
-        self._ensure_repo()
+        repo = self._ensure_repo()
         
         state = params.get("state", "open")
         
-        prs = self.repo.get_pulls(state=state)
+        prs = repo.get_pulls(state=state)
         
         pr_list = []
         for pr in prs[:10]:  # Limit to 10
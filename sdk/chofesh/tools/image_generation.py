@@ -5,6 +5,7 @@ import os
 import requests
 from typing import Dict, Any, Optional
 from .base import Tool
+from ..budget import effective_timeout
 
 
 class ImageGenerationTool(Tool):
@@ -12,6 +13,7 @@ class ImageGenerationTool(Tool):
     
     name = "image_generation"
     description = "Generate images from text descriptions using AI. Returns image URLs."
+    timeout = 120.0
     parameters = {
         "type": "object",
         "properties": {
@@ -84,7 +86,7 @@ class ImageGenerationTool(Tool):
                     "model": model,
                     "size": size,
                 },
-                timeout=120,
+                timeout=effective_timeout(self.timeout, self.name),
             )
             
             if response.status_code == 200:
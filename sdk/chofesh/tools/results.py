@@ -0,0 +1,143 @@
+"""
+Encoding tool results for the model's context
+"""
+from typing import Any, NamedTuple, Optional
+from .. import json_backend
+from ..message import CHARS_PER_TOKEN
+
+DEFAULT_MAX_BYTES = 16 * 1024
+
+# Size of the preview left in the conversation when a result is spilled to a blob
+SPILL_PREVIEW_BYTES = 1024
+
+# Share of a clipped string kept from its start; the rest comes from its end
+HEAD_SHARE = 2 / 3
+
+# Shortest string and item limits tried before falling back to clipping the JSON text
+MIN_STRING = 64
+MIN_ITEMS = 2
+
+
+class EncodedResult(NamedTuple):
+    """Tool result as placed in a tool message"""
+    content: str
+    size: int
+    truncated: bool
+
+
+def clip_text(text: str, limit: int) -> str:
+    """Keep the head and tail of text within about limit characters"""
+    if len(text) <= limit:
+        return text
+    head = int(limit * HEAD_SHARE)
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n...[{omitted} characters omitted]...\n{text[len(text) - tail:]}"
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _prune_empty(value: Any) -> Any:
+    """Drop null and empty fields from objects"""
+    if isinstance(value, dict):
+        return {
+            key: _prune_empty(item) for key, item in value.items() if not _is_empty(item)
+        }
+    if isinstance(value, (list, tuple)):
+        return [_prune_empty(item) for item in value]
+    return value
+
+
+def _shrink(value: Any, max_string: int, max_items: int) -> Any:
+    """Clip long strings and long lists throughout a value"""
+    if isinstance(value, str):
+        return clip_text(value, max_string)
+    if isinstance(value, dict):
+        return {key: _shrink(item, max_string, max_items) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) > max_items:
+            omitted = len(value) - max_items
+            marker = f"...[{omitted} items omitted]..."
+            value = list(value[:max_items - 1]) + [marker, value[-1]]
+        return [_shrink(item, max_string, max_items) for item in value]
+    return value
+
+
+class ToolResultEncoder:
+    """
+    Compact, size-bounded text form of tool results
+    
+    Strings are used as-is and everything else is encoded as compact JSON.
+    Results over the limit are cut down in stages: empty fields are
+    pruned, then long strings are clipped to their head and tail and long
+    lists to their first and last items, with ever tighter limits, and as
+    a last resort the encoded text itself is clipped. Only the encoded
+    text is sent to the model; the agent keeps the full result on the
+    ToolCall.
+    """
+    
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_tokens: Optional[int] = None):
+        """
+        Initialize encoder
+        
+        Args:
+            max_bytes: Maximum UTF-8 size of an encoded result
+            max_tokens: Optional approximate token limit, applied on top of max_bytes
+        """
+        if max_tokens is not None:
+            max_bytes = min(max_bytes, max_tokens * CHARS_PER_TOKEN)
+        if max_bytes < MIN_STRING:
+            raise ValueError(f"max_bytes must be at least {MIN_STRING}")
+        self.max_bytes = max_bytes
+    
+    @staticmethod
+    def dumps(value: Any) -> str:
+        """Full, unbounded text form of a result"""
+        if isinstance(value, str):
+            return value
+        return json_backend.dumpb(value, default=str).decode("utf-8")
+    
+    def _fits(self, text: str) -> bool:
+        # Cheap check first: UTF-8 never takes fewer bytes than characters
+        return len(text) <= self.max_bytes and len(text.encode("utf-8")) <= self.max_bytes
+    
+    def encode(self, result: Any) -> EncodedResult:
+        """
+        Encode a result within the size limit
+        
+        Returns:
+            EncodedResult with the text, the full encoded size in bytes and
+            whether anything was cut
+        """
+        text = self.dumps(result)
+        size = len(text.encode("utf-8"))
+        if size <= self.max_bytes:
+            return EncodedResult(text, size, False)
+        
+        if not isinstance(result, str):
+            value = _prune_empty(result)
+            text = self.dumps(value)
+            if self._fits(text):
+                return EncodedResult(text, size, True)
+            
+            max_string = self.max_bytes
+            max_items = max(self.max_bytes // 16, MIN_ITEMS)
+            while max_string >= MIN_STRING:
+                text = self.dumps(_shrink(value, max_string, max_items))
+                if self._fits(text):
+                    return EncodedResult(text, size, True)
+                max_string //= 2
+                max_items = max(max_items // 2, MIN_ITEMS)
+        
+        # Leave room for the omission marker, and for multi-byte characters
+        limit = self.max_bytes - 48
+        while True:
+            clipped = clip_text(text, limit)
+            if self._fits(clipped):
+                return EncodedResult(clipped, size, True)
+            limit = max(limit * 3 // 4, 0)
+    
+    def __repr__(self) -> str:
+        return f"<ToolResultEncoder(max_bytes={self.max_bytes})>"
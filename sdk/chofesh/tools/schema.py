@@ -0,0 +1,279 @@
+"""
+Compiled JSON-schema validation for tool arguments
+
+`compile_schema` turns a tool's `parameters` schema into a tree of small
+check functions once, so validating a call is a walk over the arguments
+rather than a walk over the schema. The supported subset covers what
+function-calling schemas use in practice: type, enum, const, properties,
+required, additionalProperties, items, string/array/number bounds,
+pattern, and anyOf/oneOf/allOf. Unknown keywords are ignored.
+"""
+import copy
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+# Check function: (value, path, errors) -> value with defaults applied
+_Check = Callable[[Any, str, List[str]], Any]
+
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: (
+        isinstance(v, int) and not isinstance(v, bool)
+        or isinstance(v, float) and v.is_integer()
+    ),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+
+def _join(path: str, key: Any) -> str:
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else str(key)
+
+
+def _compile(schema: Any) -> _Check:
+    """Compile one schema node into a check function"""
+    if not isinstance(schema, dict) or not schema:
+        return lambda value, path, errors: value
+    
+    checks: List[_Check] = []
+    
+    types = schema.get("type")
+    if types is not None:
+        names = [types] if isinstance(types, str) else list(types)
+        tests = [_TYPES[name] for name in names if name in _TYPES]
+        expected = " or ".join(names)
+        
+        def check_type(value, path, errors):
+            if not any(test(value) for test in tests):
+                errors.append(f"{path or 'arguments'}: expected {expected}")
+                return value
+            if names == ["integer"] and isinstance(value, float):
+                return int(value)
+            return value
+        
+        if tests:
+            checks.append(check_type)
+    
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        listing = ", ".join(map(str, allowed))
+        
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append(f"{path or 'arguments'}: must be one of {listing}")
+            return value
+        
+        checks.append(check_enum)
+    
+    if "const" in schema:
+        const = schema["const"]
+        
+        def check_const(value, path, errors):
+            if value != const:
+                errors.append(f"{path or 'arguments'}: must be {const!r}")
+            return value
+        
+        checks.append(check_const)
+    
+    checks.extend(_compile_string(schema))
+    checks.extend(_compile_number(schema))
+    checks.extend(_compile_object(schema))
+    checks.extend(_compile_array(schema))
+    checks.extend(_compile_combinators(schema))
+    
+    if len(checks) == 1:
+        return checks[0]
+    
+    def check_all(value, path, errors):
+        for check in checks:
+            value = check(value, path, errors)
+        return value
+    
+    return check_all
+
+
+def _compile_string(schema: Dict[str, Any]) -> List[_Check]:
+    checks: List[_Check] = []
+    min_length = schema.get("minLength")
+    max_length = schema.get("maxLength")
+    pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+    
+    if min_length is not None or max_length is not None:
+        def check_length(value, path, errors):
+            if isinstance(value, str):
+                if min_length is not None and len(value) < min_length:
+                    errors.append(f"{path}: shorter than {min_length} characters")
+                elif max_length is not None and len(value) > max_length:
+                    errors.append(f"{path}: longer than {max_length} characters")
+            return value
+        
+        checks.append(check_length)
+    
+    if pattern is not None:
+        def check_pattern(value, path, errors):
+            if isinstance(value, str) and not pattern.search(value):
+                errors.append(f"{path}: does not match {pattern.pattern!r}")
+            return value
+        
+        checks.append(check_pattern)
+    
+    return checks
+
+
+def _compile_number(schema: Dict[str, Any]) -> List[_Check]:
+    bounds = [
+        (schema.get("minimum"), lambda v, b: v < b, "less than"),
+        (schema.get("maximum"), lambda v, b: v > b, "greater than"),
+        (schema.get("exclusiveMinimum"), lambda v, b: v <= b, "at most"),
+        (schema.get("exclusiveMaximum"), lambda v, b: v >= b, "at least"),
+    ]
+    bounds = [
+        (bound, fails, text) for bound, fails, text in bounds
+        if isinstance(bound, (int, float)) and not isinstance(bound, bool)
+    ]
+    if not bounds:
+        return []
+    
+    def check_bounds(value, path, errors):
+        if _TYPES["number"](value):
+            for bound, fails, text in bounds:
+                if fails(value, bound):
+                    errors.append(f"{path}: {text} {bound}")
+                    break
+        return value
+    
+    return [check_bounds]
+
+
+def _compile_object(schema: Dict[str, Any]) -> List[_Check]:
+    properties = {
+        name: _compile(sub) for name, sub in (schema.get("properties") or {}).items()
+    }
+    defaults = {
+        name: sub["default"]
+        for name, sub in (schema.get("properties") or {}).items()
+        if isinstance(sub, dict) and "default" in sub
+    }
+    required = list(schema.get("required") or [])
+    additional = schema.get("additionalProperties", True)
+    extra = _compile(additional) if isinstance(additional, dict) else None
+    
+    if not (properties or required or additional is not True):
+        return []
+    
+    def check_object(value, path, errors):
+        if not isinstance(value, dict):
+            return value
+        for name in required:
+            if name not in value:
+                errors.append(f"{_join(path, name)}: required")
+        result = {}
+        for name, item in value.items():
+            check = properties.get(name)
+            if check is not None:
+                result[name] = check(item, _join(path, name), errors)
+            elif additional is False:
+                errors.append(f"{_join(path, name)}: unexpected property")
+            elif extra is not None:
+                result[name] = extra(item, _join(path, name), errors)
+            else:
+                result[name] = item
+        for name, default in defaults.items():
+            if name not in result:
+                result[name] = copy.deepcopy(default)
+        return result
+    
+    return [check_object]
+
+
+def _compile_array(schema: Dict[str, Any]) -> List[_Check]:
+    items = _compile(schema["items"]) if isinstance(schema.get("items"), dict) else None
+    min_items = schema.get("minItems")
+    max_items = schema.get("maxItems")
+    
+    if items is None and min_items is None and max_items is None:
+        return []
+    
+    def check_array(value, path, errors):
+        if not isinstance(value, list):
+            return value
+        if min_items is not None and len(value) < min_items:
+            errors.append(f"{path}: fewer than {min_items} items")
+        elif max_items is not None and len(value) > max_items:
+            errors.append(f"{path}: more than {max_items} items")
+        if items is None:
+            return value
+        return [items(item, _join(path, i), errors) for i, item in enumerate(value)]
+    
+    return [check_array]
+
+
+def _compile_combinators(schema: Dict[str, Any]) -> List[_Check]:
+    checks: List[_Check] = []
+    
+    for sub in schema.get("allOf") or []:
+        checks.append(_compile(sub))
+    
+    for keyword in ("anyOf", "oneOf"):
+        options = [_compile(sub) for sub in schema.get(keyword) or []]
+        if not options:
+            continue
+        exactly_one = keyword == "oneOf"
+        
+        def check_options(value, path, errors, options=options, exactly_one=exactly_one):
+            matched = []
+            for option in options:
+                option_errors: List[str] = []
+                result = option(value, path, option_errors)
+                if not option_errors:
+                    matched.append(result)
+            if not matched:
+                errors.append(f"{path or 'arguments'}: matches none of the allowed schemas")
+                return value
+            if exactly_one and len(matched) > 1:
+                errors.append(f"{path or 'arguments'}: matches more than one allowed schema")
+            return matched[0]
+        
+        checks.append(check_options)
+    
+    return checks
+
+
+class SchemaValidator:
+    """JSON schema compiled into a reusable argument validator"""
+    
+    def __init__(self, schema: Dict[str, Any]):
+        """
+        Compile a schema
+        
+        Args:
+            schema: JSON schema, typically a tool's `parameters`
+        """
+        self.schema = schema
+        self._check = _compile(schema)
+    
+    def validate(self, value: Any) -> Tuple[Any, List[str]]:
+        """
+        Validate a value and fill in defaults
+        
+        The input is not modified; objects with defaults applied are copies.
+        
+        Returns:
+            Tuple of (value with defaults applied, list of error strings)
+        """
+        errors: List[str] = []
+        result = self._check(value, "", errors)
+        return result, errors
+    
+    def __repr__(self) -> str:
+        return f"<SchemaValidator(keys={sorted(self.schema)})>"
+
+
+def compile_schema(schema: Dict[str, Any]) -> SchemaValidator:
+    """Compile a JSON schema into a SchemaValidator"""
+    return SchemaValidator(schema)
@@ -5,6 +5,7 @@ import os
 import requests
 from typing import Dict, Any, Optional
 from .base import Tool
+from ..budget import effective_timeout
 
 
 class WebSearchTool(Tool):
@@ -12,6 +13,8 @@ class WebSearchTool(Tool):
     
     name = "web_search"
     description = "Search the web for information. Returns search results with titles, URLs, and snippets."
+    cache_ttl = 300.0
+    timeout = 30.0
     parameters = {
         "type": "object",
         "properties": {
@@ -77,7 +80,7 @@ class WebSearchTool(Tool):
                     "query": query,
                     "num_results": num_results,
                 },
-                timeout=30,
+                timeout=effective_timeout(self.timeout, self.name),
             )
             
             if response.status_code == 200:
@@ -0,0 +1,292 @@
+"""
+Compact storage for large transcripts
+
+`Message` is a validated pydantic model, which is convenient at API
+boundaries but heavy to keep around for every message of a long history.
+`CompactMessage` keeps the same data in a slotted object with a float
+timestamp and tool calls / metadata held as encoded JSON until accessed.
+
+Conversation histories store finished messages in this form and build
+`Message` objects only when they are read; requests are encoded straight
+from the compact entries. A `Transcript` is a plain sequence of them for
+export and bulk analysis.
+"""
+import sys
+import weakref
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union, overload
+from collections.abc import Sequence
+from . import json_backend
+from .message import (
+    Message,
+    MessageRole,
+    ToolCall,
+    estimate_tokens,
+    MESSAGE_TOKEN_OVERHEAD,
+)
+
+_ROLES = {role.value: sys.intern(role.value) for role in MessageRole}
+
+
+def _role_value(role: Union[str, MessageRole]) -> str:
+    """Interned role string"""
+    value = role.value if isinstance(role, MessageRole) else role
+    return _ROLES.get(value) or sys.intern(value)
+
+
+def _pack_timestamp(timestamp: datetime) -> Union[float, datetime]:
+    """Naive timestamps are stored as POSIX floats; aware ones as-is"""
+    if timestamp.tzinfo is None:
+        return timestamp.timestamp()
+    return timestamp
+
+
+def _pack_json(value: Any) -> bytes:
+    """JSON encoding sized exactly, as encoders may over-allocate their output"""
+    return memoryview(json_backend.dumpb(value)).tobytes()
+
+
+def _unpack_timestamp(timestamp: Union[float, datetime]) -> datetime:
+    if isinstance(timestamp, datetime):
+        return timestamp
+    return datetime.fromtimestamp(timestamp)
+
+
+class CompactMessage:
+    """Slotted, lazily decoded representation of a Message"""
+    
+    __slots__ = ("role", "content", "_timestamp", "model", "_tool_calls", "_metadata", "_source")
+    
+    # Slots holding the message data, as opposed to the cached Message
+    _FIELDS = ("role", "content", "_timestamp", "model", "_tool_calls", "_metadata")
+    
+    def __init__(
+        self,
+        role: Union[str, MessageRole],
+        content: str,
+        timestamp: Optional[datetime] = None,
+        model: Optional[str] = None,
+        tool_calls: Optional[bytes] = None,
+        metadata: Optional[bytes] = None,
+    ):
+        """
+        Initialize compact message
+        
+        Args:
+            role: Message role
+            content: Message content
+            timestamp: Creation time (default: now)
+            model: Model that produced the message
+            tool_calls: JSON-encoded list of tool call dicts, or None
+            metadata: JSON-encoded metadata dict, or None
+        """
+        self.role = _role_value(role)
+        self.content = content
+        self._timestamp = _pack_timestamp(timestamp or datetime.now())
+        self.model = sys.intern(model) if model else None
+        self._tool_calls = tool_calls
+        self._metadata = metadata
+        self._source: Optional[weakref.ref] = None
+    
+    @classmethod
+    def from_message(cls, message: Message) -> "CompactMessage":
+        """Create compact message from a Message"""
+        compact = cls(
+            role=message.role,
+            content=message.content,
+            timestamp=message.timestamp,
+            model=message.model,
+            tool_calls=_pack_json(
+                [tc.to_dict() for tc in message.tool_calls]
+            ) if message.tool_calls else None,
+            metadata=_pack_json(message.metadata) if message.metadata else None,
+        )
+        compact._source = weakref.ref(message)
+        return compact
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactMessage":
+        """Create compact message from a Message.to_dict() dictionary"""
+        timestamp = data.get("timestamp")
+        tool_calls = data.get("tool_calls")
+        metadata = data.get("metadata")
+        return cls(
+            role=data["role"],
+            content=data["content"],
+            timestamp=datetime.fromisoformat(timestamp) if timestamp else None,
+            model=data.get("model"),
+            tool_calls=_pack_json(tool_calls) if tool_calls else None,
+            metadata=_pack_json(metadata) if metadata else None,
+        )
+    
+    @property
+    def timestamp(self) -> datetime:
+        """Creation time"""
+        return _unpack_timestamp(self._timestamp)
+    
+    @property
+    def tool_calls(self) -> List[Dict[str, Any]]:
+        """Tool calls as dictionaries (decoded on each access)"""
+        if self._tool_calls is None:
+            return []
+        return json_backend.loads(self._tool_calls)
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata dictionary (decoded on each access)"""
+        if self._metadata is None:
+            return {}
+        return json_backend.loads(self._metadata)
+    
+    @property
+    def token_estimate(self) -> int:
+        """Approximate prompt tokens for this message"""
+        return estimate_tokens(self.content) + MESSAGE_TOKEN_OVERHEAD
+    
+    def to_wire(self) -> Dict[str, Any]:
+        """Convert message to the chat completions request format"""
+        return {"role": self.role, "content": self.content}
+    
+    def wire_bytes(self) -> bytes:
+        """JSON encoding of to_wire()"""
+        return json_backend.dumpb(self.to_wire())
+    
+    @property
+    def source(self) -> Optional[Message]:
+        """Message this entry was built from or last returned as, while it is alive"""
+        return self._source() if self._source is not None else None
+    
+    def to_message(self) -> Message:
+        """Materialize the public Message model without re-validating"""
+        return Message.model_construct(
+            role=MessageRole(self.role),
+            content=self.content,
+            timestamp=self.timestamp,
+            model=self.model,
+            tool_calls=[ToolCall.model_construct(**tc) for tc in self.tool_calls],
+            metadata=self.metadata,
+        )
+    
+    def as_message(self) -> Message:
+        """
+        Message for this entry, the same object for as long as it is alive
+        
+        Reading a stored entry twice, or reading the message that was
+        stored, gives back one object. Changes made to it are not written
+        back, so messages should be treated as immutable once stored.
+        """
+        message = self.source
+        if message is None:
+            message = self.to_message()
+            self._source = weakref.ref(message)
+        return message
+    
+    def to_json(self) -> str:
+        """Convert message to a Message.to_json() string"""
+        return json_backend.dumps(self.to_dict())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert message to the Message.to_dict() schema"""
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp.isoformat(),
+            "model": self.model,
+            "tool_calls": self.tool_calls,
+            "metadata": self.metadata,
+        }
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CompactMessage):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self._FIELDS)
+    
+    def __repr__(self) -> str:
+        preview = self.content if len(self.content) <= 40 else self.content[:37] + "..."
+        return f"<CompactMessage(role='{self.role}', content={preview!r})>"
+
+
+class Transcript(Sequence):
+    """Sequence of compact messages with conversion at the edges"""
+    
+    __slots__ = ("_items",)
+    
+    def __init__(self, items: Optional[Iterable[CompactMessage]] = None):
+        """
+        Initialize transcript
+        
+        Args:
+            items: Optional compact messages to start with
+        """
+        self._items: List[CompactMessage] = list(items) if items is not None else []
+    
+    @classmethod
+    def from_messages(cls, messages: Iterable[Message]) -> "Transcript":
+        """Create transcript from Message objects"""
+        return cls(CompactMessage.from_message(msg) for msg in messages)
+    
+    @classmethod
+    def from_dicts(cls, data: Iterable[Dict[str, Any]]) -> "Transcript":
+        """Create transcript from Message.to_dict() dictionaries without validation"""
+        return cls(CompactMessage.from_dict(item) for item in data)
+    
+    def append(self, message: Union[Message, CompactMessage]):
+        """Append a message"""
+        if not isinstance(message, CompactMessage):
+            message = CompactMessage.from_message(message)
+        self._items.append(message)
+    
+    def extend(self, messages: Iterable[Union[Message, CompactMessage]]):
+        """Append several messages"""
+        for message in messages:
+            self.append(message)
+    
+    @overload
+    def __getitem__(self, index: int) -> CompactMessage: ...
+    
+    @overload
+    def __getitem__(self, index: slice) -> "Transcript": ...
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Transcript(self._items[index])
+        return self._items[index]
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def __iter__(self) -> Iterator[CompactMessage]:
+        return iter(self._items)
+    
+    def message(self, index: int) -> Message:
+        """Materialize a single Message"""
+        return self._items[index].to_message()
+    
+    def to_messages(self) -> List[Message]:
+        """Materialize all messages"""
+        return [item.to_message() for item in self._items]
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Convert all messages to the Message.to_dict() schema"""
+        return [item.to_dict() for item in self._items]
+    
+    def __repr__(self) -> str:
+        return f"<Transcript(messages={len(self._items)})>"
+
+
+def _compact_entry(entry: Any) -> Any:
+    """Compact form of a stored Message; other entries are kept as they are"""
+    if type(entry) is not Message:
+        return entry
+    try:
+        return CompactMessage.from_message(entry)
+    except (TypeError, ValueError):
+        # Metadata that cannot be encoded as JSON stays in the Message
+        return entry
+
+
+def _expand_entry(entry: Any) -> Any:
+    """Message for a stored entry"""
+    if type(entry) is CompactMessage:
+        return entry.as_message()
+    return entry
@@ -18,16 +18,20 @@ async def main():
     
     print("Assistant:", response.content)
     
-    # Multiple concurrent requests
-    tasks = [
+    # Concurrent turns on one conversation are queued and run in order
+    await asyncio.gather(
         conversation.send_message_async("What is asyncio?"),
         conversation.send_message_async("What are coroutines?"),
-        conversation.send_message_async("What is the event loop?"),
-    ]
+    )
     
-    responses = await asyncio.gather(*tasks)
+    # Independent questions about the same history run in parallel
+    responses = await conversation.ask_parallel_async([
+        "Summarize asyncio in one sentence",
+        "Summarize coroutines in one sentence",
+        "Summarize the event loop in one sentence",
+    ])
     
-    print("\nConcurrent responses:")
+    print("\nParallel responses:")
     for i, response in enumerate(responses, 1):
         print(f"\n{i}. {response.content[:100]}...")
 
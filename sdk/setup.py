@@ -54,8 +54,12 @@ setup(
         "github": [
             "PyGithub>=2.1.0",
         ],
+        "fast": [
+            "orjson>=3.9.0",
+        ],
         "all": [
             "PyGithub>=2.1.0",
+            "orjson>=3.9.0",
         ],
     },
     entry_points={
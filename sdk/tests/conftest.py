@@ -0,0 +1,50 @@
+"""
+Shared test fixtures
+"""
+import pytest
+from unittest.mock import AsyncMock, Mock
+from chofesh.agent import Agent
+from chofesh.message import Message, MessageRole
+
+
+class FakeClock:
+    """Manually advanced clock"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Clock that only moves when a test sets clock.now"""
+    return FakeClock()
+
+
+@pytest.fixture
+def make_agent():
+    """
+    Factory for agents wired to a mocked LLM
+    
+    Called without arguments, the agent's LLM answers "Ok" to every
+    complete()/complete_async() call. Pass a prepared mock as llm to script
+    the replies, and a tool to register it as the agent's only tool.
+    """
+    def make(llm=None, tool=None):
+        if llm is None:
+            llm = Mock()
+            llm.complete.return_value = Message(role=MessageRole.ASSISTANT, content="Ok")
+            llm.complete_async = AsyncMock(
+                return_value=Message(role=MessageRole.ASSISTANT, content="Ok")
+            )
+        llm.timeout = 60
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = llm
+        if tool is not None:
+            agent.tools = [tool]
+            agent._tool_registry = {tool.name: tool}
+        return agent
+    
+    return make
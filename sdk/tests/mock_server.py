@@ -0,0 +1,97 @@
+"""
+Local mock of the chat completions API for tests
+
+Implements server-held conversation state (see chofesh.server_state):
+requests carrying a "conversation" field are appended to the history the
+server keeps for that ID, and stale sequence numbers are rejected with a
+409 sequence_mismatch error.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockChatServer:
+    """Chat completions server running on a background thread"""
+    
+    def __init__(self):
+        self.histories = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def forget(self, conversation_id: str):
+        """Drop a stored history, as a server restart would"""
+        with self.lock:
+            self.histories.pop(conversation_id, None)
+    
+    def _respond(self, body: dict):
+        """Return (status, payload) for a decoded request body"""
+        messages = body["messages"]
+        conversation = body.get("conversation")
+        
+        with self.lock:
+            if conversation is not None:
+                conversation_id = conversation["id"]
+                held = self.histories.get(conversation_id, [])
+                if conversation["sequence"] == 0:
+                    history = list(messages)
+                elif conversation["sequence"] == len(held):
+                    history = held + messages
+                else:
+                    return 409, {"error": {
+                        "code": "sequence_mismatch",
+                        "message": "Conversation sequence mismatch",
+                        "sequence": len(held),
+                    }}
+            else:
+                history = messages
+            
+            reply = {"role": "assistant", "content": f"Reply to {history[-1]['content']} ({len(history)} messages)"}
+            payload = {
+                "choices": [{"message": reply, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(history), "completion_tokens": 1},
+            }
+            if conversation is not None:
+                self.histories[conversation_id] = history + [reply]
+                payload["conversation"] = {
+                    "id": conversation_id,
+                    "sequence": len(history) + 1,
+                }
+            return 200, payload
+    
+    def _handler(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                body = json.loads(raw)
+                with server.lock:
+                    server.requests.append((len(raw), body))
+                status, payload = server._respond(body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
@@ -1,11 +1,14 @@
 """
 Tests for agent module
 """
+import threading
 import pytest
 from unittest.mock import Mock, MagicMock, patch
 from chofesh.agent import Agent
-from chofesh.message import Message, MessageRole, ToolCall
-from chofesh.tools import Tool
+from chofesh.message import Message, MessageRole, StreamChunk, ToolCall
+from chofesh.budget import Budget
+from chofesh.exceptions import ToolValidationError
+from chofesh.tools import Tool, ToolEffects, ToolResultEncoder
 
 
 class MockTool(Tool):
@@ -76,6 +79,31 @@ class TestAgent:
         assert schemas[0]["type"] == "function"
         assert schemas[0]["function"]["name"] == "mock_tool"
     
+    def test_tool_schemas_cached_until_tools_change(self):
+        """Test schemas are reused until a tool is added or removed"""
+        class OtherTool(MockTool):
+            name = "other_tool"
+            
+            def to_schema(self):
+                schema = super().to_schema()
+                schema["function"]["strict"] = True
+                return schema
+        
+        agent = Agent(model="gpt-oss-120b", tools=[MockTool()])
+        
+        schemas = agent._get_tool_schemas()
+        encoded = schemas.wire_bytes()
+        assert agent._get_tool_schemas() is schemas
+        assert agent._get_tool_schemas().wire_bytes() is encoded
+        
+        agent.add_tool(OtherTool())
+        updated = agent._get_tool_schemas()
+        assert updated is not schemas
+        assert updated[1]["function"]["strict"] is True
+        
+        agent.remove_tool("other_tool")
+        assert agent._get_tool_schemas().wire_bytes() == encoded
+    
     def test_execute_tool(self):
         """Test executing a tool"""
         tool = MockTool()
@@ -85,6 +113,246 @@ class TestAgent:
         
         assert result == {"result": "Processed: test"}
     
+    def test_invalid_arguments_reported_without_executing(self):
+        """Test schema errors go back as one tool message and skip the tool"""
+        tool = MockTool()
+        tool.execute = Mock()
+        agent = Agent(model="gpt-oss-120b", tools=[tool])
+        calls = [
+            ToolCall(id="call_1", name="mock_tool", parameters={"input": 5}),
+            ToolCall(id="call_2", name="mock_tool", parameters={}, raw_arguments="{input:"),
+        ]
+        
+        messages = agent._run_tool_calls(calls)
+        
+        tool.execute.assert_not_called()
+        assert messages[0].content == (
+            "Error: Invalid arguments for tool 'mock_tool': input: expected string"
+        )
+        assert messages[0].metadata["invalid_arguments"] is True
+        assert "expected a JSON object" in messages[1].content
+        with pytest.raises(ToolValidationError) as exc_info:
+            agent._validate_arguments(calls[0])
+        assert exc_info.value.errors == ["input: expected string"]
+    
+    def test_validator_exceptions_reported_as_invalid_arguments(self):
+        """Test a custom check raising on odd arguments becomes a validation error"""
+        tool = MockTool()
+        tool.validate_parameters = Mock(side_effect=TypeError("unhashable type: 'dict'"))
+        agent = Agent(model="gpt-oss-120b", tools=[tool])
+        
+        with pytest.raises(ToolValidationError) as exc_info:
+            agent._validate_arguments(ToolCall(id="call_1", name="mock_tool", parameters={}))
+        
+        assert exc_info.value.errors == ["arguments: unhashable type: 'dict'"]
+    
+    @patch('chofesh.agent.LLM')
+    def test_identical_tool_calls_deduplicated(self, mock_llm_class):
+        """Test repeated calls in one run reuse the first result"""
+        tool = MockTool()
+        tool.execute = Mock(return_value={"result": "found"})
+        agent = Agent(model="gpt-oss-120b", tools=[tool])
+        agent.llm = Mock()
+        agent.llm.complete.side_effect = [
+            Message(role=MessageRole.ASSISTANT, content="", tool_calls=[
+                ToolCall(id="call_1", name="mock_tool", parameters={"input": "q"}),
+                ToolCall(id="call_2", name="mock_tool", parameters={"input": "q"}),
+            ]),
+            Message(role=MessageRole.ASSISTANT, content="", tool_calls=[
+                ToolCall(id="call_3", name="mock_tool", parameters={"input": "q"}),
+                ToolCall(id="call_4", name="mock_tool", parameters={"input": "other"}),
+            ]),
+            Message(role=MessageRole.ASSISTANT, content="Done"),
+        ]
+        
+        agent.process([Message(role=MessageRole.USER, content="Test")])
+        
+        assert tool.execute.call_count == 2
+        sent = agent.llm.complete.call_args_list[2][1]["messages"]
+        tool_messages = [msg for msg in sent if msg.role == MessageRole.TOOL]
+        assert [msg.metadata.get("duplicate_of") for msg in tool_messages] == [
+            None, "call_1", "call_1", None
+        ]
+        assert tool_messages[1].content == tool_messages[0].content
+        
+        # A new run starts with no remembered results
+        agent.llm.complete.side_effect = [
+            Message(role=MessageRole.ASSISTANT, content="", tool_calls=[
+                ToolCall(id="call_5", name="mock_tool", parameters={"input": "q"}),
+            ]),
+            Message(role=MessageRole.ASSISTANT, content="Done"),
+        ]
+        agent.process([Message(role=MessageRole.USER, content="Again")])
+        assert tool.execute.call_count == 3
+    
+    @patch('chofesh.agent.LLM')
+    def test_speculative_tools_start_while_streaming(self, mock_llm_class):
+        """Test a tool call runs before the rest of its turn has streamed"""
+        ran = threading.Event()
+        tool = MockTool()
+        tool.execute = Mock(side_effect=lambda params: ran.set() or {"result": "ok"})
+        agent = Agent(model="gpt-oss-120b", tools=[tool], speculative_tools=True)
+        agent.llm = Mock()
+        overlapped = []
+        
+        def first_turn(**kwargs):
+            yield StreamChunk(content="", tool_call=ToolCall(
+                id="call_1", name="mock_tool", parameters={"input": "a"}
+            ))
+            # The model is still generating when the tool finishes
+            overlapped.append(ran.wait(5))
+            yield StreamChunk(content="Checking", is_final=True, metadata={
+                "finish_reason": "tool_calls", "usage": {"total_tokens": 7}
+            })
+        
+        def second_turn(**kwargs):
+            yield StreamChunk(content="Done", is_final=True)
+        
+        agent.llm.stream.side_effect = [first_turn(), second_turn()]
+        
+        response = agent.process([Message(role=MessageRole.USER, content="Test")])
+        
+        assert overlapped == [True]
+        assert response.content == "Done"
+        agent.llm.complete.assert_not_called()
+        sent = agent.llm.stream.call_args_list[1][1]["messages"]
+        assert sent[1].content == "Checking"
+        assert sent[1].metadata["usage"] == {"total_tokens": 7}
+        tool_messages = [msg for msg in sent if msg.role == MessageRole.TOOL]
+        assert tool_messages[0].metadata["tool_call_id"] == "call_1"
+        assert "ok" in tool_messages[0].content
+    
+    @patch('chofesh.agent.LLM')
+    def test_speculative_calls_reported_when_budget_stops_run(self, mock_llm_class):
+        """Test calls started while streaming finish and are reported as run"""
+        ran = []
+        tool = MockTool()
+        tool.execute = Mock(side_effect=lambda params: ran.append(params["input"]) or {"ok": True})
+        agent = Agent(model="gpt-oss-120b", tools=[tool], speculative_tools=True)
+        agent.llm = Mock()
+        agent.llm.timeout = 60
+        
+        def turn(**kwargs):
+            yield StreamChunk(content="", tool_call=ToolCall(
+                id="call_1", name="mock_tool", parameters={"input": "w"}
+            ))
+            yield StreamChunk(content="", is_final=True, metadata={
+                "finish_reason": "tool_calls", "usage": {"total_tokens": 500}
+            })
+        
+        agent.llm.stream.side_effect = [turn()]
+        
+        response = agent.process(
+            [Message(role=MessageRole.USER, content="Test")],
+            budget=Budget(max_total_tokens=100),
+        )
+        
+        assert ran == ["w"]
+        assert response.metadata["budget_exhausted"] == "tokens"
+        assert response.metadata["executed_tool_calls"] == ["mock_tool"]
+        assert response.metadata["pending_tool_calls"] == []
+        assert "Tool calls that ran: mock_tool." in response.content
+    
+    def test_side_effect_calls_not_deduplicated(self):
+        """Test calls declaring side effects always run and reset earlier results"""
+        class WriteTool(MockTool):
+            name = "write_tool"
+            
+            def has_side_effects(self, parameters):
+                return parameters.get("input") == "write"
+        
+        tool = WriteTool()
+        tool.execute = Mock(return_value={"ok": True})
+        agent = Agent(model="gpt-oss-120b", tools=[tool])
+        calls = [
+            ToolCall(id=f"call_{i}", name="write_tool", parameters={"input": value})
+            for i, value in enumerate(["read", "read", "write", "write", "read"])
+        ]
+        
+        messages = agent._run_tool_calls(calls, seen={})
+        
+        assert tool.execute.call_count == 4
+        assert [msg.metadata.get("duplicate_of") for msg in messages] == [
+            None, "call_0", None, None, None
+        ]
+    
+    def test_parallel_tool_calls_follow_effects(self):
+        """Test independent calls overlap while conflicting calls keep their order"""
+        events = []
+        both_reading = threading.Barrier(2, timeout=5)
+        
+        class ResourceTool(MockTool):
+            def effects(self, parameters):
+                key = ("store", parameters["input"].split(":")[1])
+                if parameters["input"].startswith("write"):
+                    return ToolEffects(writes=frozenset({key}))
+                return ToolEffects(reads=frozenset({key}))
+            
+            def execute(self, parameters):
+                if parameters["input"].startswith("read"):
+                    both_reading.wait()
+                events.append(parameters["input"])
+                return {"result": parameters["input"]}
+        
+        agent = Agent(model="gpt-oss-120b", tools=[ResourceTool()], max_parallel_tools=4)
+        calls = [
+            ToolCall(id=f"call_{i}", name="mock_tool", parameters={"input": value})
+            for i, value in enumerate(["write:a", "read:a", "read:b", "write:b"])
+        ]
+        
+        messages = agent._run_tool_graph(calls)
+        
+        # read:a and read:b could only pass the barrier by running together,
+        # and each waited for or held back the write on its own key
+        assert events.index("write:a") < events.index("read:a")
+        assert events.index("read:b") < events.index("write:b")
+        assert [msg.metadata["tool_call_id"] for msg in messages] == [
+            "call_0", "call_1", "call_2", "call_3"
+        ]
+    
+    def test_parallel_reads_and_writes_share_seen_safely(self):
+        """Test concurrent reads and side-effect writes of one tool keep dedup consistent"""
+        class BranchTool(MockTool):
+            def effects(self, parameters):
+                action, branch = parameters["input"].split(":")
+                key = frozenset({("branch", branch)})
+                return ToolEffects(writes=key) if action == "write" else ToolEffects(reads=key)
+            
+            def has_side_effects(self, parameters):
+                return parameters["input"].startswith("write")
+        
+        agent = Agent(model="gpt-oss-120b", tools=[BranchTool()], max_parallel_tools=8)
+        calls = [
+            ToolCall(id=f"call_{i}", name="mock_tool", parameters={"input": value})
+            for i in range(50)
+            for value in (f"write:w{i}", "read:main")
+        ]
+        seen = {}
+        
+        messages = agent._run_tool_graph(calls, seen=seen)
+        
+        assert len(messages) == len(calls)
+        assert not any(msg.metadata.get("error") for msg in messages)
+    
+    def test_tool_results_encoded_and_bounded(self):
+        """Test tool messages hold bounded JSON while the call keeps the full result"""
+        tool = MockTool()
+        tool.execute = Mock(return_value={"content": "x" * 10000, "ok": True})
+        agent = Agent(
+            model="gpt-oss-120b",
+            tools=[tool],
+            result_encoder=ToolResultEncoder(max_bytes=500),
+        )
+        call = ToolCall(id="call_1", name="mock_tool", parameters={"input": "q"})
+        
+        message = agent._run_tool_calls([call])[0]
+        
+        assert len(message.content.encode("utf-8")) <= 500
+        assert message.content.startswith('{"content":"xxx')
+        assert message.metadata["truncated"] is True
+        assert message.metadata["result_bytes"] > 10000
+        assert len(call.result["content"]) == 10000
+    
     def test_execute_nonexistent_tool(self):
         """Test executing a nonexistent tool"""
         agent = Agent(model="gpt-oss-120b")
@@ -0,0 +1,172 @@
+"""
+Tests for archive module
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from chofesh.agent import Agent
+from chofesh.archive import TranscriptArchive
+from chofesh.conversation import Conversation
+from chofesh.message import Message, MessageRole, ToolCall
+
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def conversation_dict(index):
+    """Conversation with a user question, a tool call and an answer"""
+    start = BASE + timedelta(hours=index)
+    return {
+        "conversation_id": f"conv_{index}",
+        "messages": [
+            Message(role=MessageRole.USER, content=f"Question {index} — שלום", timestamp=start).to_dict(),
+            Message(
+                role=MessageRole.ASSISTANT,
+                content="",
+                timestamp=start + timedelta(seconds=1),
+                model="gpt-oss-120b" if index % 2 else "llama-3.3-70b",
+                tool_calls=[ToolCall(
+                    id="call_1",
+                    name="web_search" if index % 2 else "github",
+                    parameters={"query": "x"},
+                )],
+            ).to_dict(),
+            Message(
+                role=MessageRole.TOOL,
+                content="result",
+                timestamp=start + timedelta(seconds=2),
+                metadata={"tool_call_id": "call_1"},
+            ).to_dict(),
+            Message(
+                role=MessageRole.ASSISTANT,
+                content=f"Answer {index}",
+                timestamp=start + timedelta(seconds=3),
+                model="gpt-oss-120b",
+            ).to_dict(),
+        ],
+        "summary": None,
+        "agent": {"model": "gpt-oss-120b", "tools": ["web_search"]},
+    }
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = str(tmp_path / "transcripts.chfa")
+    TranscriptArchive.write(path, [conversation_dict(i) for i in range(6)])
+    with TranscriptArchive(path) as archive:
+        yield archive
+
+
+class TestTranscriptArchive:
+    """Test TranscriptArchive class"""
+    
+    def test_counts(self, archive):
+        """Test archive size metadata"""
+        assert len(archive) == 24
+        assert archive.conversation_count == 6
+        assert archive.tool_call_count == 6
+    
+    def test_round_trip(self, archive):
+        """Test export back to the to_dict schema"""
+        assert list(archive.to_dicts()) == [conversation_dict(i) for i in range(6)]
+    
+    def test_zero_copy_content(self, archive):
+        """Test content is exposed as a view into the mapped file"""
+        view = archive.content(0)
+        
+        assert isinstance(view, memoryview)
+        assert bytes(view) == "Question 0 — שלום".encode("utf-8")
+        assert archive.text(3) == "Answer 0"
+        view.release()
+    
+    def test_message(self, archive):
+        """Test materializing a Message"""
+        message = archive.message(5)
+        
+        assert message.role == "assistant"
+        assert message.model == "gpt-oss-120b"
+        assert message.tool_calls[0].name == "web_search"
+        assert message.timestamp == BASE + timedelta(hours=1, seconds=1)
+    
+    def test_filter_role(self, archive):
+        """Test filtering by role"""
+        assert archive.count(role="tool") == 6
+        assert archive.select(role=["user", "tool"])[:4] == [0, 2, 4, 6]
+    
+    def test_filter_model(self, archive):
+        """Test filtering by model"""
+        assert archive.count(model="llama-3.3-70b") == 3
+        assert archive.count(model="gpt-oss-120b", role="assistant") == 9
+        assert archive.count(model="unknown") == 0
+    
+    def test_filter_tool_name(self, archive):
+        """Test filtering by called tool"""
+        assert archive.select(tool_name="web_search") == [5, 13, 21]
+        assert archive.count(tool_name=["web_search", "github"]) == 6
+    
+    def test_filter_timestamp(self, archive):
+        """Test filtering by time range"""
+        since = BASE + timedelta(hours=2)
+        until = BASE + timedelta(hours=4)
+        
+        assert archive.select(since=since, until=until) == list(range(8, 16))
+        assert archive.count(since=since.timestamp(), role="user") == 4
+    
+    def test_conversation_access(self, archive):
+        """Test per-conversation access"""
+        assert archive.conversation_range(2) == range(8, 12)
+        assert archive.conversation_of(9) == 2
+        assert archive.conversation_dict(2) == conversation_dict(2)
+    
+    @patch('chofesh.agent.LLM')
+    def test_conversation_import(self, mock_llm_class, archive):
+        """Test restoring a Conversation"""
+        conversation = archive.conversation(1, Agent(model="gpt-oss-120b"))
+        
+        assert conversation.conversation_id == "conv_1"
+        assert len(conversation.messages) == 4
+
+
+class TestTranscriptArchiveWrite:
+    """Test writing archives"""
+    
+    @patch('chofesh.agent.LLM')
+    def test_write_conversations(self, mock_llm_class, tmp_path):
+        """Test writing Conversation objects"""
+        agent = Agent(model="gpt-oss-120b")
+        conversation = Conversation.from_dict(conversation_dict(0), agent)
+        path = str(tmp_path / "a.chfa")
+        
+        assert TranscriptArchive.write(path, [conversation]) == 4
+        with TranscriptArchive(path) as archive:
+            assert archive.conversation_dict(0) == conversation.to_dict()
+    
+    def test_aware_timestamps(self, tmp_path):
+        """Test timezone-aware timestamps keep their offset"""
+        tz = timezone(timedelta(hours=2))
+        message = Message(
+            role=MessageRole.USER,
+            content="Hi",
+            timestamp=datetime(2026, 3, 1, 9, 30, tzinfo=tz),
+        )
+        path = str(tmp_path / "a.chfa")
+        TranscriptArchive.write(path, [{"messages": [message.to_dict()]}])
+        
+        with TranscriptArchive(path) as archive:
+            assert archive.message_dict(0)["timestamp"] == message.to_dict()["timestamp"]
+    
+    def test_empty_archive(self, tmp_path):
+        """Test an archive without messages"""
+        path = str(tmp_path / "a.chfa")
+        TranscriptArchive.write(path, [])
+        
+        with TranscriptArchive(path) as archive:
+            assert len(archive) == 0
+            assert archive.select(role="user") == []
+    
+    def test_rejects_other_files(self, tmp_path):
+        """Test opening a file that is not an archive"""
+        path = tmp_path / "a.json"
+        path.write_bytes(b"{" * 64)
+        
+        with pytest.raises(ValueError):
+            TranscriptArchive(str(path))
@@ -0,0 +1,160 @@
+"""
+Tests for the blob store and read_blob tool
+"""
+import json
+import pytest
+from unittest.mock import Mock
+from chofesh.agent import Agent
+from chofesh.blobs import BlobStore, HANDLE_PREFIX
+from chofesh.message import ToolCall
+from chofesh.tools import BlobReaderTool, Tool, ToolResultEncoder
+
+
+class MockTool(Tool):
+    """Mock tool for testing"""
+    name = "mock_tool"
+    description = "A mock tool"
+    parameters = {
+        "type": "object",
+        "properties": {"input": {"type": "string"}},
+        "required": ["input"]
+    }
+    
+    def execute(self, parameters):
+        return {"result": f"Processed: {parameters.get('input')}"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+class TestBlobStore:
+    """Test BlobStore"""
+    
+    def test_put_is_content_addressed(self, store):
+        """Test identical content maps to one handle"""
+        handle = store.put("hello")
+        
+        assert handle.startswith(HANDLE_PREFIX)
+        assert store.put(b"hello") == handle
+        assert store.put("other") != handle
+        assert store.get(handle) == b"hello"
+        assert store.size(handle) == 5
+        assert handle in store
+    
+    def test_read_range(self, store):
+        """Test reading a byte range"""
+        handle = store.put("0123456789")
+        
+        assert store.read(handle, 3, 4) == b"3456"
+        assert store.read(handle, 8) == b"89"
+    
+    def test_read_text_keeps_characters_whole(self, store):
+        """Test pages never split a multi-byte character"""
+        text = "אבג" * 100
+        handle = store.put(text)
+        
+        pages = []
+        offset = 0
+        while offset < store.size(handle):
+            page, start, end = store.read_text(handle, offset, 7)
+            assert start == offset
+            pages.append(page)
+            offset = end
+        
+        assert "".join(pages) == text
+    
+    def test_missing_and_invalid_handles(self, store):
+        """Test unknown and malformed handles"""
+        with pytest.raises(KeyError):
+            store.get(HANDLE_PREFIX + "0" * 64)
+        with pytest.raises(ValueError):
+            store.get("blob:sha256:../../etc/passwd")
+        assert "not-a-handle" not in store
+    
+    def test_delete(self, store):
+        """Test deleting a blob"""
+        handle = store.put("bye")
+        
+        assert store.delete(handle) is True
+        assert handle not in store
+        assert store.delete(handle) is False
+
+
+class TestBlobReaderTool:
+    """Test BlobReaderTool"""
+    
+    def test_pages_through_blob(self, store):
+        """Test following next_offset reads the whole blob"""
+        tool = BlobReaderTool(store)
+        text = "".join(f"line {i}\n" for i in range(2000))
+        handle = store.put(text)
+        
+        content = []
+        offset = 0
+        while offset is not None:
+            page = tool.execute({"handle": handle, "offset": offset, "length": 4096})
+            content.append(page["content"])
+            offset = page["next_offset"]
+        
+        assert "".join(content) == text
+        assert page["total_bytes"] == len(text)
+    
+    def test_errors(self, store):
+        """Test bad handles are reported as errors"""
+        tool = BlobReaderTool(store)
+        
+        assert "error" in tool.execute({"handle": "nope"})
+        assert "not found" in tool.execute({"handle": HANDLE_PREFIX + "a" * 64})["error"]
+
+
+class TestAgentSpill:
+    """Test spilling large tool results from the agent loop"""
+    
+    def test_large_result_replaced_by_handle(self, store):
+        """Test the tool message holds a handle and preview of the full result"""
+        tool = MockTool()
+        result = {"content": "x" * 50000}
+        tool.execute = Mock(return_value=result)
+        agent = Agent(
+            model="gpt-oss-120b",
+            tools=[tool],
+            result_encoder=ToolResultEncoder(max_bytes=4096),
+            blob_store=store,
+        )
+        call = ToolCall(id="call_1", name="mock_tool", parameters={"input": "q"})
+        
+        message = agent._run_tool_calls([call])[0]
+        spilled = json.loads(message.content)
+        
+        assert len(message.content) < 2048
+        assert spilled["blob"] == message.metadata["blob"]
+        assert spilled["total_bytes"] > 50000
+        assert json.loads(store.get(spilled["blob"])) == result
+        assert "read_blob" in agent._tool_registry
+        assert [t.name for t in agent.tools] == ["mock_tool", "read_blob"]
+        
+        page = agent._execute_tool("read_blob", {"handle": spilled["blob"], "length": 100})
+        assert page["content"].startswith('{"content":"xxx')
+    
+    def test_small_results_and_reader_pages_not_spilled(self, store):
+        """Test only oversized results are spilled, and never read_blob pages"""
+        tool = MockTool()
+        agent = Agent(
+            model="gpt-oss-120b",
+            tools=[tool],
+            result_encoder=ToolResultEncoder(max_bytes=1024),
+            blob_store=store,
+        )
+        handle = store.put("y" * 10000)
+        calls = [
+            ToolCall(id="call_1", name="mock_tool", parameters={"input": "q"}),
+            ToolCall(id="call_2", name="read_blob", parameters={"handle": handle}),
+        ]
+        
+        messages = agent._run_tool_calls(calls)
+        
+        assert "blob" not in messages[0].metadata
+        assert "blob" not in messages[1].metadata
+        assert messages[1].metadata["truncated"] is True
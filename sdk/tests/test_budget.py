@@ -0,0 +1,527 @@
+"""
+Tests for budget module
+"""
+import asyncio
+import threading
+import time
+import pytest
+import requests
+from unittest.mock import Mock, AsyncMock, patch
+from chofesh.agent import Agent
+from chofesh.budget import (
+    Budget,
+    current_budget,
+    effective_timeout,
+    tool_time_remaining,
+    use_budget,
+    use_cancel_event,
+    use_tool_timeout,
+)
+from chofesh.message import Message, MessageRole, ToolCall
+from chofesh.exceptions import (
+    BudgetExceededError,
+    ToolCancelledError,
+    ToolOutcomeUnknownError,
+    ToolTimeoutError,
+)
+from chofesh.limits import AdaptiveLimiter
+from chofesh.tools import Tool
+
+
+def tool_call_response(call_id="call_1", usage=None):
+    """Assistant message asking for a tool"""
+    return Message(
+        role=MessageRole.ASSISTANT,
+        content="Using tool",
+        tool_calls=[ToolCall(id=call_id, name="test_tool", parameters={})],
+        metadata={"usage": usage or {}},
+    )
+
+
+class TestBudget:
+    """Test Budget class"""
+    
+    def test_unbounded_budget(self):
+        """Test budget without limits never runs out"""
+        budget = Budget()
+        
+        assert budget.remaining_time() is None
+        assert budget.remaining_tokens() is None
+        assert budget.exhausted is False
+        assert budget.timeout_for(30) == 30
+    
+    def test_deadline(self):
+        """Test wall-clock deadline"""
+        budget = Budget(timeout=0.01)
+        time.sleep(0.02)
+        
+        assert budget.exhausted_reason == "deadline"
+        assert budget.timeout_for(30) == pytest.approx(0.001)
+    
+    def test_timeout_for_clamps_to_remaining_time(self):
+        """Test request timeouts shrink to the remaining time"""
+        budget = Budget(timeout=5)
+        
+        assert budget.timeout_for(60) <= 5
+        assert budget.timeout_for(1) == 1
+    
+    def test_record_usage(self):
+        """Test token accounting from usage blocks"""
+        budget = Budget(max_total_tokens=100)
+        budget.record_usage({"total_tokens": 60})
+        budget.record_usage({"prompt_tokens": 30, "completion_tokens": 20})
+        
+        assert budget.tokens_used == 110
+        assert budget.exhausted_reason == "tokens"
+    
+    def test_tool_time(self):
+        """Test tool time accounting"""
+        budget = Budget(max_tool_time=1.0)
+        budget.record_tool_time(1.5)
+        
+        assert budget.exhausted_reason == "tool_time"
+    
+    def test_start_resets_counters(self):
+        """Test restarting a budget"""
+        budget = Budget(max_total_tokens=10)
+        budget.record_usage({"total_tokens": 10})
+        budget.start()
+        
+        assert budget.tokens_used == 0
+        assert budget.exhausted is False
+    
+    def test_tool_timeout_for_clamps_to_tool_time(self):
+        """Test tool call timeouts shrink to the tool time left"""
+        budget = Budget(timeout=5, max_tool_time=2)
+        budget.record_tool_time(1.5)
+        
+        assert budget.tool_timeout_for(30) == pytest.approx(0.5)
+        assert budget.tool_timeout_for(None) == pytest.approx(0.5)
+        assert Budget(timeout=5).tool_timeout_for(None) <= 5
+    
+    def test_effective_timeout(self):
+        """Test tools see the active budget"""
+        assert effective_timeout(30) == 30
+        
+        with use_budget(Budget(timeout=2)):
+            assert current_budget() is not None
+            assert effective_timeout(30) <= 2
+        
+        assert current_budget() is None
+    
+    def test_effective_timeout_clamped_to_tool_deadline(self):
+        """Test requests made by a tool end by the tool's deadline"""
+        with use_tool_timeout(0.5):
+            assert 0 < tool_time_remaining() <= 0.5
+            assert effective_timeout(30) <= 0.5
+            assert effective_timeout(None) <= 0.5
+        
+        assert tool_time_remaining() is None
+        assert effective_timeout(None) is None
+    
+    def test_effective_timeout_refused_after_cancel(self):
+        """Test no new request is sent once the run is cancelled"""
+        cancel = threading.Event()
+        
+        with use_cancel_event(cancel):
+            assert effective_timeout(30) == 30
+            cancel.set()
+            with pytest.raises(ToolCancelledError, match="'web_search' was cancelled"):
+                effective_timeout(30, "web_search")
+
+
+class SlowTool(Tool):
+    """Tool that blocks until released"""
+    name = "slow_tool"
+    description = "Slow tool"
+    timeout = 10.0
+    
+    def __init__(self, **config):
+        super().__init__(**config)
+        self.release = threading.Event()
+        self.request_timeout = None
+    
+    def execute(self, parameters):
+        self.request_timeout = effective_timeout(self.timeout)
+        self.release.wait(5)
+        return {"done": True}
+
+
+class TestToolTimeouts:
+    """Test per-tool and per-call tool timeouts"""
+    
+    def slow_call_response(self):
+        return Message(
+            role=MessageRole.ASSISTANT,
+            content="",
+            tool_calls=[ToolCall(id="call_1", name="slow_tool", parameters={})],
+        )
+    
+    def test_timeout_resolution(self):
+        """Test the smallest of call, agent and tool limits applies"""
+        agent = Agent(model="gpt-oss-120b", tools=[SlowTool()], tool_timeout=20)
+        
+        assert agent._tool_timeout_for("slow_tool", None, None) == 10
+        assert agent._tool_timeout_for("slow_tool", 2, None) == 2
+        assert agent._tool_timeout_for("slow_tool", None, Budget(timeout=1)) <= 1
+        assert SlowTool(timeout=3).timeout == 3
+    
+    def test_timed_out_tool_reported_to_model(self, make_agent):
+        """Test a hung tool is abandoned and the run continues"""
+        tool = SlowTool()
+        mock_llm = Mock()
+        mock_llm.complete.side_effect = [
+            self.slow_call_response(),
+            Message(role=MessageRole.ASSISTANT, content="Gave up on the tool"),
+        ]
+        agent = make_agent(mock_llm, tool)
+        
+        started = time.monotonic()
+        response = agent.process(
+            [Message(role=MessageRole.USER, content="Test")], tool_timeout=0.05
+        )
+        tool.release.set()
+        
+        assert time.monotonic() - started < 2
+        assert response.content == "Gave up on the tool"
+        assert tool.request_timeout <= 0.05
+        tool_message = next(
+            msg for msg in mock_llm.complete.call_args_list[1][1]["messages"]
+            if msg.role == MessageRole.TOOL
+        )
+        assert tool_message.content == "Error: Tool 'slow_tool' timed out after 0.05s"
+        assert tool_message.metadata["timed_out"] is True
+        assert tool_message.metadata["timeout"] == 0.05
+    
+    @pytest.mark.asyncio
+    async def test_timeout_on_async_path(self, make_agent):
+        """Test async runs enforce tool timeouts off the event loop"""
+        tool = SlowTool(timeout=0.05)
+        mock_llm = Mock()
+        mock_llm.complete_async = AsyncMock(side_effect=[
+            self.slow_call_response(),
+            Message(role=MessageRole.ASSISTANT, content="Done"),
+        ])
+        agent = make_agent(mock_llm, tool)
+        
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+        
+        ticking = asyncio.ensure_future(ticker())
+        response = await agent.process_async([Message(role=MessageRole.USER, content="Test")])
+        ticking.cancel()
+        tool.release.set()
+        
+        assert response.content == "Done"
+        assert ticks > 2
+        tool_message = next(
+            msg for msg in mock_llm.complete_async.call_args_list[1][1]["messages"]
+            if msg.role == MessageRole.TOOL
+        )
+        assert tool_message.metadata["timed_out"] is True
+    
+    @pytest.mark.asyncio
+    async def test_cancelling_async_run_stops_tools(self, make_agent):
+        """Test cancelling process_async reaches the running tool and skips the rest"""
+        tool = SlowTool()
+        mock_llm = Mock()
+        mock_llm.complete_async = AsyncMock(return_value=Message(
+            role=MessageRole.ASSISTANT,
+            content="",
+            tool_calls=[
+                ToolCall(id="call_1", name="slow_tool", parameters={}),
+                ToolCall(id="call_2", name="slow_tool", parameters={"n": 2}),
+            ],
+        ))
+        agent = make_agent(mock_llm, tool)
+        requests_made = []
+        refused = []
+        
+        def execute(parameters):
+            requests_made.append(parameters)
+            tool.release.wait(5)
+            try:
+                return {"timeout": effective_timeout(tool.timeout, tool.name)}
+            except ToolCancelledError:
+                refused.append(parameters)
+                raise
+        
+        tool.execute = execute
+        task = asyncio.ensure_future(
+            agent.process_async([Message(role=MessageRole.USER, content="Test")])
+        )
+        while not requests_made:
+            await asyncio.sleep(0.005)
+        
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        tool.release.set()
+        await asyncio.sleep(0.1)
+        
+        assert requests_made == [{}]
+        assert refused == [{}]
+    
+    def test_execute_tool_raises_timeout(self):
+        """Test _execute_tool surfaces ToolTimeoutError"""
+        tool = SlowTool()
+        agent = Agent(model="gpt-oss-120b", tools=[tool])
+        
+        with pytest.raises(ToolTimeoutError) as exc_info:
+            agent._execute_tool("slow_tool", {}, timeout=0.01)
+        tool.release.set()
+        
+        assert exc_info.value.timeout == 0.01
+    
+    def test_write_timeout_outcome_unknown(self):
+        """Test a timed-out write is reported as still running and keeps its limiter slot"""
+        class SlowWriteTool(SlowTool):
+            def has_side_effects(self, parameters):
+                return True
+        
+        tool = SlowWriteTool()
+        limiter = AdaptiveLimiter()
+        cache = Mock()
+        agent = Agent(model="gpt-oss-120b", tools=[tool], tool_limiter=limiter, tool_cache=cache)
+        
+        with pytest.raises(ToolOutcomeUnknownError) as exc_info:
+            agent._execute_tool("slow_tool", {}, timeout=0.01)
+        
+        assert "outcome is unknown" in str(exc_info.value)
+        assert limiter.inflight == 1
+        invalidations = cache.invalidate.call_count
+        
+        tool.release.set()
+        deadline = time.monotonic() + 2
+        while limiter.inflight and time.monotonic() < deadline:
+            time.sleep(0.005)
+        
+        assert limiter.inflight == 0
+        assert cache.invalidate.call_count == invalidations + 1
+    
+    @patch('chofesh.tools.github.Github')
+    def test_github_requests_get_deadline(self, mock_github):
+        """Test GitHub calls under a tool deadline use a client with that timeout"""
+        from chofesh.tools.github import GitHubTool
+        
+        tool = GitHubTool(token="t", repo="owner/repo")
+        tool.execute({"action": "list_issues"})
+        assert "timeout" not in mock_github.call_args[1]
+        
+        with use_tool_timeout(3.0):
+            tool.execute({"action": "list_issues"})
+        
+        assert 0 < mock_github.call_args[1]["timeout"] <= 3.0
+        mock_github.return_value.get_repo.assert_called_with("owner/repo", lazy=True)
+
+
+class TestAgentBudget:
+    """Test budget enforcement in the agent loop"""
+    
+    def test_timeout_passed_to_llm(self, make_agent):
+        """Test the deadline propagates into LLM timeouts"""
+        mock_llm = Mock()
+        mock_llm.complete.return_value = Message(role=MessageRole.ASSISTANT, content="Hi")
+        tool = Mock()
+        tool.name = "test_tool"
+        agent = make_agent(mock_llm, tool)
+        
+        agent.process([Message(role=MessageRole.USER, content="Hi")], budget=Budget(timeout=5))
+        
+        assert mock_llm.complete.call_args[1]["timeout"] <= 5
+    
+    def test_token_budget_stops_tool_loop(self, make_agent):
+        """Test the loop ends once the token budget is spent"""
+        mock_llm = Mock()
+        mock_llm.complete.return_value = tool_call_response(usage={"total_tokens": 500})
+        tool = Mock()
+        tool.name = "test_tool"
+        tool.execute.return_value = {"result": "success"}
+        agent = make_agent(mock_llm, tool)
+        
+        response = agent.process(
+            [Message(role=MessageRole.USER, content="Test")],
+            budget=Budget(max_total_tokens=800),
+        )
+        
+        assert mock_llm.complete.call_count == 2
+        assert tool.execute.call_count == 1
+        assert response.metadata["budget_exhausted"] == "tokens"
+        assert response.metadata["cut_off"] is True
+    
+    def test_max_tokens_clamped_to_token_budget(self, make_agent):
+        """Test each call asks for no more tokens than the budget has left"""
+        mock_llm = Mock()
+        mock_llm.complete.side_effect = [
+            tool_call_response(usage={"total_tokens": 700}),
+            Message(role=MessageRole.ASSISTANT, content="Done"),
+        ]
+        tool = Mock()
+        tool.name = "test_tool"
+        tool.execute.return_value = {"result": "success"}
+        agent = make_agent(mock_llm, tool)
+        
+        response = agent.process(
+            [Message(role=MessageRole.USER, content="Test")],
+            max_tokens=500,
+            budget=Budget(max_total_tokens=1000),
+        )
+        
+        assert response.content == "Done"
+        assert [call[1]["max_tokens"] for call in mock_llm.complete.call_args_list] == [500, 300]
+    
+    def test_tool_time_budget_forces_answer(self, make_agent):
+        """Test tools are withheld once tool time is spent"""
+        mock_llm = Mock()
+        mock_llm.complete.side_effect = [
+            tool_call_response(),
+            Message(role=MessageRole.ASSISTANT, content="Best effort"),
+        ]
+        tool = Mock()
+        tool.name = "test_tool"
+        tool.execute.side_effect = lambda params: time.sleep(0.02) or {"result": "slow"}
+        agent = make_agent(mock_llm, tool)
+        
+        response = agent.process(
+            [Message(role=MessageRole.USER, content="Test")],
+            budget=Budget(max_tool_time=0.01),
+        )
+        
+        assert response.content == "Best effort"
+        assert mock_llm.complete.call_args[1]["tools"] is None
+        assert response.metadata["budget_exhausted"] == "tool_time"
+    
+    def test_tool_calls_clamped_to_tool_time(self, make_agent):
+        """Test a tool call cannot run past the tool time left in the budget"""
+        tool = SlowTool()
+        mock_llm = Mock()
+        mock_llm.complete.side_effect = [
+            Message(
+                role=MessageRole.ASSISTANT,
+                content="",
+                tool_calls=[ToolCall(id="call_1", name="slow_tool", parameters={})],
+            ),
+            Message(role=MessageRole.ASSISTANT, content="Without the tool"),
+        ]
+        agent = make_agent(mock_llm, tool)
+        budget = Budget(max_tool_time=0.05)
+        
+        response = agent.process([Message(role=MessageRole.USER, content="Test")], budget=budget)
+        tool.release.set()
+        
+        assert budget.tool_time < 1
+        assert tool.request_timeout <= 0.05
+        assert response.content == "Without the tool"
+        assert response.metadata["budget_exhausted"] == "tool_time"
+        assert mock_llm.complete.call_args[1]["tools"] is None
+    
+    def test_tool_time_budget_skips_remaining_calls(self, make_agent):
+        """Test pending tool calls are skipped with an error message"""
+        budget = Budget(max_tool_time=0.01)
+        tool = Mock()
+        tool.name = "test_tool"
+        tool.execute.side_effect = lambda params: time.sleep(0.02) or {"result": "slow"}
+        agent = make_agent(Mock(), tool)
+        calls = [
+            ToolCall(id="call_1", name="test_tool", parameters={}),
+            ToolCall(id="call_2", name="test_tool", parameters={}),
+        ]
+        
+        tool_messages = agent._run_tool_calls(calls, budget)
+        
+        assert tool.execute.call_count == 1
+        assert tool_messages[1].metadata["budget_exhausted"] == "tool_time"
+        assert calls[1].error.startswith("Skipped")
+    
+    def test_deadline_returns_cut_off_answer(self, make_agent):
+        """Test an LLM timeout past the deadline says the run was cut off"""
+        mock_llm = Mock()
+        first = tool_call_response()
+        
+        def complete(**kwargs):
+            if mock_llm.complete.call_count > 1:
+                time.sleep(0.05)
+                raise requests.exceptions.Timeout()
+            return first
+        
+        mock_llm.complete.side_effect = complete
+        tool = Mock()
+        tool.name = "test_tool"
+        tool.execute.return_value = {"result": "success"}
+        agent = make_agent(mock_llm, tool)
+        
+        response = agent.process(
+            [Message(role=MessageRole.USER, content="Test")],
+            budget=Budget(timeout=0.03),
+        )
+        
+        assert response is not first
+        assert response.tool_calls == []
+        assert response.content == (
+            "Using tool\n\nStopped before finishing: the time budget ran out. "
+            "Tool calls that ran: test_tool."
+        )
+        assert response.metadata["cut_off"] is True
+        assert response.metadata["executed_tool_calls"] == ["test_tool"]
+        assert response.metadata["pending_tool_calls"] == []
+        assert response.metadata["budget_exhausted"] == "deadline"
+    
+    def test_deadline_without_answer_raises(self, make_agent):
+        """Test a timeout on the first call raises BudgetExceededError"""
+        mock_llm = Mock()
+        
+        def complete(**kwargs):
+            time.sleep(0.02)
+            raise requests.exceptions.Timeout()
+        
+        mock_llm.complete.side_effect = complete
+        tool = Mock()
+        tool.name = "test_tool"
+        agent = make_agent(mock_llm, tool)
+        
+        with pytest.raises(BudgetExceededError) as exc_info:
+            agent.process(
+                [Message(role=MessageRole.USER, content="Test")],
+                budget=Budget(timeout=0.01),
+            )
+        
+        assert exc_info.value.reason == "deadline"
+    
+    def test_timeout_without_budget_propagates(self, make_agent):
+        """Test timeouts are re-raised when no budget is involved"""
+        mock_llm = Mock()
+        mock_llm.complete.side_effect = requests.exceptions.Timeout()
+        tool = Mock()
+        tool.name = "test_tool"
+        agent = make_agent(mock_llm, tool)
+        
+        with pytest.raises(requests.exceptions.Timeout):
+            agent.process([Message(role=MessageRole.USER, content="Test")])
+    
+    @pytest.mark.asyncio
+    async def test_process_async_token_budget(self, make_agent):
+        """Test async loop honors the token budget"""
+        mock_llm = Mock()
+        mock_llm.complete_async = AsyncMock(
+            return_value=tool_call_response(usage={"total_tokens": 500})
+        )
+        tool = Mock()
+        tool.name = "test_tool"
+        tool.execute.return_value = {"result": "success"}
+        agent = make_agent(mock_llm, tool)
+        
+        response = await agent.process_async(
+            [Message(role=MessageRole.USER, content="Test")],
+            budget=Budget(max_total_tokens=800),
+        )
+        
+        assert mock_llm.complete_async.call_count == 2
+        assert mock_llm.complete_async.call_args[1]["max_tokens"] == 300
+        assert response.metadata["budget_exhausted"] == "tokens"
+        assert response.metadata["cut_off"] is True
+        assert "token budget ran out" in response.content
@@ -0,0 +1,124 @@
+"""
+Tests for context module
+"""
+import pytest
+from chofesh.context import ContextWindow, Compactor
+from chofesh.message import Message, MessageRole
+
+
+def msg(role, content="x" * 36):
+    """Message worth 13 estimated tokens by default"""
+    return Message(role=role, content=content)
+
+
+def turns(count):
+    """User/assistant turns after a system prompt"""
+    messages = [msg(MessageRole.SYSTEM, "Be brief")]
+    for _ in range(count):
+        messages.append(msg(MessageRole.USER))
+        messages.append(msg(MessageRole.ASSISTANT))
+    return messages
+
+
+class TestContextWindow:
+    """Test ContextWindow class"""
+    
+    def test_invalid_budget(self):
+        """Test non-positive budgets are rejected"""
+        with pytest.raises(ValueError):
+            ContextWindow(max_tokens=0)
+    
+    def test_everything_fits(self):
+        """Test short histories are returned unchanged"""
+        messages = turns(2)
+        window = ContextWindow(max_tokens=1000)
+        
+        assert window.fit(messages) == messages
+    
+    def test_trims_oldest_turns(self):
+        """Test old turns are dropped and the system prompt kept"""
+        messages = turns(10)
+        window = ContextWindow(max_tokens=60)
+        
+        fitted = window.fit(messages)
+        
+        assert fitted[0].role == MessageRole.SYSTEM
+        assert fitted[1].role == MessageRole.USER
+        assert fitted[-1] is messages[-1]
+        assert ContextWindow.count_tokens(fitted) <= 60
+    
+    def test_reserve_tokens(self):
+        """Test reserved completion tokens shrink the window"""
+        messages = turns(10)
+        window = ContextWindow(max_tokens=120)
+        
+        assert len(window.fit(messages, reserve_tokens=60)) < len(window.fit(messages))
+    
+    def test_max_messages(self):
+        """Test windowing by message count"""
+        messages = turns(10)
+        window = ContextWindow(max_tokens=10000, max_messages=4)
+        
+        fitted = window.fit(messages)
+        
+        assert len(fitted) == 5
+        assert fitted[1:] == messages[-4:]
+    
+    def test_window_starts_on_user_turn(self):
+        """Test tool results are not sent without their assistant call"""
+        messages = [
+            msg(MessageRole.SYSTEM, "Be brief"),
+            msg(MessageRole.USER),
+            msg(MessageRole.ASSISTANT),
+            msg(MessageRole.TOOL),
+            msg(MessageRole.ASSISTANT),
+            msg(MessageRole.USER),
+        ]
+        window = ContextWindow(max_tokens=10000, max_messages=3)
+        
+        fitted = window.fit(messages)
+        
+        assert [m.role for m in fitted] == [MessageRole.SYSTEM, MessageRole.USER]
+    
+    def test_latest_message_always_kept(self):
+        """Test an oversized latest message is still sent"""
+        messages = [msg(MessageRole.USER), msg(MessageRole.USER, "x" * 4000)]
+        window = ContextWindow(max_tokens=50)
+        
+        assert window.fit(messages) == messages[-1:]
+
+
+class TestCompactor:
+    """Test Compactor class"""
+    
+    def test_invalid_threshold(self):
+        """Test non-positive thresholds are rejected"""
+        with pytest.raises(ValueError):
+            Compactor(threshold_tokens=0)
+    
+    def test_no_split_under_threshold(self):
+        """Test short histories are not compacted"""
+        compactor = Compactor(threshold_tokens=1000)
+        
+        assert compactor.split_point(turns(3), 1) is None
+    
+    def test_split_keeps_recent_turns(self):
+        """Test the cut keeps recent messages and lands on a user turn"""
+        messages = turns(10)
+        compactor = Compactor(threshold_tokens=50, keep_recent=3)
+        
+        cut = compactor.split_point(messages, 1)
+        
+        assert cut == len(messages) - 4
+        assert messages[cut].role == MessageRole.USER
+    
+    def test_build_request(self):
+        """Test the summarization request includes the previous summary"""
+        compactor = Compactor(threshold_tokens=50)
+        
+        request = compactor.build_request("Earlier facts", turns(1)[1:])
+        
+        assert request[0].role == MessageRole.SYSTEM
+        assert "Earlier facts" in request[1].content
+        assert "user: " in request[1].content
+        assert "assistant: " in request[1].content
@@ -1,11 +1,16 @@
 """
 Tests for conversation module
 """
+import asyncio
+import threading
+import time
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from chofesh.conversation import Conversation
 from chofesh.agent import Agent
 from chofesh.message import Message, MessageRole, StreamChunk
+from chofesh.context import ContextWindow, Compactor
+from chofesh.transcript import CompactMessage
 
 
 class TestConversation:
@@ -79,6 +84,26 @@ class TestConversation:
         assert conversation.messages[0].role == MessageRole.USER
         assert conversation.messages[1].role == MessageRole.ASSISTANT
     
+    @patch('chofesh.agent.LLM')
+    def test_history_stored_compactly(self, mock_llm_class):
+        """Test finished turns are kept as compact entries and sent as such"""
+        mock_llm = Mock()
+        mock_llm.complete.return_value = Message(role=MessageRole.ASSISTANT, content="Hello")
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(agent=agent, system_message="Be brief")
+        
+        response = conversation.send_message("Hi")
+        conversation.send_message("Again")
+        
+        entries = conversation.messages.entries()
+        assert all(isinstance(entry, CompactMessage) for entry in entries)
+        assert conversation.messages[2] is response
+        sent = mock_llm.complete.call_args.kwargs["messages"]
+        assert sent[:3] == entries[:3]
+        assert conversation.to_dict()["messages"][1]["content"] == "Hi"
+    
     @patch('chofesh.agent.LLM')
     def test_send_message_with_temperature(self, mock_llm_class):
         """Test sending message with custom temperature"""
@@ -337,3 +362,373 @@ class TestConversation:
         assert conversation.messages[1].content == "Response 1"
         assert conversation.messages[3].content == "Response 2"
         assert conversation.messages[5].content == "Response 3"
+    
+    @patch('chofesh.agent.LLM')
+    def test_send_message_with_context_window(self, mock_llm_class):
+        """Test only the windowed history is sent to the agent"""
+        mock_llm = Mock()
+        mock_llm.complete.return_value = Message(
+            role=MessageRole.ASSISTANT,
+            content="Response"
+        )
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(
+            agent=agent,
+            system_message="You are helpful",
+            context_window=ContextWindow(max_tokens=10000, max_messages=3),
+        )
+        
+        for i in range(5):
+            conversation.send_message(f"Message {i}")
+        
+        sent = mock_llm.complete.call_args[1]["messages"]
+        assert len(conversation.messages) == 11
+        assert len(sent) == 4
+        assert sent[0].role == MessageRole.SYSTEM
+        assert sent[1].content == "Message 3"
+        assert sent[-1].content == "Message 4"
+    
+    @patch('chofesh.agent.LLM')
+    def test_background_compaction(self, mock_llm_class):
+        """Test older turns are folded into a summary after a reply"""
+        mock_llm = Mock()
+        
+        def complete(messages, **kwargs):
+            if messages[0].content.startswith("You maintain a running summary"):
+                return Message(role=MessageRole.ASSISTANT, content="User said hello")
+            return Message(role=MessageRole.ASSISTANT, content="x" * 80)
+        
+        mock_llm.complete.side_effect = complete
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(
+            agent=agent,
+            system_message="You are helpful",
+            compactor=Compactor(threshold_tokens=60, keep_recent=2),
+        )
+        
+        for i in range(3):
+            conversation.send_message(f"Message {i}")
+            conversation.wait_for_compaction()
+        
+        assert conversation.summary is not None
+        assert "User said hello" in conversation.summary.content
+        assert conversation.summarized_until == 5
+        assert len(conversation.messages) == 7
+        
+        sent = conversation._context_messages()
+        assert sent[0].content == "You are helpful"
+        assert sent[1] is conversation.summary
+        assert sent[2:] == conversation.messages.entries(5)
+    
+    @patch('chofesh.agent.LLM')
+    def test_compaction_failure_keeps_history(self, mock_llm_class):
+        """Test a failed summarization leaves the history untouched"""
+        mock_llm = Mock()
+        
+        def complete(messages, **kwargs):
+            if messages[0].content.startswith("You maintain a running summary"):
+                raise RuntimeError("summarizer down")
+            return Message(role=MessageRole.ASSISTANT, content="x" * 80)
+        
+        mock_llm.complete.side_effect = complete
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(
+            agent=agent,
+            compactor=Compactor(threshold_tokens=30, keep_recent=1),
+        )
+        
+        conversation.send_message("First")
+        conversation.send_message("Second")
+        conversation.wait_for_compaction()
+        
+        assert conversation.summary is None
+        assert conversation._context_messages() == conversation.messages.entries()
+    
+    @patch('chofesh.agent.LLM')
+    @pytest.mark.asyncio
+    async def test_background_compaction_async(self, mock_llm_class):
+        """Test async replies schedule compaction as a task"""
+        mock_llm = Mock()
+        mock_llm.complete_async = AsyncMock(
+            return_value=Message(role=MessageRole.ASSISTANT, content="Summary text")
+        )
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        agent.process_async = AsyncMock(
+            return_value=Message(role=MessageRole.ASSISTANT, content="x" * 80)
+        )
+        conversation = Conversation(
+            agent=agent,
+            compactor=Compactor(threshold_tokens=30, keep_recent=1),
+        )
+        
+        await conversation.send_message_async("First")
+        await conversation.send_message_async("Second")
+        await conversation.wait_for_compaction_async()
+        
+        assert conversation.summary is not None
+        assert conversation.summarized_until == 2
+    
+    @patch('chofesh.agent.LLM')
+    def test_summary_round_trip(self, mock_llm_class):
+        """Test the compacted state survives to_dict/from_dict"""
+        mock_llm = Mock()
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(agent=agent, conversation_id="conv_123")
+        conversation.messages.extend([
+            Message(role=MessageRole.USER, content="Hi"),
+            Message(role=MessageRole.ASSISTANT, content="Hello"),
+            Message(role=MessageRole.USER, content="Bye"),
+        ])
+        conversation.summary = Message(
+            role=MessageRole.SYSTEM,
+            content="Greetings were exchanged",
+            metadata={"summary": True},
+        )
+        conversation.summarized_until = 2
+        
+        restored = Conversation.from_dict(conversation.to_dict(), agent)
+        
+        assert restored.summary.content == "Greetings were exchanged"
+        assert restored.summarized_until == 2
+        assert [m.content for m in restored._context_messages()] == [
+            "Greetings were exchanged",
+            "Bye",
+        ]
+    
+    @patch('chofesh.agent.LLM')
+    def test_clear_drops_summary(self, mock_llm_class):
+        """Test clearing also discards the summary"""
+        mock_llm = Mock()
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(agent=agent)
+        conversation.summary = Message(role=MessageRole.SYSTEM, content="Summary")
+        conversation.summarized_until = 4
+        
+        conversation.clear()
+        
+        assert conversation.summary is None
+        assert conversation.summarized_until == 0
+    
+    @patch('chofesh.agent.LLM')
+    def test_json_round_trip(self, mock_llm_class):
+        """Test converting conversation to and from JSON"""
+        mock_llm = Mock()
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(
+            agent=agent,
+            system_message="You are helpful",
+            conversation_id="conv_123",
+        )
+        conversation.messages.append(Message(role=MessageRole.USER, content="Hi"))
+        
+        restored = Conversation.from_json(conversation.to_json(), agent)
+        
+        assert restored.conversation_id == "conv_123"
+        assert restored.to_dict() == conversation.to_dict()
+    
+    @patch('chofesh.agent.LLM')
+    def test_transcript_round_trip(self, mock_llm_class):
+        """Test converting conversation history to a compact transcript"""
+        mock_llm = Mock()
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(agent=agent, system_message="You are helpful")
+        conversation.messages.append(Message(role=MessageRole.USER, content="Hi"))
+        
+        transcript = conversation.to_transcript()
+        restored = Conversation.from_transcript(transcript, agent, conversation_id="conv_1")
+        
+        assert len(transcript) == 2
+        assert restored.conversation_id == "conv_1"
+        assert [m.to_dict() for m in restored.messages] == [
+            m.to_dict() for m in conversation.messages
+        ]
+    
+    @patch('chofesh.agent.LLM')
+    def test_fork(self, mock_llm_class):
+        """Test branches share history but diverge independently"""
+        mock_llm = Mock()
+        mock_llm_class.return_value = mock_llm
+        mock_llm.complete.return_value = Message(role=MessageRole.ASSISTANT, content="Ok")
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation(agent=agent, system_message="You are helpful")
+        conversation.send_message("Hi")
+        
+        branch_a = conversation.fork()
+        branch_b = conversation.fork(conversation_id="branch_b")
+        branch_a.send_message("Option A")
+        branch_b.send_message("Option B")
+        
+        assert len(conversation.messages) == 3
+        assert [m.content for m in branch_a.messages][-2:] == ["Option A", "Ok"]
+        assert [m.content for m in branch_b.messages][-2:] == ["Option B", "Ok"]
+        assert branch_a.messages[1] is conversation.messages[1]
+        assert branch_b.conversation_id == "branch_b"
+    
+    @patch('chofesh.agent.LLM')
+    def test_fork_keeps_summary_and_serializes(self, mock_llm_class):
+        """Test forks carry the summary and round-trip through to_dict"""
+        mock_llm = Mock()
+        mock_llm_class.return_value = mock_llm
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = mock_llm
+        conversation = Conversation.from_dict(
+            {
+                "conversation_id": "conv_1",
+                "messages": [
+                    Message(role=MessageRole.USER, content="Hi").to_dict(),
+                    Message(role=MessageRole.ASSISTANT, content="Hello").to_dict(),
+                ],
+            },
+            agent,
+            lazy=True,
+        )
+        conversation._apply_summary(Message(role=MessageRole.ASSISTANT, content="Greeting"), 2, 0)
+        
+        branch = conversation.fork()
+        branch.messages.append(Message(role=MessageRole.USER, content="More"))
+        restored = Conversation.from_dict(branch.to_dict(), agent)
+        
+        assert branch.summary is conversation.summary
+        assert len(conversation.messages) == 2
+        assert [m.content for m in restored.messages] == ["Hi", "Hello", "More"]
+        assert restored.summarized_until == 2
+
+
+class TestConversationConcurrency:
+    """Test turn ordering and parallel sub-queries"""
+    
+    @patch('chofesh.agent.LLM')
+    @pytest.mark.asyncio
+    async def test_concurrent_async_turns_are_ordered(self, mock_llm_class):
+        """Test gathered turns do not interleave"""
+        sent = []
+        
+        async def complete_async(messages, **kwargs):
+            sent.append([m.content for m in messages])
+            await asyncio.sleep(0.01)
+            return Message(role=MessageRole.ASSISTANT, content=f"Re: {messages[-1].content}")
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = Mock()
+        agent.llm.complete_async = complete_async
+        conversation = Conversation(agent=agent)
+        
+        await asyncio.gather(*(
+            conversation.send_message_async(f"Q{i}") for i in range(3)
+        ))
+        
+        assert [m.content for m in conversation.messages] == [
+            "Q0", "Re: Q0", "Q1", "Re: Q1", "Q2", "Re: Q2"
+        ]
+        assert sent[2] == ["Q0", "Re: Q0", "Q1", "Re: Q1", "Q2"]
+        assert conversation.pending_turns == 0
+    
+    @patch('chofesh.agent.LLM')
+    def test_threaded_turns_are_serialized(self, mock_llm_class):
+        """Test turns from several threads keep user/assistant pairs together"""
+        def complete(messages, **kwargs):
+            time.sleep(0.005)
+            return Message(role=MessageRole.ASSISTANT, content=f"Re: {messages[-1].content}")
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = Mock()
+        agent.llm.complete.side_effect = complete
+        conversation = Conversation(agent=agent)
+        
+        threads = [
+            threading.Thread(target=conversation.send_message, args=(f"Q{i}",))
+            for i in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        contents = [m.content for m in conversation.messages]
+        assert len(contents) == 10
+        for user, assistant in zip(contents[::2], contents[1::2]):
+            assert assistant == f"Re: {user}"
+    
+    @patch('chofesh.agent.LLM')
+    @pytest.mark.asyncio
+    async def test_cancelled_turn_releases_queue(self, mock_llm_class):
+        """Test a cancelled waiting turn does not block later turns"""
+        release = asyncio.Event()
+        
+        async def complete_async(messages, **kwargs):
+            if messages[-1].content == "Slow":
+                await release.wait()
+            return Message(role=MessageRole.ASSISTANT, content="Ok")
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = Mock()
+        agent.llm.complete_async = complete_async
+        conversation = Conversation(agent=agent)
+        
+        slow = asyncio.ensure_future(conversation.send_message_async("Slow"))
+        waiting = asyncio.ensure_future(conversation.send_message_async("Cancelled"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        release.set()
+        await slow
+        await conversation.send_message_async("After")
+        
+        assert [m.content for m in conversation.messages] == ["Slow", "Ok", "After", "Ok"]
+    
+    @patch('chofesh.agent.LLM')
+    @pytest.mark.asyncio
+    async def test_ask_parallel_async(self, mock_llm_class):
+        """Test sub-queries branch from a snapshot and leave history unchanged"""
+        async def complete_async(messages, **kwargs):
+            return Message(role=MessageRole.ASSISTANT, content=f"{len(messages)}:{messages[-1].content}")
+        
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = Mock()
+        agent.llm.complete_async = complete_async
+        conversation = Conversation(agent=agent, system_message="System")
+        
+        responses = await conversation.ask_parallel_async(["A", "B", "C"])
+        
+        assert [r.content for r in responses] == ["2:A", "2:B", "2:C"]
+        assert len(conversation.messages) == 1
+    
+    @patch('chofesh.agent.LLM')
+    def test_ask_parallel(self, mock_llm_class):
+        """Test threaded sub-queries"""
+        agent = Agent(model="gpt-oss-120b")
+        agent.llm = Mock()
+        agent.llm.complete.side_effect = lambda messages, **kwargs: Message(
+            role=MessageRole.ASSISTANT, content=messages[-1].content.lower()
+        )
+        conversation = Conversation(agent=agent)
+        
+        assert [r.content for r in conversation.ask_parallel(["A", "B"])] == ["a", "b"]
+        assert conversation.ask_parallel([]) == []
+        assert conversation.messages == []
@@ -0,0 +1,106 @@
+"""
+Tests for history module
+"""
+import pytest
+from chofesh.history import MessageHistory
+from chofesh.lazy import LazyMessageList
+from chofesh.message import Message, MessageRole
+from chofesh.transcript import CompactMessage
+
+
+def make_messages(count, prefix="Message"):
+    return [Message(role=MessageRole.USER, content=f"{prefix} {i}") for i in range(count)]
+
+
+class TestMessageHistory:
+    """Test MessageHistory class"""
+    
+    def test_list_behaviour(self):
+        """Test it behaves like a list"""
+        messages = make_messages(3)
+        history = MessageHistory(messages)
+        
+        assert len(history) == 3
+        assert history == messages
+        assert history[-1] is messages[2]
+        assert history[1:] == messages[1:]
+        assert history + [] == messages
+        with pytest.raises(IndexError):
+            history[3]
+    
+    def test_fork_shares_prefix(self):
+        """Test forks share messages and diverge on append"""
+        history = MessageHistory(make_messages(3))
+        
+        branch = history.fork()
+        branch.append(Message(role=MessageRole.ASSISTANT, content="Branch"))
+        history.append(Message(role=MessageRole.ASSISTANT, content="Main"))
+        
+        assert len(history) == 4 and len(branch) == 4
+        assert branch[3].content == "Branch"
+        assert history[3].content == "Main"
+        assert branch._base is history._base
+    
+    def test_copy_is_fork(self):
+        """Test copy() does not duplicate messages"""
+        history = MessageHistory(make_messages(5))
+        
+        copied = history.copy()
+        copied.append(Message(role=MessageRole.USER, content="New"))
+        
+        assert isinstance(copied, MessageHistory)
+        assert len(history) == 5
+        assert copied[0] is history[0]
+    
+    def test_modifying_prefix_copies_on_write(self):
+        """Test edits to shared messages do not leak into other branches"""
+        history = MessageHistory(make_messages(3))
+        branch = history.fork()
+        replacement = Message(role=MessageRole.USER, content="Edited")
+        
+        branch[0] = replacement
+        del branch[1]
+        branch.insert(0, replacement)
+        
+        assert [m.content for m in history] == ["Message 0", "Message 1", "Message 2"]
+        assert [m.content for m in branch] == ["Edited", "Edited", "Message 2"]
+    
+    def test_segments_stay_shallow(self):
+        """Test repeated forking keeps the segment chain logarithmic"""
+        history = MessageHistory()
+        for i in range(1024):
+            history.append(Message(role=MessageRole.USER, content=str(i)))
+            history.fork()
+        
+        assert len(history._base.chain()) <= 11
+        assert [int(m.content) for m in history] == list(range(1024))
+        assert history[517].content == "517"
+        assert [m.content for m in history[510:514]] == ["510", "511", "512", "513"]
+    
+    def test_frozen_messages_stored_compactly(self):
+        """Test freezing keeps compact entries and rebuilds messages on read"""
+        messages = make_messages(3)
+        history = MessageHistory(messages)
+        
+        history.freeze()
+        
+        assert all(isinstance(entry, CompactMessage) for entry in history.entries())
+        assert history[1] is messages[1]
+        del messages
+        assert isinstance(history[1], Message)
+        assert [m.content for m in history] == ["Message 0", "Message 1", "Message 2"]
+        assert [m.content for m in history.entries(1)] == ["Message 1", "Message 2"]
+    
+    def test_adopt_lazy_sequence(self):
+        """Test adopting a lazy list keeps parsing on access"""
+        lazy = LazyMessageList([m.to_dict() for m in make_messages(10)])
+        
+        history = MessageHistory.adopt(lazy)
+        branch = history.fork()
+        branch.append(Message(role=MessageRole.USER, content="New"))
+        
+        assert branch[9].content == "Message 9"
+        assert lazy.parsed_count == 1
+        assert len(branch) == 11
+        assert [m.content for m in branch.entries(8)] == ["Message 8", "Message 9", "New"]
+        assert lazy.parsed_count == 2
@@ -0,0 +1,71 @@
+"""
+Tests for JSON backend module
+"""
+import json
+import pytest
+from chofesh import json_backend
+
+
+BACKENDS = ["json"]
+if json_backend.ORJSON_AVAILABLE:
+    BACKENDS.append("orjson")
+if json_backend.MSGSPEC_AVAILABLE:
+    BACKENDS.append("msgspec")
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    """Run a test against every installed backend"""
+    previous = json_backend.BACKEND
+    json_backend.set_backend(request.param)
+    yield request.param
+    json_backend.set_backend(previous)
+
+
+class TestJsonBackend:
+    """Test JSON backend functions"""
+    
+    def test_default_backend(self):
+        """Test the fastest installed backend is selected"""
+        if json_backend.ORJSON_AVAILABLE:
+            assert json_backend.BACKEND == "orjson"
+        elif json_backend.MSGSPEC_AVAILABLE:
+            assert json_backend.BACKEND == "msgspec"
+        else:
+            assert json_backend.BACKEND == "json"
+    
+    def test_unknown_backend(self):
+        """Test selecting a missing backend fails"""
+        with pytest.raises(ValueError):
+            json_backend.set_backend("simdjson")
+    
+    def test_round_trip(self, backend):
+        """Test encoding and decoding agree with the stdlib"""
+        data = {"role": "user", "content": "שלום", "n": [1, 2.5, None, True]}
+        
+        encoded = json_backend.dumpb(data)
+        
+        assert isinstance(encoded, bytes)
+        assert json.loads(encoded) == data
+        assert json_backend.loads(encoded) == data
+        assert json_backend.loads(encoded.decode("utf-8")) == data
+        assert json_backend.dumps(data) == encoded.decode("utf-8")
+    
+    def test_compact_output(self, backend):
+        """Test output has no whitespace"""
+        assert json_backend.dumpb({"a": [1, 2]}) == b'{"a":[1,2]}'
+    
+    def test_fallback_for_unsupported_values(self, backend):
+        """Test values the fast backends reject still encode"""
+        assert json.loads(json_backend.dumpb({1: 2**70})) == {"1": 2**70}
+    
+    def test_default_hook(self, backend):
+        """Test unsupported objects go through the default hook"""
+        encoded = json_backend.dumpb({"value": object()}, default=lambda obj: "object")
+        
+        assert json.loads(encoded) == {"value": "object"}
+    
+    def test_decode_error(self, backend):
+        """Test malformed input raises a DecodeError"""
+        with pytest.raises(json_backend.DecodeError):
+            json_backend.loads(b"not json")
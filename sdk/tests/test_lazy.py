@@ -0,0 +1,228 @@
+"""
+Tests for lazy module
+"""
+import io
+import json
+import pytest
+from chofesh.conversation import Conversation
+from chofesh.lazy import LazyMessageList, stream_conversation
+from chofesh.message import Message, MessageRole
+from chofesh.transcript import CompactMessage
+
+
+def message_dicts(count):
+    """Alternating user/assistant message dictionaries"""
+    return [
+        Message(
+            role=MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT,
+            content=f"Message {i} ש",
+        ).to_dict()
+        for i in range(count)
+    ]
+
+
+class TestLazyMessageList:
+    """Test LazyMessageList class"""
+    
+    def test_parse_on_access(self):
+        """Test entries are parsed only when read"""
+        messages = LazyMessageList(message_dicts(10))
+        
+        assert len(messages) == 10
+        assert messages.parsed_count == 0
+        
+        assert messages[-1].content == "Message 9 ש"
+        assert messages.parsed_count == 1
+        assert messages[-1] is messages[9]
+        assert isinstance(messages.entries(9)[0], CompactMessage)
+    
+    def test_json_entries(self):
+        """Test raw JSON text entries"""
+        raw = [json.dumps(d) for d in message_dicts(2)]
+        
+        messages = LazyMessageList(raw)
+        
+        assert messages[0].role == MessageRole.USER
+        assert list(messages.iter_json())[1] == raw[1]
+    
+    def test_slicing_and_mutation(self):
+        """Test list operations"""
+        messages = LazyMessageList(message_dicts(4))
+        extra = Message(role=MessageRole.USER, content="Extra")
+        
+        messages.append(extra)
+        messages.insert(0, Message(role=MessageRole.SYSTEM, content="System"))
+        del messages[1]
+        
+        assert len(messages) == 5
+        assert [m.content for m in messages[:2]] == ["System", "Message 1 ש"]
+        assert messages[-1] is extra
+        
+        messages[1:3] = [extra]
+        assert len(messages) == 4
+    
+    def test_index_error(self):
+        """Test out-of-range access"""
+        with pytest.raises(IndexError):
+            LazyMessageList(message_dicts(1))[1]
+    
+    def test_iter_dicts_skips_parsing(self):
+        """Test serialization of unparsed entries"""
+        data = message_dicts(3)
+        messages = LazyMessageList(data)
+        messages[0]
+        
+        assert list(messages.iter_dicts()) == data
+        assert messages.parsed_count == 1
+    
+    def test_copy_returns_list(self):
+        """Test copy() materializes a plain list"""
+        messages = LazyMessageList(message_dicts(3))
+        
+        copied = messages.copy()
+        
+        assert isinstance(copied, list)
+        assert copied == messages
+
+
+class TestStreamConversation:
+    """Test stream_conversation function"""
+    
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+    def test_stream_text(self, chunk_size):
+        """Test reading a to_dict document in small chunks"""
+        data = {
+            "conversation_id": "conv_1",
+            "messages": message_dicts(5),
+            "summary": None,
+            "agent": {"model": "gpt-oss-120b", "tools": []},
+        }
+        
+        header, raw = stream_conversation(
+            io.StringIO(json.dumps(data, indent=2)),
+            chunk_size=chunk_size,
+        )
+        
+        assert header == {
+            "conversation_id": "conv_1",
+            "summary": None,
+            "agent": {"model": "gpt-oss-120b", "tools": []},
+        }
+        assert [json.loads(text) for text in raw] == data["messages"]
+    
+    def test_stream_bytes(self):
+        """Test reading UTF-8 bytes split mid-character"""
+        data = {"messages": message_dicts(3), "conversation_id": 12345}
+        
+        header, raw = stream_conversation(
+            io.BytesIO(json.dumps(data, ensure_ascii=False).encode("utf-8")),
+            chunk_size=3,
+        )
+        
+        assert header["conversation_id"] == 12345
+        assert json.loads(raw[2])["content"] == "Message 2 ש"
+    
+    @pytest.mark.parametrize("chunk_size", [1, 2, 5])
+    def test_strings_with_brackets_and_escapes(self, chunk_size):
+        """Test brackets, quotes and backslashes inside strings split across chunks"""
+        content = 'a "quoted" } ] { [ \\" \\\\ path\\\\ ש'
+        data = {
+            "count": -12.5e3,
+            "flag": True,
+            "messages": [{"role": "user", "content": content}, {"role": "user", "content": "\\"}],
+            "note": "} \\\"",
+        }
+        text = json.dumps(data)
+        
+        header, raw = stream_conversation(io.StringIO(text), chunk_size=chunk_size)
+        
+        assert header == {"count": -12.5e3, "flag": True, "note": "} \\\""}
+        assert raw[0] == json.dumps(data["messages"][0])
+        assert [json.loads(message) for message in raw] == data["messages"]
+    
+    @pytest.mark.parametrize("chunk_size", [3, 64 * 1024])
+    def test_deeply_nested_values(self, chunk_size):
+        """Test values nested deeper than the single-match fast path"""
+        data = {
+            "messages": [{"role": "user", "content": "x", "meta": [[[[[["}"]]]]]]}],
+            "agent": {"a": {"b": {"c": {"d": {"e": [1, 2.5, None]}}}}},
+        }
+        
+        header, raw = stream_conversation(io.StringIO(json.dumps(data)), chunk_size=chunk_size)
+        
+        assert header == {"agent": data["agent"]}
+        assert json.loads(raw[0]) == data["messages"][0]
+    
+    def test_empty_messages(self):
+        """Test an empty message array"""
+        header, raw = stream_conversation(io.StringIO('{"messages": [], "x": 1}'))
+        
+        assert raw == []
+        assert header == {"x": 1}
+    
+    def test_malformed_input(self):
+        """Test truncated documents are rejected"""
+        with pytest.raises(ValueError):
+            stream_conversation(io.StringIO('{"messages": [{"role": "user"'))
+
+
+class TestLazyConversation:
+    """Test lazy loading through Conversation"""
+    
+    def test_from_dict_lazy(self, make_agent):
+        """Test lazy from_dict defers parsing"""
+        data = {"conversation_id": "conv_1", "messages": message_dicts(100)}
+        
+        conversation = Conversation.from_dict(data, make_agent(), lazy=True)
+        
+        assert isinstance(conversation.messages, LazyMessageList)
+        assert conversation.messages.parsed_count == 0
+        assert conversation.to_dict()["messages"] == data["messages"]
+        assert conversation.messages.parsed_count == 0
+    
+    def test_dump_and_load(self, make_agent):
+        """Test streaming a conversation to a file and back"""
+        agent = make_agent()
+        conversation = Conversation(
+            agent=agent,
+            system_message="You are helpful",
+            conversation_id="conv_1",
+        )
+        conversation.messages.extend(Message.from_dict(d) for d in message_dicts(20))
+        buffer = io.StringIO()
+        
+        conversation.dump(buffer)
+        buffer.seek(0)
+        restored = Conversation.load(buffer, agent, chunk_size=16)
+        
+        assert json.loads(buffer.getvalue()) == conversation.to_dict()
+        assert restored.conversation_id == "conv_1"
+        assert restored.messages.parsed_count == 0
+        assert restored.to_dict() == conversation.to_dict()
+    
+    def test_append_turn_parses_only_window(self, make_agent):
+        """Test one new turn on a long lazy history"""
+        from chofesh.context import ContextWindow
+        
+        agent = make_agent()
+        agent.llm.complete.return_value = Message(role=MessageRole.ASSISTANT, content="Ok")
+        data = json.dumps({"conversation_id": "c", "messages": message_dicts(1000)})
+        
+        conversation = Conversation.load(
+            io.StringIO(data),
+            agent,
+            context_window=ContextWindow(max_tokens=10000, max_messages=4),
+        )
+        conversation.send_message("One more")
+        
+        assert len(conversation.messages) == 1002
+        assert conversation.messages.parsed_count < 10
+    
+    def test_load_eager(self, make_agent):
+        """Test load can parse everything up front"""
+        data = json.dumps({"messages": message_dicts(3)})
+        
+        conversation = Conversation.load(io.StringIO(data), make_agent(), lazy=False)
+        
+        assert not isinstance(conversation.messages, LazyMessageList)
+        assert conversation.messages[1].role == MessageRole.ASSISTANT
@@ -0,0 +1,190 @@
+"""
+Tests for adaptive concurrency limits
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+import pytest
+import responses
+from chofesh.agent import Agent
+from chofesh.limits import AdaptiveLimiter
+from chofesh.llm import LLM
+from chofesh.message import Message, MessageRole
+from chofesh.exceptions import RateLimitError, ToolTimeoutError
+from chofesh.tools import Tool
+
+
+class TestAdaptiveLimiter:
+    """Test AdaptiveLimiter class"""
+    
+    def test_limit_grows_while_latency_flat(self):
+        """Test a busy limiter with steady latency raises its limit"""
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=6)
+        for _ in range(40):
+            for _ in range(limiter.limit):
+                assert limiter.acquire(timeout=0)
+            for _ in range(limiter.inflight):
+                limiter.release(latency=0.1)
+        
+        assert limiter.limit == 6
+        assert limiter.baseline() == pytest.approx(0.1)
+    
+    def test_idle_limit_does_not_grow(self):
+        """Test samples from a mostly idle limiter leave the limit alone"""
+        limiter = AdaptiveLimiter(initial_limit=10)
+        for _ in range(50):
+            limiter.acquire()
+            limiter.release(latency=0.1)
+        
+        assert limiter.limit == 10
+    
+    def test_rate_limit_cuts_once_per_burst(self, clock):
+        """Test 429s halve the limit, but calls started before the cut do not cut again"""
+        limiter = AdaptiveLimiter(initial_limit=16, clock=clock)
+        for _ in range(3):
+            limiter.acquire()
+        
+        clock.now = 1.0
+        limiter.release(dropped=True, started=0.5)
+        limiter.release(dropped=True, started=0.5)
+        assert limiter.limit == 8
+        
+        clock.now = 2.0
+        limiter.release(dropped=True, started=1.5)
+        assert limiter.limit == 4
+        assert limiter.stats()["drops"] == 3
+    
+    def test_latency_spike_cuts_limit(self):
+        """Test a call far slower than the baseline backs off, keyed per baseline"""
+        limiter = AdaptiveLimiter(initial_limit=10, backoff=0.5)
+        for latency, key in [(0.1, "fast"), (2.0, "slow"), (1.0, "fast")]:
+            limiter.acquire()
+            limiter.release(latency=latency, key=key)
+        
+        assert limiter.limit == 5
+        assert limiter.spikes == 1
+        assert limiter.baseline("slow") == 2.0
+    
+    def test_acquire_blocks_at_limit_and_track_learns(self):
+        """Test slots run out at the limit and track() reports 429s as drops"""
+        limiter = AdaptiveLimiter(initial_limit=2, min_limit=1)
+        with limiter.track():
+            with limiter.track():
+                assert not limiter.acquire(timeout=0.01)
+        
+        with pytest.raises(RateLimitError):
+            with limiter.track():
+                raise RateLimitError()
+        
+        assert limiter.limit == 1
+        assert limiter.inflight == 0
+    
+    @pytest.mark.asyncio
+    async def test_async_waiters_admitted_in_order(self):
+        """Test async callers queue for slots and cancelled ones drop out"""
+        limiter = AdaptiveLimiter(initial_limit=1)
+        order = []
+        
+        async def call(name):
+            async with limiter.track_async():
+                order.append(name)
+                await asyncio.sleep(0.01)
+        
+        first = asyncio.ensure_future(call("first"))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(call("cancelled"))
+        second = asyncio.ensure_future(call("second"))
+        await asyncio.sleep(0)
+        assert limiter.stats()["waiting"] == 2
+        
+        cancelled.cancel()
+        await asyncio.gather(first, second)
+        
+        assert order == ["first", "second"]
+        assert limiter.inflight == 0
+    
+    @responses.activate
+    def test_llm_reports_rate_limits(self):
+        """Test LLM.complete feeds 429 responses to its limiter"""
+        responses.add(
+            responses.POST,
+            "https://chofesh.ai/api/chat/completions",
+            json={"error": {"message": "Slow down"}},
+            status=429,
+        )
+        limiter = AdaptiveLimiter(initial_limit=8)
+        llm = LLM(api_key="test_key", limiter=limiter)
+        
+        with pytest.raises(RateLimitError):
+            llm.complete([Message(role=MessageRole.USER, content="Hi")])
+        
+        assert limiter.limit == 4
+        assert limiter.inflight == 0
+    
+    def test_agent_tool_calls_tracked_per_tool(self):
+        """Test tool calls go through the agent's tool limiter with per-tool baselines"""
+        class EchoTool(Tool):
+            name = "echo"
+            description = "Echo"
+            
+            def execute(self, parameters):
+                return {"echo": parameters}
+        
+        limiter = AdaptiveLimiter()
+        agent = Agent(tools=[EchoTool()], tool_limiter=limiter)
+        
+        assert agent._execute_tool("echo", {"x": 1}) == {"echo": {"x": 1}}
+        assert limiter.samples == 1
+        assert limiter.baseline("echo") is not None
+        assert limiter.inflight == 0
+    
+    def test_tool_slot_wait_bounded_by_timeout(self):
+        """Test a call waiting behind a hung call times out instead of blocking"""
+        release = threading.Event()
+        
+        class HangTool(Tool):
+            name = "hang"
+            description = "Hang"
+            
+            def execute(self, parameters):
+                release.wait(5)
+                return {}
+        
+        limiter = AdaptiveLimiter(initial_limit=1)
+        agent = Agent(tools=[HangTool()], tool_limiter=limiter)
+        with pytest.raises(ToolTimeoutError):
+            agent._execute_tool("hang", {}, timeout=0.05)
+        
+        started = time.monotonic()
+        with pytest.raises(ToolTimeoutError) as exc_info:
+            agent._execute_tool("hang", {}, timeout=0.1)
+        
+        assert time.monotonic() - started < 1
+        assert exc_info.value.timeout == 0.1
+        release.set()
+    
+    def test_llm_slot_wait_bounded_by_timeout(self):
+        """Test a request waiting for a slot gives up at its timeout"""
+        limiter = AdaptiveLimiter(initial_limit=1)
+        llm = LLM(api_key="test_key", limiter=limiter)
+        limiter.acquire()
+        
+        with pytest.raises(concurrent.futures.TimeoutError):
+            llm.complete([Message(role=MessageRole.USER, content="Hi")], timeout=0.05)
+        
+        assert limiter.inflight == 1
+    
+    @pytest.mark.asyncio
+    async def test_async_slot_wait_bounded_by_timeout(self):
+        """Test track_async gives up waiting at its timeout and leaves no waiter behind"""
+        limiter = AdaptiveLimiter(initial_limit=1)
+        limiter.acquire()
+        
+        with pytest.raises(asyncio.TimeoutError):
+            async with limiter.track_async(timeout=0.05):
+                pass
+        
+        assert limiter.stats()["waiting"] == 0
+        limiter.release()
+        assert limiter.inflight == 0
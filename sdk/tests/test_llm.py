@@ -3,9 +3,11 @@ Tests for LLM module
 """
 import pytest
 import responses
+import json
 from unittest.mock import patch, Mock
 from chofesh.llm import LLM
 from chofesh.message import Message, MessageRole, StreamChunk
+from chofesh.tools import ToolSchemas
 from chofesh.exceptions import APIError, AuthenticationError, RateLimitError
 
 
@@ -124,8 +126,138 @@ class TestLLM:
         assert response.content == "Response"
         
         # Verify temperature was sent in request
-        request_body = responses.calls[0].request.body
-        assert b'"temperature": 0.9' in request_body
+        request_body = json.loads(responses.calls[0].request.body)
+        assert request_body["temperature"] == 0.9
+    
+    def test_build_body(self):
+        """Test request body is assembled from cached message encodings"""
+        llm = LLM(model="gpt-oss-120b", api_key="test_key")
+        messages = [
+            Message(role=MessageRole.SYSTEM, content="Be brief"),
+            Message(role=MessageRole.USER, content="Hi \u05e9"),
+        ]
+        
+        body = llm._build_body(
+            messages,
+            temperature=0.5,
+            max_tokens=10,
+            tools=None,
+            stream=False,
+            top_p=0.9,
+        )
+        
+        assert isinstance(body, bytes)
+        assert json.loads(body) == {
+            "model": "gpt-oss-120b",
+            "messages": [
+                {"role": "system", "content": "Be brief"},
+                {"role": "user", "content": "Hi \u05e9"},
+            ],
+            "temperature": 0.5,
+            "stream": False,
+            "max_tokens": 10,
+            "top_p": 0.9,
+        }
+        assert all(msg._wire_bytes is not None for msg in messages)
+    
+    def test_build_body_kwargs_override(self):
+        """Test extra parameters can still override the model"""
+        llm = LLM(model="gpt-oss-120b", api_key="test_key")
+        
+        body = llm._build_body(
+            [Message(role=MessageRole.USER, content="Hi")],
+            temperature=0.7,
+            max_tokens=None,
+            tools=None,
+            stream=True,
+            model="other-model",
+        )
+        
+        assert json.loads(body)["model"] == "other-model"
+    
+    def test_body_orders_stable_fields_first(self):
+        """Test model, tools and system messages come before per-request fields"""
+        llm = LLM(model="gpt-oss-120b", api_key="test_key")
+        tools = [{"type": "function", "function": {"name": "search"}}]
+        system = Message(role=MessageRole.SYSTEM, content="Be brief")
+        
+        body, prefix_length = llm._encode_request(
+            [system, Message(role=MessageRole.USER, content="Hi")],
+            temperature=0.5,
+            max_tokens=None,
+            tools=tools,
+            stream=False,
+        )
+        
+        assert body.startswith(b'{"model":"gpt-oss-120b","tools":[')
+        assert body[:prefix_length].endswith(system.wire_bytes())
+        assert list(json.loads(body)) == ["model", "tools", "messages", "temperature", "stream"]
+    
+    @responses.activate
+    def test_prefix_fingerprint_stable_across_turns(self):
+        """Test the fingerprint header ignores growing history and settings"""
+        responses.add(
+            responses.POST,
+            "https://chofesh.ai/api/chat/completions",
+            json={"choices": [{"message": {"role": "assistant", "content": "Ok"}}]},
+            status=200,
+        )
+        llm = LLM(model="gpt-oss-120b", api_key="test_key")
+        messages = [
+            Message(role=MessageRole.SYSTEM, content="Be brief"),
+            Message(role=MessageRole.USER, content="Hi"),
+        ]
+        
+        llm.complete(messages)
+        messages.append(Message(role=MessageRole.USER, content="More"))
+        llm.complete(messages, temperature=0.1)
+        llm.complete([Message(role=MessageRole.SYSTEM, content="Other")])
+        
+        fingerprints = [call.request.headers["X-Prefix-Fingerprint"] for call in responses.calls]
+        assert fingerprints[0] == fingerprints[1]
+        assert fingerprints[2] != fingerprints[0]
+    
+    @responses.activate
+    def test_tool_schemas_sent_verbatim(self):
+        """Test a precompiled tools block is copied into the body as-is"""
+        responses.add(
+            responses.POST,
+            "https://chofesh.ai/api/chat/completions",
+            json={"choices": [{"message": {"role": "assistant", "content": "Ok"}}]},
+            status=200,
+        )
+        llm = LLM(model="gpt-oss-120b", api_key="test_key")
+        tools = ToolSchemas([{"type": "function", "function": {"name": "search"}}])
+        
+        llm.complete([Message(role=MessageRole.USER, content="Hi")], tools=tools)
+        llm.complete([Message(role=MessageRole.USER, content="Again")], tools=tools)
+        
+        for call in responses.calls:
+            assert tools.wire_bytes() in call.request.body
+            assert json.loads(call.request.body)["tools"] == list(tools)
+    
+    @responses.activate
+    def test_cached_tokens_recorded(self):
+        """Test cached prompt tokens are read from usage"""
+        responses.add(
+            responses.POST,
+            "https://chofesh.ai/api/chat/completions",
+            json={
+                "choices": [{"message": {"role": "assistant", "content": "Ok"}}],
+                "usage": {
+                    "prompt_tokens": 1000,
+                    "completion_tokens": 5,
+                    "prompt_tokens_details": {"cached_tokens": 750},
+                },
+            },
+            status=200,
+        )
+        llm = LLM(model="gpt-oss-120b", api_key="test_key")
+        
+        response = llm.complete([Message(role=MessageRole.USER, content="Hi")])
+        
+        assert response.metadata["cached_tokens"] == 750
+        assert llm.cache_hit_rate == 0.75
     
     @responses.activate
     def test_complete_with_max_tokens(self):
@@ -151,7 +283,7 @@ class TestLLM:
         
         assert response.content == "Response"
     
-
+    
     
     @responses.activate
     def test_complete_401_error(self):
@@ -260,6 +392,64 @@ data: [DONE]
         
         assert len(chunks) > 0
     
+    @responses.activate
+    def test_stream_tool_calls_emitted_when_arguments_complete(self):
+        """Test each streamed tool call is yielded once its arguments close"""
+        def delta(**fields):
+            return "data: " + json.dumps({"choices": [{"delta": fields}]}) + "\n\n"
+        
+        stream_data = (
+            delta(tool_calls=[{"index": 0, "id": "call_1", "function": {"name": "search", "arguments": ""}}])
+            + delta(tool_calls=[{"index": 0, "function": {"arguments": '{"query": "a \\"}'}}])
+            + delta(tool_calls=[{"index": 0, "function": {"arguments": ' b"}'}}])
+            + delta(tool_calls=[{"index": 1, "id": "call_2", "function": {"name": "search", "arguments": '{"query'}}])
+            + delta(tool_calls=[{"index": 1, "function": {"arguments": '": "c"}'}}])
+            + "data: " + json.dumps({"choices": [{"delta": {}, "finish_reason": "tool_calls"}]}) + "\n\n"
+            + "data: [DONE]\n\n"
+        )
+        responses.add(
+            responses.POST,
+            "https://chofesh.ai/api/chat/completions",
+            body=stream_data,
+            status=200,
+            stream=True
+        )
+        
+        llm = LLM(model="gpt-oss-120b", api_key="test_key")
+        chunks = list(llm.stream([Message(role=MessageRole.USER, content="Hi")]))
+        
+        positions = [i for i, chunk in enumerate(chunks) if chunk.tool_call is not None]
+        calls = [chunks[i].tool_call for i in positions]
+        assert [(call.id, call.parameters) for call in calls] == [
+            ("call_1", {"query": 'a "} b'}),
+            ("call_2", {"query": "c"}),
+        ]
+        # The first call is complete before the second one starts streaming
+        assert positions[0] == 2
+        assert chunks[-1].is_final
+    
+    @responses.activate
+    def test_stream_incomplete_tool_call_flushed_at_end(self):
+        """Test a call whose arguments never close is reported with its raw text"""
+        stream_data = "data: " + json.dumps({"choices": [{"delta": {"tool_calls": [
+            {"index": 0, "id": "call_1", "function": {"name": "search", "arguments": '{"query": '}}
+        ]}}]}) + "\n\ndata: [DONE]\n\n"
+        responses.add(
+            responses.POST,
+            "https://chofesh.ai/api/chat/completions",
+            body=stream_data,
+            status=200,
+            stream=True
+        )
+        
+        llm = LLM(model="gpt-oss-120b", api_key="test_key")
+        chunks = list(llm.stream([Message(role=MessageRole.USER, content="Hi")]))
+        
+        calls = [chunk.tool_call for chunk in chunks if chunk.tool_call is not None]
+        assert len(calls) == 1
+        assert calls[0].parameters == {}
+        assert calls[0].raw_arguments == '{"query": '
+    
     @responses.activate
     def test_handle_error_with_response_body(self):
         """Test error handling with response body"""
@@ -77,6 +77,8 @@ class TestLLMExtended:
         # Should handle invalid JSON gracefully
         response = llm.complete(messages)
         assert response.role == MessageRole.ASSISTANT
+        assert response.tool_calls[0].parameters == {}
+        assert response.tool_calls[0].raw_arguments == "not valid json"
     
     @responses.activate
     def test_stream_with_done_marker(self):
@@ -366,7 +368,7 @@ class TestLLMAsync:
             
             # Verify temperature was passed
             call_args = mock_session.post.call_args
-            assert call_args[1]['json']['temperature'] == 0.9
+            assert json.loads(call_args[1]['data'])['temperature'] == 0.9
     
     @pytest.mark.asyncio
     async def test_complete_async_with_max_tokens(self):
@@ -401,7 +403,7 @@ class TestLLMAsync:
             
             # Verify max_tokens was passed
             call_args = mock_session.post.call_args
-            assert call_args[1]['json']['max_tokens'] == 100
+            assert json.loads(call_args[1]['data'])['max_tokens'] == 100
     
     @pytest.mark.asyncio
     async def test_complete_async_with_tools(self):
@@ -437,7 +439,7 @@ class TestLLMAsync:
             
             # Verify tools were passed
             call_args = mock_session.post.call_args
-            assert call_args[1]['json']['tools'] == tools
+            assert json.loads(call_args[1]['data'])['tools'] == tools
     
     @pytest.mark.asyncio
     async def test_complete_async_with_tool_calls(self):
@@ -2,7 +2,7 @@
 Tests for message module
 """
 import pytest
-from chofesh.message import Message, MessageRole, ToolCall, StreamChunk
+from chofesh.message import Message, MessageRole, ToolCall, StreamChunk, estimate_tokens
 
 
 class TestMessage:
@@ -59,6 +59,50 @@ class TestMessage:
         
         assert msg.role == MessageRole.USER
         assert msg.content == "Hello"
+    
+    def test_token_estimate(self):
+        """Test token estimate is cached and invalidated on change"""
+        msg = Message(role=MessageRole.USER, content="a" * 40)
+        
+        assert msg.token_estimate == 14
+        assert msg._token_estimate == 14
+        
+        msg.content = "a" * 80
+        assert msg._token_estimate is None
+        assert msg.token_estimate == 24
+    
+    def test_estimate_tokens(self):
+        """Test fast token estimation"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abcd") == 1
+        assert estimate_tokens("abcde") == 2
+        # Non-ASCII text is estimated from its UTF-8 size
+        assert estimate_tokens("\u05e9\u05dc\u05d5\u05dd") == 3
+    
+    def test_wire_json_cached(self):
+        """Test wire encoding is cached and invalidated on change"""
+        msg = Message(role=MessageRole.USER, content="Hello")
+        
+        assert msg.to_wire() == {"role": "user", "content": "Hello"}
+        assert msg.wire_json() == '{"role":"user","content":"Hello"}'
+        assert msg.wire_bytes() is msg.wire_bytes()
+        
+        msg.content = "Changed"
+        assert msg._wire_bytes is None
+        assert msg.wire_json() == '{"role":"user","content":"Changed"}'
+    
+    def test_json_round_trip(self):
+        """Test converting message to and from JSON"""
+        msg = Message(
+            role=MessageRole.ASSISTANT,
+            content="Hello",
+            tool_calls=[ToolCall(id="call_1", name="search", parameters={"q": "x"})],
+            metadata={"usage": {"total_tokens": 3}},
+        )
+        
+        restored = Message.from_json(msg.to_json())
+        
+        assert restored.to_dict() == msg.to_dict()
 
 
 class TestToolCall:
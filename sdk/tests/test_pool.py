@@ -0,0 +1,134 @@
+"""
+Tests for agent pool
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from chofesh.pool import AgentPool, INTERACTIVE, BATCH
+from chofesh.message import Message, MessageRole
+
+
+async def _fill(pool, order, jobs, gate):
+    """Queue jobs behind a blocker holding the pool's only slot"""
+    async def job(name):
+        order.append(name)
+    
+    blocker = asyncio.ensure_future(pool.run(gate.wait, tenant="blocker"))
+    await asyncio.sleep(0)
+    tasks = [
+        asyncio.ensure_future(pool.run(
+            lambda name=name: job(name), tenant=tenant, priority=priority
+        ))
+        for name, tenant, priority in jobs
+    ]
+    await asyncio.sleep(0)
+    return blocker, tasks
+
+
+class TestAgentPool:
+    """Test AgentPool class"""
+    
+    @pytest.mark.asyncio
+    async def test_fair_share_across_tenants(self):
+        """Test a tenant with many queued jobs does not starve others"""
+        pool = AgentPool(max_concurrency=1, max_per_tenant=None)
+        order = []
+        gate = asyncio.Event()
+        jobs = [(f"a{i}", "a", INTERACTIVE) for i in range(4)] + [("b0", "b", INTERACTIVE)]
+        blocker, tasks = await _fill(pool, order, jobs, gate)
+        
+        assert pool.queue_depth() == 5
+        assert pool.queue_depth(tenant="a") == 4
+        
+        gate.set()
+        await asyncio.gather(blocker, *tasks)
+        
+        assert order.index("b0") == 1
+        assert pool.metrics()["completed"] == 6
+        assert pool.queue_depth() == 0
+    
+    @pytest.mark.asyncio
+    async def test_weights_and_priority_classes(self):
+        """Test interactive jobs go first and weights set each tenant's share"""
+        pool = AgentPool(max_concurrency=1, max_per_tenant=None, weights={"a": 2.0})
+        order = []
+        gate = asyncio.Event()
+        jobs = (
+            [(f"batch{i}", "c", BATCH) for i in range(2)]
+            + [(f"a{i}", "a", INTERACTIVE) for i in range(4)]
+            + [(f"b{i}", "b", INTERACTIVE) for i in range(2)]
+        )
+        blocker, tasks = await _fill(pool, order, jobs, gate)
+        
+        assert pool.metrics()["queued_by_priority"] == {INTERACTIVE: 6, BATCH: 2}
+        
+        gate.set()
+        await asyncio.gather(blocker, *tasks)
+        
+        assert order == ["a0", "b0", "a1", "a2", "b1", "a3", "batch0", "batch1"]
+    
+    @pytest.mark.asyncio
+    async def test_per_tenant_limit(self):
+        """Test one tenant cannot take every slot"""
+        pool = AgentPool(max_concurrency=3, max_per_tenant=1)
+        running = []
+        gate = asyncio.Event()
+        
+        async def job(tenant):
+            running.append(tenant)
+            await gate.wait()
+        
+        tasks = [
+            asyncio.ensure_future(pool.run(lambda t=t: job(t), tenant=t))
+            for t in ["a", "a", "a", "b"]
+        ]
+        await asyncio.sleep(0.01)
+        
+        assert sorted(running) == ["a", "b"]
+        assert pool.metrics()["running_by_tenant"] == {"a": 1, "b": 1}
+        assert pool.queue_depth(tenant="a") == 2
+        
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert running.count("a") == 3
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_while_queued_leaves_queue(self):
+        """Test cancelling a waiting caller frees its place without running it"""
+        pool = AgentPool(max_concurrency=1)
+        gate = asyncio.Event()
+        job = AsyncMock()
+        blocker = asyncio.ensure_future(pool.run(gate.wait))
+        waiting = asyncio.ensure_future(pool.run(job))
+        await asyncio.sleep(0)
+        
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        gate.set()
+        await blocker
+        
+        job.assert_not_called()
+        assert pool.queue_depth() == 0
+        assert pool.running == 0
+        assert pool.stats.cancelled == 1
+    
+    @pytest.mark.asyncio
+    async def test_process_runs_agent(self):
+        """Test process() runs the agent with its arguments and counts failures"""
+        pool = AgentPool()
+        agent = Mock()
+        response = Message(role=MessageRole.ASSISTANT, content="Hi")
+        agent.process_async = AsyncMock(return_value=response)
+        messages = [Message(role=MessageRole.USER, content="Hello")]
+        
+        result = await pool.process(agent, messages, tenant="t1", temperature=0.2)
+        
+        assert result is response
+        agent.process_async.assert_awaited_once_with(messages, temperature=0.2)
+        
+        agent.process_async.side_effect = RuntimeError("boom")
+        with pytest.raises(RuntimeError):
+            await pool.process(agent, messages, tenant="t1")
+        assert pool.stats.failed == 1
+        assert pool.running == 0
@@ -0,0 +1,131 @@
+"""
+Tests for server_state module
+"""
+import pytest
+from chofesh.agent import Agent
+from chofesh.conversation import Conversation
+from chofesh.message import Message, MessageRole
+from chofesh.server_state import ServerHistory
+from tests.mock_server import MockChatServer
+
+
+@pytest.fixture
+def server():
+    server = MockChatServer().start()
+    yield server
+    server.stop()
+
+
+def make_conversation(server, **kwargs):
+    agent = Agent(model="gpt-oss-120b", api_key="test-key", api_url=server.url)
+    return Conversation(agent=agent, system_message="You are helpful", **kwargs)
+
+
+class TestServerHistory:
+    """Test ServerHistory class"""
+    
+    def test_first_request_is_full(self):
+        """Test nothing is assumed before the server confirms a sequence"""
+        history = ServerHistory("conv_1")
+        messages = [Message(role=MessageRole.USER, content="Hi")]
+        
+        upload, field = history.prepare(messages)
+        
+        assert upload is messages
+        assert field == {"id": "conv_1", "sequence": 0}
+    
+    def test_delta_after_commit(self):
+        """Test only new messages are uploaded once the server holds history"""
+        history = ServerHistory("conv_1")
+        messages = [Message(role=MessageRole.USER, content="Hi")]
+        response = Message(role=MessageRole.ASSISTANT, content="Hello")
+        history.commit(messages, response, {"conversation": {"id": "conv_1", "sequence": 2}})
+        new = Message(role=MessageRole.USER, content="More")
+        
+        upload, field = history.prepare(messages + [response, new])
+        
+        assert upload == [new]
+        assert field == {"id": "conv_1", "sequence": 2}
+    
+    def test_changed_prefix_uploads_everything(self):
+        """Test a rewritten history falls back to a full upload"""
+        history = ServerHistory("conv_1")
+        messages = [Message(role=MessageRole.USER, content="Hi")]
+        response = Message(role=MessageRole.ASSISTANT, content="Hello")
+        history.commit(messages, response, {"conversation": {"id": "conv_1", "sequence": 2}})
+        edited = [Message(role=MessageRole.USER, content="Hi"), response]
+        
+        upload, field = history.prepare(edited)
+        
+        assert field["sequence"] == 0
+        assert len(upload) == 2
+    
+    def test_stateless_server(self):
+        """Test responses without a sequence keep full uploads"""
+        history = ServerHistory("conv_1")
+        messages = [Message(role=MessageRole.USER, content="Hi")]
+        history.commit(messages, Message(role=MessageRole.ASSISTANT, content="Hello"), {})
+        
+        assert history.sequence == 0
+        assert history.prepare(messages)[1]["sequence"] == 0
+
+
+class TestServerStateConversation:
+    """Test conversations against the mock server"""
+    
+    def test_only_new_turns_are_uploaded(self, server):
+        """Test uploads stay constant as the history grows"""
+        conversation = make_conversation(server, server_state=True)
+        
+        for i in range(5):
+            response = conversation.send_message(f"Question {i}")
+        
+        sizes = [size for size, _ in server.requests]
+        assert [len(body["messages"]) for _, body in server.requests] == [2, 1, 1, 1, 1]
+        assert sizes[-1] == pytest.approx(sizes[1], abs=8)
+        assert response.content == "Reply to Question 4 (10 messages)"
+        assert conversation.server_history.delta_uploads == 4
+    
+    def test_full_history_without_server_state(self, server):
+        """Test the default mode still uploads everything"""
+        conversation = make_conversation(server)
+        
+        for i in range(3):
+            conversation.send_message(f"Question {i}")
+        
+        assert [len(body["messages"]) for _, body in server.requests] == [2, 4, 6]
+        assert "conversation" not in server.requests[0][1]
+    
+    def test_sequence_mismatch_falls_back_to_full_upload(self, server):
+        """Test the client re-uploads when the server lost its history"""
+        conversation = make_conversation(server, server_state=True, conversation_id="conv_1")
+        conversation.send_message("First")
+        server.forget("conv_1")
+        
+        response = conversation.send_message("Second")
+        
+        statuses = [body["conversation"]["sequence"] for _, body in server.requests]
+        assert statuses == [0, 3, 0]
+        assert response.content == "Reply to Second (4 messages)"
+        assert conversation.server_history.sequence == 5
+    
+    @pytest.mark.asyncio
+    async def test_async_delta_upload(self, server):
+        """Test the async path uses deltas too"""
+        conversation = make_conversation(server, server_state=True)
+        
+        await conversation.send_message_async("First")
+        await conversation.send_message_async("Second")
+        
+        assert [len(body["messages"]) for _, body in server.requests] == [2, 1]
+    
+    def test_fork_gets_own_server_history(self, server):
+        """Test branches do not reuse the parent's server-side history"""
+        conversation = make_conversation(server, server_state=True)
+        conversation.send_message("First")
+        
+        branch = conversation.fork()
+        branch.send_message("Branch")
+        
+        assert branch.conversation_id != conversation.conversation_id
+        assert server.requests[-1][1]["conversation"]["sequence"] == 0
@@ -0,0 +1,125 @@
+"""
+Tests for sessions module
+"""
+import pytest
+from unittest.mock import Mock
+from chofesh.message import Message, MessageRole
+from chofesh.sessions import SessionManager
+from chofesh.store import ConversationStore
+
+
+@pytest.fixture
+def store():
+    with ConversationStore() as store:
+        yield store
+
+
+class TestSessionManager:
+    """Test SessionManager class"""
+    
+    def test_create_and_hit(self, store, make_agent):
+        """Test new sessions are created once and then served from memory"""
+        manager = SessionManager(make_agent(), store, system_message="You are helpful")
+        
+        manager.send_message("user_1", "Hi")
+        conversation = manager.get("user_1")
+        
+        assert [m.content for m in conversation.messages] == ["You are helpful", "Hi", "Ok"]
+        assert manager.stats.created == 1
+        assert manager.stats.misses == 1
+        assert manager.stats.hits == 1
+    
+    def test_evicts_least_recently_used(self, store, make_agent):
+        """Test the session count bound"""
+        manager = SessionManager(make_agent(), store, max_sessions=2)
+        
+        manager.send_message("a", "Hi")
+        manager.send_message("b", "Hi")
+        manager.get("a")
+        manager.send_message("c", "Hi")
+        
+        assert "b" not in manager
+        assert "a" in manager and "c" in manager
+        assert manager.stats.evictions == 1
+        assert store.message_count("b") == 2
+    
+    def test_rehydrates_evicted_session(self, store, make_agent):
+        """Test evicted sessions come back with their history"""
+        manager = SessionManager(make_agent(), store, max_sessions=1, last_n=2)
+        
+        manager.send_message("a", "First")
+        manager.send_message("b", "Hi")
+        manager.send_message("a", "Second")
+        
+        conversation = manager.get("a")
+        assert [m.content for m in conversation.messages] == ["First", "Ok", "Second", "Ok"]
+        assert manager.stats.rehydrated == 1
+        assert store.message_count("a") == 4
+    
+    def test_session_pinned_while_in_use(self, store, make_agent):
+        """Test a session in use is never evicted and stays a single copy"""
+        manager = SessionManager(make_agent(), store, max_sessions=1)
+        
+        with manager.session("a") as conversation:
+            manager.send_message("b", "Hi")
+            assert "a" in manager
+            assert manager.evict("a") is False
+            conversation.send_message("Still here")
+        
+        assert manager.get("a") is conversation
+        manager.send_message("b", "Again")
+        assert "a" not in manager
+        assert store.message_count("a") == 2
+    
+    def test_size_recomputed_after_turn(self, store, make_agent):
+        """Test bytes count history a turn loaded, not only the preloaded tail"""
+        manager = SessionManager(make_agent(), store, max_sessions=1, last_n=1)
+        for i in range(5):
+            manager.send_message("a", "x" * 1000)
+        manager.send_message("b", "Hi")
+        
+        manager.get("a")
+        preloaded = manager.size_bytes
+        manager.send_message("a", "Hi")
+        
+        assert manager.size_bytes > preloaded + 4000
+    
+    def test_byte_bound(self, store, make_agent):
+        """Test the memory bound evicts sessions once exceeded"""
+        manager = SessionManager(make_agent(), store, max_bytes=4000)
+        
+        for i in range(5):
+            manager.send_message(f"user_{i}", "x" * 500)
+        
+        assert 0 < len(manager) < 5
+        assert manager.size_bytes <= 4000
+        assert manager.stats.evictions == 5 - len(manager)
+    
+    def test_evict_and_flush(self, store, make_agent):
+        """Test explicit eviction and flushing"""
+        manager = SessionManager(make_agent(), store)
+        conversation = manager.get("a")
+        conversation.messages.append(Message(role=MessageRole.USER, content="Draft"))
+        
+        manager.flush()
+        assert store.message_count("a") == 1
+        
+        assert manager.evict("a") is True
+        assert manager.evict("a") is False
+        assert manager.size_bytes == 0
+    
+    @pytest.mark.asyncio
+    async def test_send_message_async(self, store, make_agent):
+        """Test async turns through the manager"""
+        manager = SessionManager(make_agent(), store, max_sessions=1)
+        
+        await manager.send_message_async("a", "Hi")
+        await manager.send_message_async("b", "Hi")
+        
+        assert manager.stats.to_dict()["evictions"] == 1
+        assert store.message_count("a") == 2
+    
+    def test_invalid_limits(self, store):
+        """Test limits must be positive"""
+        with pytest.raises(ValueError):
+            SessionManager(Mock(), store, max_sessions=0)
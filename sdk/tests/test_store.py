@@ -0,0 +1,192 @@
+"""
+Tests for store module
+"""
+import pytest
+from unittest.mock import Mock, patch
+from chofesh.context import ContextWindow
+from chofesh.conversation import Conversation
+from chofesh.message import Message, MessageRole
+from chofesh.store import ConversationStore, StoredMessageList
+
+
+@pytest.fixture
+def make_conversation(make_agent):
+    """Factory for conversations with a number of stored turns"""
+    def make(store, turns=0):
+        conversation = Conversation(
+            agent=make_agent(),
+            system_message="You are helpful",
+            conversation_id="conv_1",
+            store=store,
+        )
+        for i in range(turns):
+            conversation.send_message(f"Question {i}")
+        return conversation
+    
+    return make
+
+
+@pytest.fixture
+def store():
+    with ConversationStore() as store:
+        yield store
+
+
+class TestConversationStore:
+    """Test ConversationStore class"""
+    
+    def test_save_appends_only_new_messages(self, store, make_conversation):
+        """Test each save writes only the messages added since the last one"""
+        conversation = make_conversation(store)
+        
+        assert store.save(conversation) == 1
+        assert store.save(conversation) == 0
+        
+        conversation.messages.append(Message(role=MessageRole.USER, content="Hi"))
+        assert store.save(conversation) == 1
+        assert store.message_count("conv_1") == 2
+    
+    def test_turns_are_persisted(self, store, make_conversation):
+        """Test an attached store is updated after every turn"""
+        make_conversation(store, turns=3)
+        
+        assert store.message_count("conv_1") == 7
+        assert [m.content for m in store.load_messages("conv_1", -2)] == ["Question 2", "Ok"]
+    
+    def test_generated_conversation_id(self, store, make_agent):
+        """Test attaching a store assigns a conversation ID"""
+        conversation = Conversation(agent=make_agent(), store=store)
+        conversation.send_message("Hello")
+        
+        assert conversation.conversation_id in store
+    
+    def test_save_without_id_raises(self, store, make_agent):
+        """Test saving requires a conversation ID"""
+        with pytest.raises(ValueError):
+            store.save(Conversation(agent=make_agent()))
+    
+    def test_load_round_trip(self, store, make_agent, make_conversation):
+        """Test loading restores the full history"""
+        original = make_conversation(store, turns=2)
+        
+        restored = store.load("conv_1", make_agent())
+        
+        assert restored.to_dict()["messages"] == original.to_dict()["messages"]
+        assert restored.store is store
+    
+    def test_load_last_n(self, store, make_agent, make_conversation):
+        """Test only the tail is read up front"""
+        make_conversation(store, turns=50)
+        
+        restored = store.load("conv_1", make_agent(), last_n=4)
+        
+        assert isinstance(restored.messages, StoredMessageList)
+        assert len(restored.messages) == 101
+        assert restored.messages.loaded_count == 4
+        assert restored.messages[-1].content == "Ok"
+        
+        # Earlier messages are read by index on demand
+        assert restored.messages[0].content == "You are helpful"
+        assert restored.messages.loaded_count == 5
+    
+    def test_full_iteration_reads_history_in_one_query(self, store, make_agent, make_conversation):
+        """Test a turn over a partially loaded history does not read it row by row"""
+        make_conversation(store, turns=100)
+        restored = store.load("conv_1", make_agent(), last_n=10)
+        
+        with patch.object(store, "_fetch", wraps=store._fetch) as fetch:
+            restored.send_message("One more")
+        
+        assert fetch.call_count == 1
+        assert restored.messages[0].content == "You are helpful"
+        assert store.message_count("conv_1") == 203
+    
+    def test_continue_loaded_conversation(self, store, make_agent, make_conversation):
+        """Test a partially loaded conversation keeps appending in sequence"""
+        make_conversation(store, turns=20)
+        restored = store.load(
+            "conv_1",
+            make_agent(),
+            last_n=4,
+            context_window=ContextWindow(max_tokens=10000, max_messages=4),
+        )
+        
+        restored.send_message("One more")
+        
+        assert store.message_count("conv_1") == 43
+        assert store.load_messages("conv_1", 41)[0].content == "One more"
+        assert restored.messages.loaded_count < 10
+    
+    def test_clear_rewrites_history(self, store, make_conversation):
+        """Test clear() replaces the stored history"""
+        conversation = make_conversation(store, turns=2)
+        
+        conversation.clear()
+        conversation.send_message("Fresh start")
+        
+        assert [m.content for m in store.load_messages("conv_1")] == [
+            "You are helpful", "Fresh start", "Ok"
+        ]
+    
+    def test_rewrite_loaded_conversation(self, store, make_agent, make_conversation):
+        """Test rewriting a lazily loaded conversation keeps its messages"""
+        make_conversation(store, turns=3)
+        restored = store.load("conv_1", make_agent(), last_n=1)
+        
+        del restored.messages[1:3]
+        store.save(restored, rewrite=True)
+        
+        assert store.message_count("conv_1") == 5
+        assert store.load_messages("conv_1", 1, 2)[0].content == "Question 1"
+    
+    def test_summary_persisted(self, store, make_agent, make_conversation):
+        """Test the rolling summary is stored with the conversation"""
+        conversation = make_conversation(store, turns=1)
+        conversation._apply_summary(
+            Message(role=MessageRole.ASSISTANT, content="Greeting"), 1, 0
+        )
+        
+        restored = store.load("conv_1", make_agent())
+        
+        assert "Greeting" in restored.summary.content
+        assert restored.summarized_until == 1
+    
+    def test_fork_saved_separately(self, store, make_agent, make_conversation):
+        """Test a fork of a stored conversation is saved under its own ID"""
+        conversation = make_conversation(store, turns=2)
+        restored = store.load("conv_1", make_agent(), last_n=2)
+        
+        branch = restored.fork(conversation_id="conv_2")
+        branch.send_message("Branch")
+        restored.send_message("Main")
+        
+        assert store.message_count("conv_1") == 7
+        assert store.message_count("conv_2") == 7
+        assert store.load_messages("conv_2", 5, 6)[0].content == "Branch"
+        assert store.load_messages("conv_1", 0, 1)[0].content == "You are helpful"
+    
+    def test_load_unknown_conversation(self, store):
+        """Test loading a missing conversation"""
+        with pytest.raises(KeyError):
+            store.load("missing", Mock())
+    
+    def test_delete_and_list(self, store, make_conversation):
+        """Test listing and deleting conversations"""
+        make_conversation(store, turns=1)
+        
+        assert store.conversation_ids() == ["conv_1"]
+        
+        store.delete("conv_1")
+        
+        assert "conv_1" not in store
+        assert store.load_messages("conv_1") == []
+    
+    def test_file_database(self, tmp_path, make_agent, make_conversation):
+        """Test conversations survive reopening a database file"""
+        path = str(tmp_path / "conversations.db")
+        with ConversationStore(path) as store:
+            make_conversation(store, turns=1)
+        
+        with ConversationStore(path) as store:
+            restored = store.load("conv_1", make_agent(), last_n=1)
+            assert restored.messages[-1].content == "Ok"
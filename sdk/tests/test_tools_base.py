@@ -55,6 +55,14 @@ class TestBaseTool:
         assert schema["function"]["description"] == "A test tool"
         assert "parameters" in schema["function"]
     
+    def test_validate_parameters(self):
+        """Test arguments are checked against the compiled parameters schema"""
+        tool = TestTool()
+        
+        assert tool.validate_parameters({"input": "x"}) == ({"input": "x"}, [])
+        assert tool.validate_parameters({}) == ({}, ["input: required"])
+        assert tool.validator is tool.validator
+    
     def test_tool_repr(self):
         """Test tool string representation"""
         tool = TestTool()
@@ -0,0 +1,160 @@
+"""
+Tests for the tool result cache
+"""
+import pytest
+from unittest.mock import Mock, patch
+from chofesh.agent import Agent
+from chofesh.tools import Tool
+from chofesh.tools.cache import MISS, ToolResultCache, canonical_arguments
+from chofesh.tools.github import GitHubTool
+
+
+class LookupTool(Tool):
+    """Tool whose calls are cacheable"""
+    name = "lookup"
+    description = "Look something up"
+    parameters = {
+        "type": "object",
+        "properties": {"key": {"type": "string"}},
+        "required": ["key"],
+    }
+    cache_ttl = 30.0
+    
+    def __init__(self, **config):
+        super().__init__(**config)
+        self.calls = 0
+    
+    def execute(self, parameters):
+        self.calls += 1
+        if parameters["key"] == "missing":
+            return {"error": "not found"}
+        return {"value": parameters["key"].upper()}
+
+
+class TestToolResultCache:
+    """Test ToolResultCache"""
+    
+    def test_canonical_arguments_ignore_key_order(self):
+        """Test equivalent argument dicts map to the same key"""
+        assert canonical_arguments({"a": 1, "b": [2]}) == canonical_arguments({"b": [2], "a": 1})
+    
+    def test_entries_expire(self, clock):
+        """Test entries are served until their TTL runs out"""
+        cache = ToolResultCache(clock=clock)
+        key = cache.key("lookup", {"key": "a"})
+        
+        cache.set(key, {"value": "A"}, ttl=10)
+        clock.now = 9
+        assert cache.get(key) == {"value": "A"}
+        clock.now = 10
+        assert cache.get(key) is MISS
+        assert cache.stats()["hits"] == 1
+        assert len(cache) == 0
+    
+    def test_bounded_lru(self):
+        """Test the least recently used entry is evicted first"""
+        cache = ToolResultCache(max_entries=2)
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        cache.get("a")
+        cache.set("c", 3, ttl=60)
+        
+        assert cache.get("b") is MISS
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+    
+    def test_invalidate_scope(self):
+        """Test invalidating one scope keeps the others"""
+        cache = ToolResultCache()
+        cache.set(cache.key("x", {}), 1, ttl=60)
+        cache.set(cache.key("y", {}), 2, ttl=60)
+        
+        cache.invalidate("x")
+        
+        assert cache.get(cache.key("x", {})) is MISS
+        assert cache.get(cache.key("y", {})) == 2
+    
+    def test_invalid_size(self):
+        """Test the cache must hold at least one entry"""
+        with pytest.raises(ValueError):
+            ToolResultCache(max_entries=0)
+
+
+class TestAgentToolCache:
+    """Test Agent._execute_tool with a cache"""
+    
+    def test_repeated_calls_served_from_cache(self):
+        """Test identical cacheable calls run the tool once across agents"""
+        cache = ToolResultCache()
+        tool = LookupTool()
+        first = Agent(tools=[tool], tool_cache=cache)
+        second = Agent(tools=[tool], tool_cache=cache)
+        
+        assert first._execute_tool("lookup", {"key": "a"}) == {"value": "A"}
+        assert second._execute_tool("lookup", {"key": "a"}) == {"value": "A"}
+        assert tool.calls == 1
+        assert cache.hits == 1
+    
+    def test_errors_and_uncacheable_tools_not_cached(self):
+        """Test error results and tools without a TTL always run"""
+        cache = ToolResultCache()
+        tool = LookupTool()
+        uncached = LookupTool(cache_ttl=None)
+        uncached.name = "uncached"
+        agent = Agent(tools=[tool, uncached], tool_cache=cache)
+        
+        agent._execute_tool("lookup", {"key": "missing"})
+        agent._execute_tool("lookup", {"key": "missing"})
+        agent._execute_tool("uncached", {"key": "a"})
+        agent._execute_tool("uncached", {"key": "a"})
+        
+        assert tool.calls == 2
+        assert uncached.calls == 2
+        assert len(cache) == 0
+    
+    @patch('chofesh.tools.github.Github')
+    def test_github_reads_cached_and_writes_invalidate(self, mock_github):
+        """Test GitHub read actions are cached and write actions clear them"""
+        cache = ToolResultCache()
+        tool = GitHubTool(token="test_token", repo="owner/repo")
+        tool._read_file = Mock(return_value={"content": "v1"})
+        tool._write_file = Mock(return_value={"commit_sha": "abc"})
+        agent = Agent(tools=[tool], tool_cache=cache)
+        read = {"action": "read_file", "path": "README.md"}
+        write = {"action": "write_file", "path": "README.md", "content": "v2"}
+        
+        agent._execute_tool("github", read)
+        agent._execute_tool("github", read)
+        assert tool._read_file.call_count == 1
+        
+        agent._execute_tool("github", write)
+        agent._execute_tool("github", write)
+        assert tool._write_file.call_count == 2
+        
+        agent._execute_tool("github", read)
+        assert tool._read_file.call_count == 2
+    
+    @patch('chofesh.tools.github.Github')
+    def test_github_reads_not_shared_across_tokens(self, mock_github):
+        """Test agents with different GitHub tokens never see each other's reads"""
+        cache = ToolResultCache()
+        tools = [GitHubTool(token=token, repo="owner/repo") for token in ("alice", "bob")]
+        for tool in tools:
+            tool._read_file = Mock(return_value={"content": tool.token})
+        read = {"action": "read_file", "path": "secret.txt"}
+        
+        results = [Agent(tools=[tool], tool_cache=cache)._execute_tool("github", read) for tool in tools]
+        
+        assert results == [{"content": "alice"}, {"content": "bob"}]
+        assert all(tool._read_file.call_count == 1 for tool in tools)
+    
+    def test_agents_have_private_caches_by_default(self):
+        """Test results are shared between agents only through an explicit cache"""
+        tool = LookupTool()
+        first, second = Agent(tools=[tool]), Agent(tools=[tool])
+        
+        first._execute_tool("lookup", {"key": "a"})
+        second._execute_tool("lookup", {"key": "a"})
+        
+        assert tool.calls == 2
+        assert first.tool_cache is not second.tool_cache
@@ -132,3 +132,40 @@ class TestGitHubTool:
         assert "create_branch" in actions
         assert "create_pr" in actions
         assert "create_issue" in actions
+    
+    @patch('chofesh.tools.github.Github')
+    def test_validate_parameters_per_action(self, mock_github):
+        """Test fields required by the chosen action are checked up front"""
+        tool = GitHubTool(token="test_token")
+        
+        _, errors = tool.validate_parameters({"action": "create_pr", "title": "Fix"})
+        assert errors == ["head: required for action 'create_pr'"]
+        
+        _, errors = tool.validate_parameters({"action": "delete_repo"})
+        assert errors == [
+            "action: must be one of read_file, write_file, create_branch, create_pr, "
+            "list_files, create_issue, comment_issue, list_issues, list_prs"
+        ]
+        
+        assert tool.validate_parameters({"action": "list_prs"})[1] == []
+        
+        _, errors = tool.validate_parameters({"action": {"x": 1}})
+        assert errors[0] == "action: expected string"
+    
+    @patch('chofesh.tools.github.Github')
+    def test_effects_order_branch_work(self, mock_github):
+        """Test branch, file and PR calls conflict only through shared branches"""
+        tool = GitHubTool(token="test_token", repo="owner/repo")
+        create_branch = tool.effects({"action": "create_branch", "branch": "fix"})
+        write_file = tool.effects({"action": "write_file", "path": "a.py", "content": "", "branch": "fix"})
+        create_pr = tool.effects({"action": "create_pr", "title": "Fix", "head": "fix"})
+        read_main = tool.effects({"action": "read_file", "path": "a.py"})
+        list_issues = tool.effects({"action": "list_issues"})
+        
+        assert create_branch.conflicts_with(write_file)
+        assert write_file.conflicts_with(create_pr)
+        assert not read_main.conflicts_with(list_issues)
+        assert not read_main.conflicts_with(write_file)
+        # Creating a branch from main must not overlap a write to main
+        write_main = tool.effects({"action": "write_file", "path": "b.py", "content": ""})
+        assert create_branch.conflicts_with(write_main)
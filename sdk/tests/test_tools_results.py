@@ -0,0 +1,88 @@
+"""
+Tests for tool result encoding
+"""
+import json
+import pytest
+from chofesh.tools.results import ToolResultEncoder, clip_text
+
+
+class TestToolResultEncoder:
+    """Test ToolResultEncoder"""
+    
+    def test_small_results_are_compact_json(self):
+        """Test results under the limit are encoded whole"""
+        encoder = ToolResultEncoder()
+        
+        encoded = encoder.encode({"path": "a.py", "size": 3, "ok": True, "missing": None})
+        
+        assert encoded.content == '{"path":"a.py","size":3,"ok":true,"missing":null}'
+        assert encoded.truncated is False
+        assert encoder.encode("plain text").content == "plain text"
+    
+    def test_long_string_keeps_head_and_tail(self):
+        """Test oversized text keeps its start and end"""
+        encoder = ToolResultEncoder(max_bytes=200)
+        text = "START" + "x" * 5000 + "END"
+        
+        encoded = encoder.encode(text)
+        
+        assert encoded.truncated is True
+        assert encoded.size == len(text)
+        assert len(encoded.content.encode("utf-8")) <= 200
+        assert encoded.content.startswith("START")
+        assert encoded.content.endswith("END")
+        assert "characters omitted" in encoded.content
+    
+    def test_large_field_clipped_and_json_kept_valid(self):
+        """Test a big field is clipped while the other fields survive"""
+        encoder = ToolResultEncoder(max_bytes=1024)
+        result = {
+            "path": "big.txt",
+            "content": "line\n" * 10000,
+            "sha": "abc123",
+            "notes": "",
+        }
+        
+        encoded = encoder.encode(result)
+        data = json.loads(encoded.content)
+        
+        assert len(encoded.content.encode("utf-8")) <= 1024
+        assert data["path"] == "big.txt"
+        assert data["sha"] == "abc123"
+        assert "notes" not in data
+        assert "characters omitted" in data["content"]
+    
+    def test_long_list_keeps_first_and_last_items(self):
+        """Test long lists are cut to their first and last items"""
+        encoder = ToolResultEncoder(max_bytes=512)
+        
+        data = json.loads(encoder.encode({"items": list(range(1000))}).content)
+        
+        assert data["items"][0] == 0
+        assert data["items"][-1] == 999
+        assert any("items omitted" in str(item) for item in data["items"])
+    
+    def test_non_ascii_respects_byte_limit(self):
+        """Test the limit is measured in UTF-8 bytes"""
+        encoder = ToolResultEncoder(max_bytes=300)
+        
+        encoded = encoder.encode({"text": "שלום " * 500})
+        
+        assert len(encoded.content.encode("utf-8")) <= 300
+    
+    def test_token_limit(self):
+        """Test max_tokens tightens the byte limit"""
+        assert ToolResultEncoder(max_tokens=100).max_bytes == 400
+        with pytest.raises(ValueError):
+            ToolResultEncoder(max_bytes=10)
+    
+    def test_unserializable_values_use_str(self):
+        """Test objects JSON cannot encode fall back to their string form"""
+        encoded = ToolResultEncoder().encode({"value": object})
+        
+        assert "class 'object'" in encoded.content
+    
+    def test_clip_text(self):
+        """Test clip_text leaves short text alone"""
+        assert clip_text("short", 10) == "short"
+        assert len(clip_text("a" * 100, 30)) < 100
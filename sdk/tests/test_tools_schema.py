@@ -0,0 +1,89 @@
+"""
+Tests for compiled tool argument schemas
+"""
+import pytest
+from chofesh.tools.schema import compile_schema
+
+
+SEARCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string", "minLength": 1},
+        "num_results": {"type": "integer", "default": 5, "minimum": 1, "maximum": 20},
+        "filters": {
+            "type": "array",
+            "items": {"type": "string", "enum": ["news", "images"]},
+        },
+    },
+    "required": ["query"],
+}
+
+
+class TestSchemaValidator:
+    """Test compile_schema / SchemaValidator"""
+    
+    def test_valid_arguments_get_defaults(self):
+        """Test defaults are applied without modifying the input"""
+        validator = compile_schema(SEARCH_SCHEMA)
+        arguments = {"query": "python"}
+        
+        result, errors = validator.validate(arguments)
+        
+        assert errors == []
+        assert result == {"query": "python", "num_results": 5}
+        assert arguments == {"query": "python"}
+    
+    def test_errors_name_each_field(self):
+        """Test every problem is reported with its path"""
+        validator = compile_schema(SEARCH_SCHEMA)
+        
+        _, errors = validator.validate({"num_results": "ten", "filters": ["news", "video"]})
+        
+        assert errors == [
+            "query: required",
+            "num_results: expected integer",
+            "filters[1]: must be one of news, images",
+        ]
+    
+    @pytest.mark.parametrize("arguments, error", [
+        ({"query": ""}, "query: shorter than 1 characters"),
+        ({"query": "x", "num_results": 50}, "num_results: greater than 20"),
+        ({"query": 3}, "query: expected string"),
+        ([], "arguments: expected object"),
+    ])
+    def test_bounds_and_types(self, arguments, error):
+        """Test length, range and type checks"""
+        _, errors = compile_schema(SEARCH_SCHEMA).validate(arguments)
+        
+        assert errors == [error]
+    
+    def test_integral_float_accepted_as_integer(self):
+        """Test 5.0 from a JSON encoder counts as an integer"""
+        result, errors = compile_schema(SEARCH_SCHEMA).validate({"query": "x", "num_results": 5.0})
+        
+        assert errors == []
+        assert result["num_results"] == 5
+        assert isinstance(result["num_results"], int)
+    
+    def test_additional_properties(self):
+        """Test additionalProperties false rejects unknown keys"""
+        validator = compile_schema({
+            "type": "object",
+            "properties": {"a": {"type": "string"}},
+            "additionalProperties": False,
+        })
+        
+        _, errors = validator.validate({"a": "x", "b": 1})
+        
+        assert errors == ["b: unexpected property"]
+    
+    def test_any_of(self):
+        """Test anyOf accepts any matching branch"""
+        validator = compile_schema({"anyOf": [{"type": "string"}, {"type": "null"}]})
+        
+        assert validator.validate(None)[1] == []
+        assert validator.validate(1)[1] == ["arguments: matches none of the allowed schemas"]
+    
+    def test_empty_schema_accepts_anything(self):
+        """Test an empty schema never reports errors"""
+        assert compile_schema({}).validate({"x": [1]}) == ({"x": [1]}, [])
@@ -0,0 +1,148 @@
+"""
+Tests for transcript module
+"""
+from datetime import datetime, timezone
+from chofesh.context import ContextWindow
+from chofesh.llm import LLM
+from chofesh.message import Message, MessageRole, ToolCall
+from chofesh.transcript import CompactMessage, Transcript
+
+
+def sample_message():
+    """Assistant message with tool calls and metadata"""
+    return Message(
+        role=MessageRole.ASSISTANT,
+        content="Searching",
+        model="gpt-oss-120b",
+        tool_calls=[ToolCall(id="call_1", name="web_search", parameters={"query": "x"})],
+        metadata={"usage": {"total_tokens": 12}},
+    )
+
+
+class TestCompactMessage:
+    """Test CompactMessage class"""
+    
+    def test_slotted(self):
+        """Test compact messages carry no instance dict"""
+        compact = CompactMessage(role=MessageRole.USER, content="Hi")
+        
+        assert not hasattr(compact, "__dict__")
+        assert compact.role == "user"
+    
+    def test_round_trip(self):
+        """Test conversion to and from Message preserves data"""
+        msg = sample_message()
+        
+        restored = CompactMessage.from_message(msg).to_message()
+        
+        assert restored.to_dict() == msg.to_dict()
+        assert restored.tool_calls[0].parameters == {"query": "x"}
+        assert restored.role is MessageRole.ASSISTANT
+    
+    def test_as_message_reuses_live_message(self):
+        """Test a compact message hands back one Message while it is alive"""
+        msg = sample_message()
+        compact = CompactMessage.from_message(msg)
+        
+        assert compact.as_message() is msg
+        del msg
+        restored = compact.as_message()
+        assert compact.as_message() is restored
+        assert restored.metadata == {"usage": {"total_tokens": 12}}
+    
+    def test_lazy_fields(self):
+        """Test tool calls and metadata stay encoded until accessed"""
+        compact = CompactMessage.from_message(sample_message())
+        
+        assert isinstance(compact._metadata, bytes)
+        assert compact.metadata == {"usage": {"total_tokens": 12}}
+        assert compact.tool_calls[0]["name"] == "web_search"
+    
+    def test_empty_fields_not_stored(self):
+        """Test empty tool calls and metadata cost nothing"""
+        compact = CompactMessage.from_message(Message(role=MessageRole.USER, content="Hi"))
+        
+        assert compact._tool_calls is None
+        assert compact._metadata is None
+        assert compact.tool_calls == []
+        assert compact.metadata == {}
+    
+    def test_from_dict(self):
+        """Test building from the to_dict schema"""
+        msg = sample_message()
+        
+        compact = CompactMessage.from_dict(msg.to_dict())
+        
+        assert compact.to_dict() == msg.to_dict()
+        assert compact == CompactMessage.from_message(msg)
+    
+    def test_aware_timestamp(self):
+        """Test timezone-aware timestamps are preserved"""
+        timestamp = datetime(2026, 1, 13, 10, 0, tzinfo=timezone.utc)
+        
+        compact = CompactMessage(role="user", content="Hi", timestamp=timestamp)
+        
+        assert compact.timestamp == timestamp
+    
+    def test_wire_and_tokens_match_message(self):
+        """Test hot-path helpers agree with Message"""
+        msg = sample_message()
+        compact = CompactMessage.from_message(msg)
+        
+        assert compact.wire_bytes() == msg.wire_bytes()
+        assert compact.token_estimate == msg.token_estimate
+
+
+class TestTranscript:
+    """Test Transcript class"""
+    
+    def test_from_messages(self):
+        """Test building a transcript from messages"""
+        messages = [Message(role=MessageRole.USER, content="Hi"), sample_message()]
+        
+        transcript = Transcript.from_messages(messages)
+        
+        assert len(transcript) == 2
+        assert transcript[0].content == "Hi"
+        assert transcript.message(1).tool_calls[0].name == "web_search"
+        assert [m.to_dict() for m in transcript.to_messages()] == [
+            m.to_dict() for m in messages
+        ]
+    
+    def test_append_and_slice(self):
+        """Test appending Message and CompactMessage items"""
+        transcript = Transcript()
+        transcript.append(Message(role=MessageRole.USER, content="One"))
+        transcript.append(CompactMessage(role="assistant", content="Two"))
+        transcript.extend([Message(role=MessageRole.USER, content="Three")])
+        
+        tail = transcript[1:]
+        
+        assert isinstance(tail, Transcript)
+        assert [m.content for m in tail] == ["Two", "Three"]
+    
+    def test_from_dicts(self):
+        """Test building a transcript from persisted dictionaries"""
+        data = [sample_message().to_dict(), sample_message().to_dict()]
+        
+        transcript = Transcript.from_dicts(data)
+        
+        assert transcript.to_dicts() == data
+    
+    def test_usable_on_hot_path(self):
+        """Test compact messages work with ContextWindow and request bodies"""
+        transcript = Transcript.from_messages([
+            Message(role=MessageRole.SYSTEM, content="Be brief"),
+            Message(role=MessageRole.USER, content="Hi"),
+        ])
+        llm = LLM(api_key="test_key")
+        
+        transcript.extend(
+            Message(role=MessageRole.USER, content="x" * 400) for _ in range(3)
+        )
+        
+        fitted = ContextWindow(max_tokens=250).fit(transcript)
+        body = llm._build_body(fitted, 0.7, None, None, False)
+        
+        assert len(fitted) == 3
+        assert b'{"role":"system","content":"Be brief"}' in body